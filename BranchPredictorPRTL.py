@@ -0,0 +1,138 @@
+#=========================================================================
+# BranchPredictorPRTL.py
+#=========================================================================
+
+from pymtl import *
+
+#-------------------------------------------------------------------------
+# BranchPredictorPRTL
+#-------------------------------------------------------------------------
+# Branch predictor for the F stage with a direct-mapped branch target
+# buffer (BTB) and a bimodal branch history table (BHT) of 2-bit
+# saturating counters. We predict the instruction at pc_F as taken if it
+# hits in the BTB and its counter is in one of the two taken states.
+# The BTB keeps the full tag of the PC, so a hit always means the
+# instruction is a branch we have seen taken before, and the target in
+# the BTB is always the correct branch target.
+#
+# Branches update the predictor once they are resolved in the X stage:
+# the counter is incremented if the branch was taken and decremented
+# otherwise, and taken branches are written into the BTB. All counters
+# start out as weakly not taken.
+
+class BranchPredictorPRTL( Model ):
+
+  def __init__( s, btb_nentries = 16, bht_nentries = 64 ):
+
+    #---------------------------------------------------------------------
+    # Interface
+    #---------------------------------------------------------------------
+
+    # Prediction (F stage)
+
+    s.pc_F          = InPort ( 32 )
+    s.pred_taken_F  = OutPort( 1  )
+    s.pred_target_F = OutPort( 32 )
+
+    # Update (X stage)
+
+    s.update_en     = InPort ( 1  )
+    s.update_pc     = InPort ( 32 )
+    s.update_taken  = InPort ( 1  )
+    s.update_target = InPort ( 32 )
+
+    #---------------------------------------------------------------------
+    # State
+    #---------------------------------------------------------------------
+
+    btb_idx_nbits = clog2( btb_nentries )
+    bht_idx_nbits = clog2( bht_nentries )
+    btb_tag_nbits = 32 - 2 - btb_idx_nbits
+
+    # PC bits of the BTB index, BTB tag, and BHT index (instructions are
+    # word aligned, so we skip the two lowest bits)
+
+    btb_idx_lo = 2
+    btb_idx_hi = 2 + btb_idx_nbits
+    btb_tag_lo = btb_idx_hi
+    bht_idx_lo = 2
+    bht_idx_hi = 2 + bht_idx_nbits
+
+    s.btb_val    = [ Wire( 1             ) for _ in range( btb_nentries ) ]
+    s.btb_tag    = [ Wire( btb_tag_nbits ) for _ in range( btb_nentries ) ]
+    s.btb_target = [ Wire( 32            ) for _ in range( btb_nentries ) ]
+    s.bht        = [ Wire( 2             ) for _ in range( bht_nentries ) ]
+
+    #---------------------------------------------------------------------
+    # Prediction
+    #---------------------------------------------------------------------
+
+    s.rd_btb_idx = Wire( btb_idx_nbits )
+    s.rd_bht_idx = Wire( bht_idx_nbits )
+    s.rd_btb_hit = Wire( 1 )
+    s.rd_bht     = Wire( 2 )
+
+    @s.combinational
+    def comb_predict():
+
+      s.rd_btb_idx.value = s.pc_F[ btb_idx_lo:btb_idx_hi ]
+      s.rd_bht_idx.value = s.pc_F[ bht_idx_lo:bht_idx_hi ]
+
+      s.rd_btb_hit.value = s.btb_val[ s.rd_btb_idx ] & \
+                           ( s.btb_tag[ s.rd_btb_idx ] == s.pc_F[ btb_tag_lo:32 ] )
+      s.rd_bht.value     = s.bht[ s.rd_bht_idx ]
+
+      # counter is 2 or 3
+
+      s.pred_taken_F.value  = s.rd_btb_hit & s.rd_bht[1]
+      s.pred_target_F.value = s.btb_target[ s.rd_btb_idx ]
+
+    #---------------------------------------------------------------------
+    # Update
+    #---------------------------------------------------------------------
+
+    s.wr_btb_idx = Wire( btb_idx_nbits )
+    s.wr_bht_idx = Wire( bht_idx_nbits )
+    s.wr_bht     = Wire( 2 )
+
+    @s.combinational
+    def comb_update():
+      s.wr_btb_idx.value = s.update_pc[ btb_idx_lo:btb_idx_hi ]
+      s.wr_bht_idx.value = s.update_pc[ bht_idx_lo:bht_idx_hi ]
+      s.wr_bht.value     = s.bht[ s.wr_bht_idx ]
+
+    @s.posedge_clk
+    def seq_update():
+
+      if s.reset:
+        for i in range( btb_nentries ):
+          s.btb_val[i].next = 0
+        for i in range( bht_nentries ):
+          s.bht[i].next = 1
+
+      elif s.update_en:
+
+        # 2-bit saturating counter
+
+        if s.update_taken:
+          if s.wr_bht != 3:
+            s.bht[ s.wr_bht_idx ].next = s.wr_bht + 1
+        else:
+          if s.wr_bht != 0:
+            s.bht[ s.wr_bht_idx ].next = s.wr_bht - 1
+
+        # Only taken branches go into the BTB
+
+        if s.update_taken:
+          s.btb_val   [ s.wr_btb_idx ].next = 1
+          s.btb_tag   [ s.wr_btb_idx ].next = s.update_pc[ btb_tag_lo:32 ]
+          s.btb_target[ s.wr_btb_idx ].next = s.update_target
+
+  #-----------------------------------------------------------------------
+  # Line tracing
+  #-----------------------------------------------------------------------
+
+  def line_trace( s ):
+    if s.pred_taken_F:
+      return "{:08x}".format( s.pred_target_F.uint() )
+    return "{:<8s}".format( ' ' )
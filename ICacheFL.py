@@ -0,0 +1,102 @@
+#=========================================================================
+# ICacheFL.py
+#=========================================================================
+
+from pymtl      import *
+from pclib.ifcs import InValRdyBundle, OutValRdyBundle
+from pclib.ifcs import MemReqMsg4B, MemRespMsg4B
+
+#-------------------------------------------------------------------------
+# ICacheTags
+#-------------------------------------------------------------------------
+# The tags of an instruction cache with the same organization and
+# replacement policy (round-robin within a set) as ICachePRTL. access
+# returns whether the line with the given address is in the cache and
+# brings it into the cache if it is not.
+
+class ICacheTags (object):
+
+  def __init__( s, nbytes = 1024, line_nbytes = 16, nways = 1 ):
+
+    s.line_nbytes = line_nbytes
+    s.nways       = nways
+    s.nsets       = nbytes / ( line_nbytes * nways )
+
+    assert s.nsets >= 1 and s.nsets * line_nbytes * nways == nbytes, \
+      "The cache size has to be a multiple of the line size times nways!"
+
+    s.reset()
+
+  def reset( s ):
+    s.tags   = [ [ None ] * s.nways for _ in range( s.nsets ) ]
+    s.victim = [ 0 ] * s.nsets
+
+  def access( s, addr ):
+
+    line = addr / s.line_nbytes
+    idx  = line % s.nsets
+    tags = s.tags[ idx ]
+
+    if line in tags:
+      return True
+
+    tags[ s.victim[ idx ] ] = line
+    s.victim[ idx ] = ( s.victim[ idx ] + 1 ) % s.nways
+    return False
+
+#-------------------------------------------------------------------------
+# ICacheFL
+#-------------------------------------------------------------------------
+# Functional-level instruction cache with the same interface and
+# statistics as ICachePRTL. Requests and responses go straight through
+# to the memory (i.e., a hit is not faster than a miss), we only keep
+# track of the tags to count the misses.
+
+class ICacheFL( Model ):
+
+  def __init__( s, nbytes = 1024, line_nbytes = 16, nways = 1 ):
+
+    #---------------------------------------------------------------------
+    # Interface
+    #---------------------------------------------------------------------
+
+    s.cachereq  = InValRdyBundle ( MemReqMsg4B  )
+    s.cacheresp = OutValRdyBundle( MemRespMsg4B )
+
+    s.memreq    = OutValRdyBundle( MemReqMsg4B  )
+    s.memresp   = InValRdyBundle ( MemRespMsg4B )
+
+    s.connect( s.cachereq, s.memreq    )
+    s.connect( s.memresp,  s.cacheresp )
+
+    #---------------------------------------------------------------------
+    # Tags and statistics
+    #---------------------------------------------------------------------
+
+    s.nbytes      = nbytes
+    s.line_nbytes = line_nbytes
+    s.nways       = nways
+
+    s.tags         = ICacheTags( nbytes, line_nbytes, nways )
+    s.num_accesses = 0
+    s.num_misses   = 0
+
+    @s.tick_fl
+    def logic():
+
+      if s.reset:
+        s.tags.reset()
+        s.num_accesses = 0
+        s.num_misses   = 0
+
+      elif s.cachereq.val and s.cachereq.rdy:
+        s.num_accesses += 1
+        if not s.tags.access( s.cachereq.msg.addr.uint() ):
+          s.num_misses += 1
+
+  #-----------------------------------------------------------------------
+  # Line tracing
+  #-----------------------------------------------------------------------
+
+  def line_trace( s ):
+    return "({})".format( "r" if s.cachereq.val and s.cachereq.rdy else " " )
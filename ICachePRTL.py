@@ -0,0 +1,281 @@
+#=========================================================================
+# ICachePRTL.py
+#=========================================================================
+
+from pymtl      import *
+from pclib.ifcs import InValRdyBundle, OutValRdyBundle
+from pclib.ifcs import MemReqMsg4B, MemRespMsg4B
+
+# State Constants
+
+TAG_CHECK = 0
+REFILL    = 1
+
+#-------------------------------------------------------------------------
+# ICachePRTL
+#-------------------------------------------------------------------------
+# Blocking read-only instruction cache between the imem port of a
+# processor and the test memory. The cache has nbytes of data in lines
+# of line_nbytes, and nways lines per set (nways=1 is direct-mapped, one
+# set is fully associative). We replace the lines of a set round-robin.
+#
+# A request is registered and checked against the tags of its set in
+# the next cycle. On a hit the response is valid in that cycle, and we
+# can take the next request at the same time, so the processor can
+# fetch one instruction per cycle as long as it hits. On a miss we read
+# the line from memory one word at a time (the memory port is only four
+# bytes wide), but we send the next request without waiting for the
+# previous response, so a refill takes about the memory latency plus one
+# cycle per word. Once the last word is in, the request hits.
+#
+# The processor never writes through the imem port, so we never have to
+# write back or invalidate a line (i.e., we do not support programs
+# which modify their own code).
+#
+# num_accesses and num_misses count the responses and the refills.
+
+class ICachePRTL( Model ):
+
+  def __init__( s, nbytes = 1024, line_nbytes = 16, nways = 1 ):
+
+    #---------------------------------------------------------------------
+    # Interface
+    #---------------------------------------------------------------------
+
+    s.cachereq  = InValRdyBundle ( MemReqMsg4B  )
+    s.cacheresp = OutValRdyBundle( MemRespMsg4B )
+
+    s.memreq    = OutValRdyBundle( MemReqMsg4B  )
+    s.memresp   = InValRdyBundle ( MemRespMsg4B )
+
+    #---------------------------------------------------------------------
+    # Parameters
+    #---------------------------------------------------------------------
+
+    nwords = line_nbytes / 4
+    nsets  = nbytes / ( line_nbytes * nways )
+
+    assert line_nbytes >= 4 and ( line_nbytes & ( line_nbytes - 1 ) ) == 0, \
+      "The line size has to be a power of two (at least one word)!"
+    assert nsets >= 1 and nsets * line_nbytes * nways == nbytes \
+       and ( nsets & ( nsets - 1 ) ) == 0, \
+      "The number of sets has to be a power of two!"
+
+    s.nbytes      = nbytes
+    s.line_nbytes = line_nbytes
+    s.nways       = nways
+
+    # Address bits of the word within the line, the set, and the tag
+
+    word_nbits = clog2( nwords )
+    set_nbits  = clog2( nsets  )
+
+    word_lo = 2
+    word_hi = 2 + word_nbits
+    set_lo  = word_hi
+    set_hi  = set_lo + set_nbits
+    tag_lo  = set_hi
+
+    tag_nbits = 32 - tag_lo
+
+    # The arrays are indexed with { way, set } and { way, set, word }.
+    # Each field has at least one bit, so with a single way, set, or word
+    # some of the entries are never used.
+
+    way_idx_nbits  = max( 1, clog2( nways ) )
+    set_idx_nbits  = max( 1, set_nbits  )
+    word_idx_nbits = max( 1, word_nbits )
+
+    nlines = 2**( way_idx_nbits + set_idx_nbits )
+    ndata  = 2**( way_idx_nbits + set_idx_nbits + word_idx_nbits )
+
+    #---------------------------------------------------------------------
+    # State
+    #---------------------------------------------------------------------
+
+    s.tag_array  = [ Wire( tag_nbits     ) for _ in range( nlines ) ]
+    s.val_array  = [ Wire( 1             ) for _ in range( nlines ) ]
+    s.data_array = [ Wire( 32            ) for _ in range( ndata  ) ]
+    s.victim     = [ Wire( way_idx_nbits ) for _ in range( 2**set_idx_nbits ) ]
+
+    s.state      = Wire( 1 )
+
+    # Registered request
+
+    s.req_val    = Wire( 1  )
+    s.req_addr   = Wire( 32 )
+    s.req_opaque = Wire( 8  )
+
+    # Refill
+
+    s.refill_way        = Wire( way_idx_nbits      )
+    s.refill_addr       = Wire( 32                 )
+    s.refill_req_count  = Wire( word_idx_nbits + 1 )
+    s.refill_resp_count = Wire( word_idx_nbits + 1 )
+
+    # Statistics
+
+    s.num_accesses = Wire( 32 )
+    s.num_misses   = Wire( 32 )
+
+    #---------------------------------------------------------------------
+    # Tag check
+    #---------------------------------------------------------------------
+
+    s.req_set  = Wire( set_idx_nbits  )
+    s.req_word = Wire( word_idx_nbits )
+    s.req_tag  = Wire( tag_nbits      )
+
+    if set_nbits > 0:
+      @s.combinational
+      def comb_req_set():
+        s.req_set.value = s.req_addr[ set_lo:set_hi ]
+    else:
+      s.connect( s.req_set, 0 )
+
+    if word_nbits > 0:
+      @s.combinational
+      def comb_req_word():
+        s.req_word.value = s.req_addr[ word_lo:word_hi ]
+    else:
+      s.connect( s.req_word, 0 )
+
+    s.hit      = Wire( 1 )
+    s.hit_way  = Wire( way_idx_nbits )
+    s.hit_data = Wire( 32 )
+
+    @s.combinational
+    def comb_tag_check():
+
+      s.req_tag.value = s.req_addr[ tag_lo:32 ]
+
+      s.hit.value     = 0
+      s.hit_way.value = 0
+
+      for i in range( nways ):
+        if s.val_array[ concat( Bits( way_idx_nbits, i ), s.req_set ) ] & \
+           ( s.tag_array[ concat( Bits( way_idx_nbits, i ), s.req_set ) ]
+             == s.req_tag ):
+          s.hit.value     = 1
+          s.hit_way.value = i
+
+      s.hit_data.value = \
+        s.data_array[ concat( s.hit_way, s.req_set, s.req_word ) ]
+
+    #---------------------------------------------------------------------
+    # Refill
+    #---------------------------------------------------------------------
+
+    s.refill_word = Wire( word_idx_nbits )
+    s.next_victim = Wire( way_idx_nbits  )
+
+    @s.combinational
+    def comb_refill():
+
+      s.refill_word.value = s.refill_resp_count[ 0:word_idx_nbits ]
+
+      if s.victim[ s.req_set ] == nways - 1:
+        s.next_victim.value = 0
+      else:
+        s.next_victim.value = s.victim[ s.req_set ] + 1
+
+    #---------------------------------------------------------------------
+    # Sequential logic
+    #---------------------------------------------------------------------
+
+    @s.posedge_clk
+    def seq():
+
+      if s.reset:
+        s.state.next        = TAG_CHECK
+        s.req_val.next      = 0
+        s.num_accesses.next = 0
+        s.num_misses.next   = 0
+        for i in range( nlines ):
+          s.val_array[i].next = 0
+        for i in range( 2**set_idx_nbits ):
+          s.victim[i].next = 0
+
+      elif s.state == TAG_CHECK:
+
+        if s.cachereq.val & s.cachereq.rdy:
+          s.req_val.next    = 1
+          s.req_addr.next   = s.cachereq.msg.addr
+          s.req_opaque.next = s.cachereq.msg.opaque
+        elif s.cacheresp.val & s.cacheresp.rdy:
+          s.req_val.next    = 0
+
+        if s.cacheresp.val & s.cacheresp.rdy:
+          s.num_accesses.next = s.num_accesses + 1
+
+        if s.req_val & ~s.hit:
+          s.state.next             = REFILL
+          s.refill_way.next        = s.victim[ s.req_set ]
+          s.refill_addr.next       = concat( s.req_addr[ set_lo:32 ],
+                                             Bits( set_lo, 0 ) )
+          s.refill_req_count.next  = 0
+          s.refill_resp_count.next = 0
+          s.num_misses.next        = s.num_misses + 1
+
+      elif s.state == REFILL:
+
+        if s.memreq.val & s.memreq.rdy:
+          s.refill_addr.next      = s.refill_addr + 4
+          s.refill_req_count.next = s.refill_req_count + 1
+
+        if s.memresp.val:
+          s.data_array[ concat( s.refill_way, s.req_set, s.refill_word ) ].next \
+            = s.memresp.msg.data
+          s.refill_resp_count.next = s.refill_resp_count + 1
+
+          # Last word of the line
+
+          if s.refill_resp_count == nwords - 1:
+            s.tag_array[ concat( s.refill_way, s.req_set ) ].next = s.req_tag
+            s.val_array[ concat( s.refill_way, s.req_set ) ].next = 1
+            s.victim   [ s.req_set ].next = s.next_victim
+            s.state.next = TAG_CHECK
+
+    #---------------------------------------------------------------------
+    # Outputs
+    #---------------------------------------------------------------------
+
+    @s.combinational
+    def comb_outputs():
+
+      # Processor side
+
+      s.cachereq.rdy.value  = ( s.state == TAG_CHECK ) & \
+                              ( ~s.req_val | ( s.hit & s.cacheresp.rdy ) )
+      s.cacheresp.val.value = ( s.state == TAG_CHECK ) & s.req_val & s.hit
+
+      s.cacheresp.msg.type_.value  = 0 # read
+      s.cacheresp.msg.opaque.value = s.req_opaque
+      s.cacheresp.msg.test.value   = 0
+      s.cacheresp.msg.len.value    = 0 # four bytes
+      s.cacheresp.msg.data.value   = s.hit_data
+
+      # Memory side
+
+      s.memreq.val.value  = ( s.state == REFILL ) & \
+                            ( s.refill_req_count < nwords )
+      s.memresp.rdy.value = ( s.state == REFILL )
+
+      s.memreq.msg.type_.value  = 0 # read
+      s.memreq.msg.opaque.value = 0
+      s.memreq.msg.addr.value   = s.refill_addr
+      s.memreq.msg.len.value    = 0 # four bytes
+      s.memreq.msg.data.value   = 0
+
+  #-----------------------------------------------------------------------
+  # Line tracing
+  #-----------------------------------------------------------------------
+
+  def line_trace( s ):
+
+    if   s.state == REFILL: state_str = "r"
+    elif not s.req_val:     state_str = " "
+    elif s.hit:             state_str = "h"
+    else:                   state_str = "m"
+
+    return "({})".format( state_str )
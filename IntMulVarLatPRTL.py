@@ -0,0 +1,106 @@
+#=========================================================================
+# IntMulVarLatPRTL.py
+#=========================================================================
+
+from pymtl      import *
+from pclib.ifcs import InValRdyBundle, OutValRdyBundle
+
+# State Constants
+
+IDLE = 0
+CALC = 1
+DONE = 2
+
+#-------------------------------------------------------------------------
+# IntMulVarLatPRTL
+#-------------------------------------------------------------------------
+# Iterative 32-bit integer multiplier with a val/rdy interface. The
+# request holds the two operands (a in the upper and b in the lower 32
+# bits), the response holds the lower 32 bits of the product, which is
+# the same for signed and unsigned operands.
+#
+# We shift-and-add one bit of b per cycle, starting with the lowest
+# bit, and terminate early as soon as the remaining bits of b are all
+# zero. A multiplication by an n-bit b therefore takes n cycles (at
+# least one), and the response is valid the cycle after that.
+
+class IntMulVarLatPRTL( Model ):
+
+  def __init__( s ):
+
+    #---------------------------------------------------------------------
+    # Interface
+    #---------------------------------------------------------------------
+
+    s.req    = InValRdyBundle ( 64 )
+    s.resp   = OutValRdyBundle( 32 )
+
+    #---------------------------------------------------------------------
+    # State
+    #---------------------------------------------------------------------
+
+    s.state  = Wire( 2  )
+    s.a      = Wire( 32 )
+    s.b      = Wire( 32 )
+    s.result = Wire( 32 )
+
+    # Next partial product and the remaining bits of b
+
+    s.result_next = Wire( 32 )
+    s.b_next      = Wire( 32 )
+
+    @s.combinational
+    def comb_calc():
+
+      if s.b[0]:
+        s.result_next.value = s.result + s.a
+      else:
+        s.result_next.value = s.result
+
+      s.b_next.value = s.b >> 1
+
+    @s.posedge_clk
+    def seq_state():
+
+      if s.reset:
+        s.state.next = IDLE
+
+      elif s.state == IDLE:
+        if s.req.val:
+          s.state.next  = CALC
+          s.a.next      = s.req.msg[32:64]
+          s.b.next      = s.req.msg[ 0:32]
+          s.result.next = 0
+
+      elif s.state == CALC:
+        s.a.next      = s.a << 1
+        s.b.next      = s.b_next
+        s.result.next = s.result_next
+        if s.b_next == 0:
+          s.state.next = DONE
+
+      elif s.state == DONE:
+        if s.resp.rdy:
+          s.state.next = IDLE
+
+    #---------------------------------------------------------------------
+    # Outputs
+    #---------------------------------------------------------------------
+
+    @s.combinational
+    def comb_outputs():
+      s.req.rdy.value  = ( s.state == IDLE )
+      s.resp.val.value = ( s.state == DONE )
+      s.resp.msg.value = s.result
+
+  #-----------------------------------------------------------------------
+  # Line tracing
+  #-----------------------------------------------------------------------
+
+  def line_trace( s ):
+
+    if   s.state == IDLE: state_str = " "
+    elif s.state == CALC: state_str = "C"
+    else:                 state_str = "D"
+
+    return "({}|{:08x})".format( state_str, s.b.uint() )
@@ -8,6 +8,7 @@
 `include "vc/trace.v"
 
 `include "lab2_proc/TinyRV2InstVRTL.v"
+`include "lab2_proc/ProcPerfCountersVRTL.v"
 
 module lab2_proc_ProcAltCtrlVRTL
 (
@@ -51,6 +52,7 @@ module lab2_proc_ProcAltCtrlVRTL
   output logic [1:0]  op2_sel_D,
   output logic [1:0]  op2_bypass_sel,
   output logic [1:0]  csrr_sel_D,
+  output logic [31:0] perf_data_D,
   output logic [2:0]  imm_type_D,
   output logic        imul_req_val_D,
 
@@ -77,6 +79,7 @@ module lab2_proc_ProcAltCtrlVRTL
   input  logic        imul_resp_val_X,
 
   output logic        stats_en_wen_W,
+  input  logic        stats_en,
 
   output logic        commit_inst
 
@@ -489,6 +492,8 @@ module lab2_proc_ProcAltCtrlVRTL
       csrr_sel_D       = 2'h1;
     if ( csrr_D && inst_csr_D == `RV2ISA_CPR_COREID )
       csrr_sel_D       = 2'h2;
+    if ( csrr_D && ( inst_csr_D & 12'hFE0 ) == `RV2ISA_CPR_CYCLE )
+      csrr_sel_D       = 2'h3;
   end
 //bypass logic
 
@@ -811,6 +816,32 @@ always_comb begin
 
   assign commit_inst = val_W && !stall_W;
 
+  //----------------------------------------------------------------------
+  // Performance counters
+  //----------------------------------------------------------------------
+  // Counters for cycles, committed instructions, stalls, and squashes
+  // while stats_en is set. We read them in D with csrr.
+
+  lab2_proc_ProcPerfCountersVRTL perf_counters
+  (
+    .clk              (clk),
+    .reset            (reset),
+
+    .stats_en         (stats_en),
+
+    .commit_inst      (commit_inst),
+    .ostall_imem      (ostall_F),
+    .ostall_hazard    (val_D && ostall_hazard_D),
+    .ostall_mngr2proc (ostall_mngr2proc_D),
+    .ostall_X         (ostall_X),
+    .ostall_M         (ostall_M),
+    .ostall_proc2mngr (ostall_W),
+    .squash           (osquash_D || osquash_X),
+
+    .raddr            (inst_csr_D[4:0]),
+    .rdata            (perf_data_D)
+  );
+
 endmodule
 
 `endif
@@ -56,6 +56,7 @@ module lab2_proc_ProcAltDpathVRTL
   input  logic [1:0]  op2_sel_D,
   input  logic [1:0]  op2_bypass_sel,
   input  logic [1:0]  csrr_sel_D,
+  input  logic [31:0] perf_data_D,
   input  logic [2:0]  imm_type_D,
   input  logic        imul_req_val_D,
 
@@ -249,11 +250,12 @@ module lab2_proc_ProcAltDpathVRTL
   assign num_cores = p_num_cores;
 
   // csrr data select mux
-  vc_Mux3 #(32) csrr_sel_mux_D
+  vc_Mux4 #(32) csrr_sel_mux_D
   (
    .in0  (mngr2proc_data),
    .in1  (num_cores),
    .in2  (core_id),
+   .in3  (perf_data_D),
    .sel  (csrr_sel_D),
    .out  (csrr_data_D)
   );
@@ -1,56 +1,16 @@
 #=========================================================================
 # ProcAltPRTL.py
 #=========================================================================
+# Fully bypassed version of the five-stage pipelined processor. This is
+# the baseline processor with bypass=True, i.e., the results from X, M,
+# and W are bypassed into the operands in D and we only stall on a
+# load-use hazard (see ProcBaseCtrlPRTL and ProcBaseDpathPRTL).
 
-from pymtl             import *
-from pclib.ifcs        import InValRdyBundle, OutValRdyBundle
-from pclib.ifcs        import MemReqMsg4B, MemRespMsg4B
-from pclib.rtl         import SingleElementBypassQueue, TwoElementBypassQueue
-from tinyrv2_encoding  import disassemble_inst
-from TinyRV2InstPRTL   import inst_dict
+from pymtl        import *
 
-#''' LAB TASK ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
-# Import components here
-#'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+from ProcBasePRTL import ProcBasePRTL
 
-class ProcAltPRTL( Model ):
+class ProcAltPRTL( ProcBasePRTL ):
 
   def __init__( s, num_cores = 1 ):
-
-    #---------------------------------------------------------------------
-    # Interface
-    #---------------------------------------------------------------------
-
-    # Starting F16 we turn core_id into input ports to
-    # enable module reusability. In the past it was passed as arguments.
-
-    s.core_id   = InPort( 32 )
-    
-    # Proc/Mngr Interface
-
-    s.mngr2proc = InValRdyBundle ( 32 )
-    s.proc2mngr = OutValRdyBundle( 32 )
-
-    # Instruction Memory Request/Response Interface
-
-    s.imemreq   = OutValRdyBundle( MemReqMsg4B  )
-    s.imemresp  = InValRdyBundle ( MemRespMsg4B )
-
-    # Data Memory Request/Response Interface
-
-    s.dmemreq   = OutValRdyBundle( MemReqMsg4B  )
-    s.dmemresp  = InValRdyBundle ( MemRespMsg4B )
-
-    # val_W port used for counting commited insts.
-
-    s.commit_inst = OutPort( 1 )
-
-    # stats_en
-
-    s.stats_en    = OutPort( 1 )
-
-    #''' LAB TASK ''''''''''''''''''''''''''''''''''''''''''''''''''''''''
-    # Instantiate and connect components here
-    #'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
-
-  #'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    super( ProcAltPRTL, s ).__init__( num_cores, bypass = True )
@@ -121,6 +121,7 @@ module lab2_proc_ProcAltVRTL
   logic [1:0]  op2_sel_D;
   logic [1:0]  op2_bypass_sel;
   logic [1:0]  csrr_sel_D;
+  logic [31:0] perf_data_D;
   logic [2:0]  imm_type_D;
   logic        imul_req_val_D;
 
@@ -232,6 +233,7 @@ module lab2_proc_ProcAltVRTL
     .op2_sel_D              (op2_sel_D),
     .op2_bypass_sel         (op2_bypass_sel),
     .csrr_sel_D             (csrr_sel_D),
+    .perf_data_D            (perf_data_D),
     .imm_type_D             (imm_type_D),
     .imul_req_val_D         (imul_req_val_D),
 
@@ -248,6 +250,7 @@ module lab2_proc_ProcAltVRTL
     .rf_waddr_W             (rf_waddr_W),
     .rf_wen_W               (rf_wen_W),
     .stats_en_wen_W         (stats_en_wen_W),
+    .stats_en               (stats_en),
 
     // status signals (dpath->ctrl)
 
@@ -357,6 +360,7 @@ module lab2_proc_ProcAltVRTL
     .op2_sel_D               (op2_sel_D),
     .op2_bypass_sel          (op2_bypass_sel),
     .csrr_sel_D              (csrr_sel_D),
+    .perf_data_D             (perf_data_D),
     .imm_type_D              (imm_type_D),
     .imul_req_val_D          (imul_req_val_D),
 
@@ -8,7 +8,11 @@ from TinyRV2InstPRTL import *
 
 class ProcBaseCtrlPRTL( Model ):
 
-  def __init__( s ):
+  # With bypass we bypass the results from X, M, and W into the operands
+  # in D instead of stalling, and only stall on a load-use hazard (see
+  # ProcAltPRTL).
+
+  def __init__( s, bypass = False ):
 
     #---------------------------------------------------------------------
     # Interface
@@ -40,18 +44,34 @@ class ProcBaseCtrlPRTL( Model ):
     s.proc2mngr_val   = OutPort( 1 )
     s.proc2mngr_rdy   = InPort ( 1 )
 
+    # imul ports
+
+    s.imul_req_val_D  = OutPort( 1 )
+    s.imul_req_rdy_D  = InPort ( 1 )
+
+    s.imul_resp_val_X = InPort ( 1 )
+    s.imul_resp_rdy_X = OutPort( 1 )
+
     # Control signals (ctrl->dpath)
 
     s.reg_en_F        = OutPort( 1 )
     s.pc_sel_F        = OutPort( 2 )
 
     s.reg_en_D        = OutPort( 1 )
+    if bypass:
+      s.op1_byp_sel_D = OutPort( 2 )
+      s.op2_byp_sel_D = OutPort( 2 )
     s.op2_sel_D       = OutPort( 2 )
     s.csrr_sel_D      = OutPort( 2 )
     s.imm_type_D      = OutPort( 3 )
+    s.jalr_sel_D      = OutPort( 1 )
 
     s.reg_en_X        = OutPort( 1 )
     s.alu_fn_X        = OutPort( 4 )
+    s.ex_result_sel_X = OutPort( 1 )
+    s.redirect_sel_X  = OutPort( 1 )
+    s.br_taken_X      = OutPort( 1 )
+    s.bpred_update_X  = OutPort( 1 )
 
     s.reg_en_M        = OutPort( 1 )
     s.wb_result_sel_M = OutPort( 1 )
@@ -62,6 +82,7 @@ class ProcBaseCtrlPRTL( Model ):
 
     # Status signals (dpath->ctrl)
 
+    s.pred_taken_F    = InPort ( 1 )
     s.inst_D          = InPort ( 32 )
     s.br_cond_eq_X    = InPort ( 1 )
 
@@ -109,8 +130,8 @@ class ProcBaseCtrlPRTL( Model ):
     # condition for this pipeline harzard.
 
     s.ostall_F = Wire( 1 )  # can ostall due to imemresp_val
-    s.ostall_D = Wire( 1 )  # can ostall due to mngr2proc_val or other hazards
-    s.ostall_X = Wire( 1 )  # can ostall due to dmemreq_rdy
+    s.ostall_D = Wire( 1 )  # can ostall due to mngr2proc_val, imul_req_rdy, or other hazards
+    s.ostall_X = Wire( 1 )  # can ostall due to dmemreq_rdy or imul_resp_val
     s.ostall_M = Wire( 1 )  # can ostall due to dmemresp_val
     s.ostall_W = Wire( 1 )  # can ostall due to proc2mngr_rdy
 
@@ -165,7 +186,11 @@ class ProcBaseCtrlPRTL( Model ):
     @s.combinational
     def comb_PC_sel_F():
       if s.pc_redirect_X:
-        s.pc_sel_F.value = 1 # use branch target (if taken)
+        s.pc_sel_F.value = 1 # use redirect target (if mispredicted)
+      elif s.osquash_D:
+        s.pc_sel_F.value = 2 # use jump target
+      elif s.val_F & s.pred_taken_F:
+        s.pc_sel_F.value = 3 # use predicted branch target
       else:
         s.pc_sel_F.value = 0 # use pc+4
 
@@ -206,12 +231,15 @@ class ProcBaseCtrlPRTL( Model ):
     def comb_reg_en_D():
       s.reg_en_D.value = ~s.stall_D | s.squash_D
 
+    s.pred_taken_D = Wire( 1 )
+
     @s.posedge_clk
     def reg_D():
       if s.reset:
-        s.val_D.next = 0
+        s.val_D.next        = 0
       elif s.reg_en_D:
-        s.val_D.next = s.next_val_F
+        s.val_D.next        = s.next_val_F
+        s.pred_taken_D.next = s.pred_taken_F
 
     # Decoder, translate 32-bit instructions to symbols
 
@@ -235,6 +263,8 @@ class ProcBaseCtrlPRTL( Model ):
     s.proc2mngr_val_D       = Wire( 1 )
     s.mngr2proc_rdy_D       = Wire( 1 )
     s.stats_en_wen_D        = Wire( 1 )
+    s.jump_D                = Wire( 1 )
+    s.imul_D                = Wire( 1 )
 
     # actual waddr, selected base on rf_waddr_sel_D
 
@@ -252,6 +282,8 @@ class ProcBaseCtrlPRTL( Model ):
     br_x    = Bits( 3, 0 ) # don't care
     br_na   = Bits( 3, 0 ) # N/A, not branch
     br_bne  = Bits( 3, 1 ) # branch not equal
+    br_jal  = Bits( 3, 2 ) # jump, resolved in D
+    br_jalr = Bits( 3, 3 ) # jump register, resolved in D
 
     # Op2 mux select
 
@@ -259,12 +291,15 @@ class ProcBaseCtrlPRTL( Model ):
     bm_rf  = Bits( 2, 0 ) # use data from RF
     bm_imm = Bits( 2, 1 ) # use imm
     bm_csr = Bits( 2, 2 ) # use mngr2proc/numcores/coreid based on csrnum
+    bm_pc  = Bits( 2, 3 ) # use pc+4
 
     # ALU func
 
     alu_x   = Bits( 4, 0  )
     alu_add = Bits( 4, 0  )
     alu_sub = Bits( 4, 1  )
+    alu_and = Bits( 4, 2  )
+    alu_or  = Bits( 4, 3  )
     alu_cp0 = Bits( 4, 11 )
     alu_cp1 = Bits( 4, 12 )
 
@@ -303,7 +338,8 @@ class ProcBaseCtrlPRTL( Model ):
         cs_wb_result_sel,
         cs_rf_wen_pending,
         cs_csrr,
-        cs_csrw
+        cs_csrw,
+        cs_imul
     ):
       s.inst_val_D.value       = cs_inst_val
       s.br_type_D.value        = cs_br_type
@@ -317,32 +353,44 @@ class ProcBaseCtrlPRTL( Model ):
       s.rf_wen_pending_D.value = cs_rf_wen_pending
       s.csrr_D.value           = cs_csrr
       s.csrw_D.value           = cs_csrw
+      s.imul_D.value           = cs_imul
 
     # control signal table
 
     @s.combinational
     def comb_control_table_D():
       inst = s.inst_type_decoder_D.out.value
-      #                          br      imm  rs1  op2    rs2 alu      dmm wbmux rf  
-      #                      val type    type  en  muxsel  en fn       typ sel   wen csrr csrw
-      if   inst == NOP  : cs( y, br_na,  imm_x, n, bm_x,   n, alu_x,   nr, wm_a, n,  n,   n    )
-      elif inst == ADD  : cs( y, br_na,  imm_x, y, bm_rf,  y, alu_add, nr, wm_a, y,  n,   n    )
-      elif inst == LW   : cs( y, br_na,  imm_i, y, bm_imm, n, alu_add, ld, wm_m, y,  n,   n    )
-      elif inst == BNE  : cs( y, br_bne, imm_b, y, bm_rf,  y, alu_x,   nr, wm_a, n,  n,   n    )
-      elif inst == CSRR : cs( y, br_na,  imm_i, n, bm_csr, n, alu_cp1, nr, wm_a, y,  y,   n    )
-      elif inst == CSRW : cs( y, br_na,  imm_i, y, bm_rf,  n, alu_cp0, nr, wm_a, n,  n,   y    )
+      #                          br       imm  rs1  op2    rs2 alu      dmm wbmux rf  
+      #                      val type     type  en  muxsel  en fn       typ sel   wen csrr csrw imul
+      if   inst == NOP  : cs( y, br_na,   imm_x, n, bm_x,   n, alu_x,   nr, wm_a, n,  n,   n,   n    )
+      elif inst == ADD  : cs( y, br_na,   imm_x, y, bm_rf,  y, alu_add, nr, wm_a, y,  n,   n,   n    )
+      elif inst == LW   : cs( y, br_na,   imm_i, y, bm_imm, n, alu_add, ld, wm_m, y,  n,   n,   n    )
+      elif inst == BNE  : cs( y, br_bne,  imm_b, y, bm_rf,  y, alu_x,   nr, wm_a, n,  n,   n,   n    )
+      elif inst == CSRR : cs( y, br_na,   imm_i, n, bm_csr, n, alu_cp1, nr, wm_a, y,  y,   n,   n    )
+      elif inst == CSRW : cs( y, br_na,   imm_i, y, bm_rf,  n, alu_cp0, nr, wm_a, n,  n,   y,   n    )
 
       #''' LAB TASK ''''''''''''''''''''''''''''''''''''''''''''''''''''''
       # Add More instructions to the control signal table
       #'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
-      elif inst == SUB : cs( y, br_na,  imm_x, y, bm_rf,  y, alu_sub, nr, wm_a, y,  n,   n    )
+      elif inst == SUB : cs( y, br_na,   imm_x, y, bm_rf,  y, alu_sub, nr, wm_a, y,  n,   n,   n    )
+      elif inst == JAL  : cs( y, br_jal,  imm_j, n, bm_pc,  n, alu_cp1, nr, wm_a, y,  n,   n,   n    )
+      elif inst == JALR : cs( y, br_jalr, imm_i, y, bm_pc,  n, alu_cp1, nr, wm_a, y,  n,   n,   n    )
+      elif inst == MUL  : cs( y, br_na,   imm_x, y, bm_rf,  y, alu_x,   nr, wm_a, y,  n,   n,   y    )
+      elif inst == ADDI : cs( y, br_na,   imm_i, y, bm_imm, n, alu_add, nr, wm_a, y,  n,   n,   n    )
+      elif inst == ANDI : cs( y, br_na,   imm_i, y, bm_imm, n, alu_and, nr, wm_a, y,  n,   n,   n    )
+      elif inst == OR   : cs( y, br_na,   imm_x, y, bm_rf,  y, alu_or,  nr, wm_a, y,  n,   n,   n    )
 
-      else:               cs( n,  br_x,  imm_x, n, bm_x,   n, alu_x,   nr, wm_x, n,  n,   n    )
+      else:               cs( n,  br_x,   imm_x, n, bm_x,   n, alu_x,   nr, wm_x, n,  n,   n,   n    )
 
       # setting the actual write address
       
       s.rf_waddr_D.value = s.inst_D[RD]
 
+      # jumps, jalr adds the imm to rs1 instead of the pc
+
+      s.jump_D.value     = ( s.br_type_D == br_jal ) | ( s.br_type_D == br_jalr )
+      s.jalr_sel_D.value = ( s.br_type_D == br_jalr )
+
       # csrr/csrw logic
 
       s.proc2mngr_val_D.value = s.csrw_D & ( s.inst_D[CSRNUM] == CSR_PROC2MNGR )
@@ -376,7 +424,13 @@ class ProcBaseCtrlPRTL( Model ):
 
     s.ostall_mngr_D       = Wire( 1 )
 
+    # ostall due to imul
+
+    s.ostall_imul_D       = Wire( 1 )
+
     # hazards checking logic
+    # The instruction in D depends on an instruction in X, M, or W if it
+    # reads a register which that instruction writes.
 
     @s.combinational
     def comb_hazard_D():
@@ -399,9 +453,48 @@ class ProcBaseCtrlPRTL( Model ):
                                        ( s.inst_D[ RS2 ] == s.rf_waddr_W ) &
                                        ( s.rf_waddr_W != 0 )                      )
 
-      s.ostall_hazard_D.value      = ( s.ostall_waddr_X_rs1_D | s.ostall_waddr_M_rs1_D |
-                                       s.ostall_waddr_W_rs1_D | s.ostall_waddr_X_rs2_D |
-                                       s.ostall_waddr_M_rs2_D | s.ostall_waddr_W_rs2_D   )
+    # Without bypassing we stall until the instruction we depend on has
+    # written the register file. With bypassing we use its result as soon
+    # as it has been computed. The only exception is a load in X, since
+    # the load data only arrives in M, so we have to stall for one cycle.
+    # The latest instruction has priority if more than one matches.
+
+    if not bypass:
+
+      @s.combinational
+      def comb_stall_D():
+        s.ostall_hazard_D.value = ( s.ostall_waddr_X_rs1_D | s.ostall_waddr_M_rs1_D |
+                                    s.ostall_waddr_W_rs1_D | s.ostall_waddr_X_rs2_D |
+                                    s.ostall_waddr_M_rs2_D | s.ostall_waddr_W_rs2_D   )
+
+    else:
+
+      # bypass mux select
+
+      byp_rf = Bits( 2, 0 ) # use data from RF
+      byp_x  = Bits( 2, 1 ) # bypass execution result from X
+      byp_m  = Bits( 2, 2 ) # bypass writeback result from M
+      byp_w  = Bits( 2, 3 ) # bypass writeback result from W
+
+      @s.combinational
+      def comb_bypass_D():
+
+        # load-use stall
+
+        s.ostall_hazard_D.value = ( ( s.ostall_waddr_X_rs1_D | s.ostall_waddr_X_rs2_D ) &
+                                    ( s.dmemreq_type_X == ld )                            )
+
+        # bypass mux selects
+
+        if   s.ostall_waddr_X_rs1_D: s.op1_byp_sel_D.value = byp_x
+        elif s.ostall_waddr_M_rs1_D: s.op1_byp_sel_D.value = byp_m
+        elif s.ostall_waddr_W_rs1_D: s.op1_byp_sel_D.value = byp_w
+        else:                        s.op1_byp_sel_D.value = byp_rf
+
+        if   s.ostall_waddr_X_rs2_D: s.op2_byp_sel_D.value = byp_x
+        elif s.ostall_waddr_M_rs2_D: s.op2_byp_sel_D.value = byp_m
+        elif s.ostall_waddr_W_rs2_D: s.op2_byp_sel_D.value = byp_w
+        else:                        s.op2_byp_sel_D.value = byp_rf
 
     s.next_val_D = Wire( 1 )
 
@@ -412,9 +505,14 @@ class ProcBaseCtrlPRTL( Model ):
 
       s.ostall_mngr_D.value = s.mngr2proc_rdy_D & ~s.mngr2proc_val
 
+      # ostall if the multiplier is still busy with the previous mul
+
+      s.ostall_imul_D.value = s.imul_D & ~s.imul_req_rdy_D
+
       # put together all ostall conditions
 
-      s.ostall_D.value      = s.val_D & ( s.ostall_mngr_D | s.ostall_hazard_D );
+      s.ostall_D.value      = s.val_D & ( s.ostall_mngr_D | s.ostall_hazard_D |
+                                          s.ostall_imul_D                       );
 
       # stall in D stage
       # Note that, in the same combinational block, we have to calculate
@@ -424,18 +522,27 @@ class ProcBaseCtrlPRTL( Model ):
       s.stall_D.value       = s.val_D & ( s.ostall_D | s.ostall_X |
                                           s.ostall_M | s.ostall_W   )
 
-      # osquash due to jumps, not implemented yet
-
-      s.osquash_D.value     = 0
-
       # squash in D stage
 
       s.squash_D.value      = s.val_D & s.osquash_X
 
+      # osquash due to jumps
+      # Note that, in the same combinational block, we have to calculate
+      # s.stall_D and s.squash_D first then use them in osquash_D, since
+      # a jump must not redirect the PC while it is stalling (e.g., jalr
+      # waiting for rs1) or if it is getting squashed itself.
+
+      s.osquash_D.value     = s.val_D & ~s.stall_D & ~s.squash_D & s.jump_D
+
       # mngr2proc port
 
       s.mngr2proc_rdy.value = s.val_D & ~s.stall_D & s.mngr2proc_rdy_D
 
+      # send imul request if not stalling or squashed, the operands come
+      # from D and the response is picked up in X
+
+      s.imul_req_val_D.value = s.val_D & ~s.stall_D & ~s.squash_D & s.imul_D
+
       # next valid bit
 
       s.next_val_D.value    = s.val_D & ~s.stall_D & ~s.squash_D
@@ -455,6 +562,8 @@ class ProcBaseCtrlPRTL( Model ):
     s.wb_result_sel_X  = Wire( 1 )
     s.stats_en_wen_X   = Wire( 1 )
     s.br_type_X        = Wire( 3 )
+    s.pred_taken_X     = Wire( 1 )
+    s.imul_X           = Wire( 1 )
 
     @s.posedge_clk
     def reg_X():
@@ -472,39 +581,64 @@ class ProcBaseCtrlPRTL( Model ):
         s.wb_result_sel_X.next  = s.wb_result_sel_D
         s.stats_en_wen_X.next   = s.stats_en_wen_D
         s.br_type_X.next        = s.br_type_D
+        s.pred_taken_X.next     = s.pred_taken_D
+        s.imul_X.next           = s.imul_D
 
     # Branch logic
+    # We have to redirect the PC if the branch does not go the way we
+    # predicted in F (without the branch predictor we always predict not
+    # taken). A mispredicted taken branch goes to the branch target, a
+    # mispredicted not taken branch goes to the instruction after it.
 
     @s.combinational
     def comb_br_X():
       if s.val_X and ( s.br_type_X == br_bne ):
-        s.pc_redirect_X.value = ~s.br_cond_eq_X
+        s.br_taken_X.value = ~s.br_cond_eq_X
       else:
-        s.pc_redirect_X.value = 0
+        s.br_taken_X.value = 0
+
+      s.pc_redirect_X.value  = s.val_X & ( s.br_taken_X != s.pred_taken_X )
+      s.redirect_sel_X.value = ~s.br_taken_X
 
     s.next_val_X = Wire( 1 )
 
+    # ostall due to imul
+
+    s.ostall_imul_X = Wire( 1 )
+
     @s.combinational
     def comb_X():
-      # ostall due to dmemreq
+      # ostall due to dmemreq, or until the multiplier is done
 
-      s.ostall_X.value    = s.val_X & ( s.dmemreq_type_X != nr ) & ~s.dmemreq_rdy
+      s.ostall_imul_X.value = s.val_X & s.imul_X & ~s.imul_resp_val_X
+
+      s.ostall_X.value    = ( s.val_X & ( s.dmemreq_type_X != nr ) & ~s.dmemreq_rdy
+                              | s.ostall_imul_X )
 
       # stall in X stage
 
       s.stall_X.value     = s.val_X & ( s.ostall_X | s.ostall_M | s.ostall_W )
 
-      # osquash due to taken branches
+      # osquash due to mispredicted branches
       # Note that, in the same combinational block, we have to calculate
       # s.stall_X first then use it in osquash_X. Several people have
       # stuck here just because they calculate osquash_X before stall_X!
 
       s.osquash_X.value   = s.val_X & ~s.stall_X & s.pc_redirect_X
 
+      # update the branch predictor once the branch is resolved
+
+      s.bpred_update_X.value = s.val_X & ~s.stall_X & ( s.br_type_X == br_bne )
+
       # send dmemreq if not stalling
 
       s.dmemreq_val.value = s.val_X & ~s.stall_X & ( s.dmemreq_type_X != nr )
 
+      # take imul response if not stalling, and use it as the result
+
+      s.imul_resp_rdy_X.value = s.val_X & ~s.stall_X & s.imul_X
+      s.ex_result_sel_X.value = s.imul_X
+
       # next valid bit
 
       s.next_val_X.value  = s.val_X & ~s.stall_X
@@ -563,7 +697,7 @@ class ProcBaseCtrlPRTL( Model ):
     #---------------------------------------------------------------------
 
     @s.combinational
-    def comb_W():
+    def comb_reg_en_W():
       s.reg_en_W.value = ~s.stall_W
 
     s.inst_type_W            = Wire( 8 )
@@ -8,6 +8,7 @@
 `include "vc/trace.v"
 
 `include "lab2_proc/TinyRV2InstVRTL.v"
+`include "lab2_proc/ProcPerfCountersVRTL.v"
 
 module lab2_proc_ProcBaseCtrlVRTL
 (
@@ -49,6 +50,7 @@ module lab2_proc_ProcBaseCtrlVRTL
   output logic        op1_sel_D,
   output logic [1:0]  op2_sel_D,
   output logic [1:0]  csrr_sel_D,
+  output logic [31:0] perf_data_D,
   output logic [2:0]  imm_type_D,
   output logic        imul_req_val_D,
 
@@ -75,6 +77,7 @@ module lab2_proc_ProcBaseCtrlVRTL
   input  logic        imul_resp_val_X,
 
   output logic        stats_en_wen_W,
+  input  logic        stats_en,
 
   output logic        commit_inst
 
@@ -487,6 +490,8 @@ module lab2_proc_ProcBaseCtrlVRTL
       csrr_sel_D       = 2'h1;
     if ( csrr_D && inst_csr_D == `RV2ISA_CPR_COREID )
       csrr_sel_D       = 2'h2;
+    if ( csrr_D && ( inst_csr_D & 12'hFE0 ) == `RV2ISA_CPR_CYCLE )
+      csrr_sel_D       = 2'h3;
   end
 
   // mngr2proc_rdy signal for csrr instruction
@@ -768,6 +773,32 @@ module lab2_proc_ProcBaseCtrlVRTL
 
   assign commit_inst = val_W && !stall_W;
 
+  //----------------------------------------------------------------------
+  // Performance counters
+  //----------------------------------------------------------------------
+  // Counters for cycles, committed instructions, stalls, and squashes
+  // while stats_en is set. We read them in D with csrr.
+
+  lab2_proc_ProcPerfCountersVRTL perf_counters
+  (
+    .clk              (clk),
+    .reset            (reset),
+
+    .stats_en         (stats_en),
+
+    .commit_inst      (commit_inst),
+    .ostall_imem      (ostall_F),
+    .ostall_hazard    (val_D && ostall_hazard_D),
+    .ostall_mngr2proc (ostall_mngr2proc_D),
+    .ostall_X         (ostall_X),
+    .ostall_M         (ostall_M),
+    .ostall_proc2mngr (ostall_W),
+    .squash           (osquash_D || osquash_X),
+
+    .raddr            (inst_csr_D[4:0]),
+    .rdata            (perf_data_D)
+  );
+
 endmodule
 
 `endif
@@ -9,6 +9,8 @@ from pclib.ifcs import InValRdyBundle, OutValRdyBundle
 from pclib.ifcs import MemReqMsg4B, MemRespMsg4B
 
 from ProcDpathComponentsPRTL import AluPRTL, ImmGenPRTL
+from BranchPredictorPRTL     import BranchPredictorPRTL
+from IntMulVarLatPRTL        import IntMulVarLatPRTL
 from TinyRV2InstPRTL         import OPCODE, RS1, RS2, RD, SHAMT
 
 #-------------------------------------------------------------------------
@@ -24,7 +26,12 @@ c_reset_inst   = 0
 
 class ProcBaseDpathPRTL( Model ):
 
-  def __init__( s, num_cores = 1 ):
+  # With bypass we put bypass muxes in front of the operands in D, which
+  # choose between the register file and the results in X, M, and W (see
+  # ProcAltPRTL).
+
+  def __init__( s, num_cores = 1, bpred = False, btb_nentries = 16,
+                bht_nentries = 64, bypass = False ):
 
     #---------------------------------------------------------------------
     # Interface
@@ -49,18 +56,34 @@ class ProcBaseDpathPRTL( Model ):
     s.mngr2proc_data    = InPort ( 32 )
     s.proc2mngr_data    = OutPort( 32 )
 
+    # imul ports
+
+    s.imul_req_val_D    = InPort ( 1 )
+    s.imul_req_rdy_D    = OutPort( 1 )
+
+    s.imul_resp_val_X   = OutPort( 1 )
+    s.imul_resp_rdy_X   = InPort ( 1 )
+
     # Control signals (ctrl->dpath)
 
     s.reg_en_F          = InPort ( 1 )
     s.pc_sel_F          = InPort ( 2 )
 
     s.reg_en_D          = InPort ( 1 )
+    if bypass:
+      s.op1_byp_sel_D   = InPort ( 2 )
+      s.op2_byp_sel_D   = InPort ( 2 )
     s.op2_sel_D         = InPort ( 2 )
     s.csrr_sel_D        = InPort ( 2 )
     s.imm_type_D        = InPort ( 3 )
+    s.jalr_sel_D        = InPort ( 1 )
 
     s.reg_en_X          = InPort ( 1 )
     s.alu_fn_X          = InPort ( 4 )
+    s.ex_result_sel_X   = InPort ( 1 )
+    s.redirect_sel_X    = InPort ( 1 )
+    s.br_taken_X        = InPort ( 1 )
+    s.bpred_update_X    = InPort ( 1 )
 
     s.reg_en_M          = InPort ( 1 )
     s.wb_result_sel_M   = InPort ( 1 )
@@ -72,6 +95,7 @@ class ProcBaseDpathPRTL( Model ):
 
     # Status signals (dpath->Ctrl)
 
+    s.pred_taken_F      = OutPort( 1 )
     s.inst_D            = OutPort( 32 )
     s.br_cond_eq_X      = OutPort( 1 )
 
@@ -96,14 +120,40 @@ class ProcBaseDpathPRTL( Model ):
 
     # forward delaration for branch target and jal target
 
-    s.br_target_X  = Wire( 32 )
+    s.br_target_X       = Wire( 32 )
+    s.redirect_target_X = Wire( 32 )
+    s.jump_target_D     = Wire( 32 )
+
+    # Branch predictor
+    # Without the predictor we always predict not taken.
+
+    s.pred_target_F = Wire( 32 )
+
+    if bpred:
+
+      s.bpred_F = m = BranchPredictorPRTL( btb_nentries, bht_nentries )
+      s.connect_pairs(
+        m.pc_F,          s.pc_F,
+        m.pred_taken_F,  s.pred_taken_F,
+        m.pred_target_F, s.pred_target_F,
+        m.update_en,     s.bpred_update_X,
+        m.update_taken,  s.br_taken_X,
+        m.update_target, s.br_target_X
+      )
+
+    else:
+
+      s.connect( s.pred_taken_F,  0 )
+      s.connect( s.pred_target_F, 0 )
 
     # PC sel mux
 
     s.pc_sel_mux_F = m = Mux( dtype = 32, nports = 4 )
     s.connect_pairs(
       m.in_[0],  s.pc_plus4_F,
-      m.in_[1],  s.br_target_X,
+      m.in_[1],  s.redirect_target_X,
+      m.in_[2],  s.jump_target_D,
+      m.in_[3],  s.pred_target_F,
       m.sel,     s.pc_sel_F
     )
 
@@ -134,6 +184,11 @@ class ProcBaseDpathPRTL( Model ):
       m.in_, s.pc_F,
     )
 
+    # PC+4 incrementer, the return address of jal/jalr
+
+    s.pc_incr_D = m = Incrementer( nbits = 32, increment_amount = 4 )
+    s.connect( m.in_, s.pc_reg_D.out )
+
     # Instruction reg
     
     s.inst_D_reg = m = RegEnRst( dtype = 32, reset_value = c_reset_inst )
@@ -165,6 +220,49 @@ class ProcBaseDpathPRTL( Model ):
       m.wr_data,    s.rf_wdata_W
     )
 
+    # Operands
+    # Without bypassing the operands always come from the register file.
+
+    s.op1_D = Wire( 32 )
+    s.op2_D = Wire( 32 )
+
+    if bypass:
+
+      # forward declaration for the bypassed results
+
+      s.byp_data_X = Wire( 32 )
+      s.byp_data_M = Wire( 32 )
+      s.byp_data_W = Wire( 32 )
+
+      # op1 bypass mux
+
+      s.op1_byp_mux_D = m = Mux( dtype = 32, nports = 4 )
+      s.connect_pairs(
+        m.in_[0], s.rf_rdata0_D,
+        m.in_[1], s.byp_data_X,
+        m.in_[2], s.byp_data_M,
+        m.in_[3], s.byp_data_W,
+        m.sel,    s.op1_byp_sel_D,
+        m.out,    s.op1_D
+      )
+
+      # op2 bypass mux
+
+      s.op2_byp_mux_D = m = Mux( dtype = 32, nports = 4 )
+      s.connect_pairs(
+        m.in_[0], s.rf_rdata1_D,
+        m.in_[1], s.byp_data_X,
+        m.in_[2], s.byp_data_M,
+        m.in_[3], s.byp_data_W,
+        m.sel,    s.op2_byp_sel_D,
+        m.out,    s.op2_D
+      )
+
+    else:
+
+      s.connect( s.op1_D, s.rf_rdata0_D )
+      s.connect( s.op2_D, s.rf_rdata1_D )
+
     # Immediate generator
     
     s.imm_gen_D = m = ImmGenPRTL()
@@ -184,25 +282,44 @@ class ProcBaseDpathPRTL( Model ):
     )
 
     # op2 sel mux
-    # This mux chooses among RS2, imm, and the output of the above csrr
-    # sel mux. Basically we are using two muxes here for pedagogy.
+    # This mux chooses among RS2, imm, the output of the above csrr sel
+    # mux, and PC+4 (for jal/jalr). Basically we are using two muxes here
+    # for pedagogy.
 
-    s.op2_sel_mux_D = m = Mux( dtype = 32, nports = 3 )
+    s.op2_sel_mux_D = m = Mux( dtype = 32, nports = 4 )
     s.connect_pairs(
-      m.in_[0], s.rf_rdata1_D,
+      m.in_[0], s.op2_D,
       m.in_[1], s.imm_gen_D.imm,
       m.in_[2], s.csrr_sel_mux_D.out,
+      m.in_[3], s.pc_incr_D.out,
       m.sel,    s.op2_sel_D,
     )
 
-    # Risc-V always calcs branch/jal target by adding imm(generated above) to PC
+    # Risc-V always calcs branch/jal target by adding imm(generated above)
+    # to PC, and jalr target by adding imm to RS1. RS1 is only used once
+    # jalr does not stall anymore (i.e., once it is in the register file
+    # or can be bypassed).
+
+    s.target_base_mux_D = m = Mux( dtype = 32, nports = 2 )
+    s.connect_pairs(
+      m.in_[0], s.pc_reg_D.out,
+      m.in_[1], s.op1_D,
+      m.sel,    s.jalr_sel_D,
+    )
 
     s.pc_plus_imm_D = m = Adder( 32 )
     s.connect_pairs(
-      m.in0, s.pc_reg_D.out,
+      m.in0, s.target_base_mux_D.out,
       m.in1, s.imm_gen_D.imm
     )
 
+    # Jumps are resolved in D. jalr clears the lowest bit of the target,
+    # which is always zero for jal anyway.
+
+    @s.combinational
+    def jump_target_logic_D():
+      s.jump_target_D.value = concat( s.pc_plus_imm_D.out[1:32], Bits( 1, 0 ) )
+
     #---------------------------------------------------------------------
     # X stage
     #---------------------------------------------------------------------
@@ -218,12 +335,38 @@ class ProcBaseDpathPRTL( Model ):
       m.out, s.br_target_X
     )
 
+    # PC reg in X stage
+    # If we predicted a branch as taken but it is not taken, we have to
+    # redirect the PC to the instruction after the branch.
+
+    s.pc_reg_X = m = RegEnRst( dtype = 32, reset_value = 0 )
+    s.connect_pairs(
+      m.en,  s.reg_en_X,
+      m.in_, s.pc_reg_D.out,
+    )
+
+    s.pc_incr_X = m = Incrementer( nbits = 32, increment_amount = 4 )
+    s.connect( m.in_, s.pc_reg_X.out )
+
+    # Redirect target mux
+
+    s.redirect_target_mux_X = m = Mux( dtype = 32, nports = 2 )
+    s.connect_pairs(
+      m.in_[0], s.br_target_X,
+      m.in_[1], s.pc_incr_X.out,
+      m.sel,    s.redirect_sel_X,
+      m.out,    s.redirect_target_X
+    )
+
+    if bpred:
+      s.connect( s.bpred_F.update_pc, s.pc_reg_X.out )
+
     # op1 reg
 
     s.op1_reg_X = m = RegEnRst( dtype = 32, reset_value = 0 )
     s.connect_pairs(
       m.en,  s.reg_en_X,
-      m.in_, s.rf_rdata0_D,
+      m.in_, s.op1_D,
     )
 
     # op2 reg
@@ -248,6 +391,34 @@ class ProcBaseDpathPRTL( Model ):
 
     s.connect( s.dmemreq_msg_addr, s.alu_X.out )
 
+    # Integer multiplier
+    # The request with the operands is sent from D, the response is
+    # picked up in X.
+
+    s.imul = m = IntMulVarLatPRTL()
+    s.connect_pairs(
+      m.req.msg[32:64], s.op1_D,
+      m.req.msg[ 0:32], s.op2_sel_mux_D.out,
+      m.req.val,        s.imul_req_val_D,
+      m.req.rdy,        s.imul_req_rdy_D,
+      m.resp.val,       s.imul_resp_val_X,
+      m.resp.rdy,       s.imul_resp_rdy_X,
+    )
+
+    # Execution result sel mux
+
+    s.ex_result_sel_mux_X = m = Mux( dtype = 32, nports = 2 )
+    s.connect_pairs(
+      m.in_[0], s.alu_X.out,
+      m.in_[1], s.imul.resp.msg,
+      m.sel,    s.ex_result_sel_X
+    )
+
+    # bypass the execution result
+
+    if bypass:
+      s.connect( s.byp_data_X, s.ex_result_sel_mux_X.out )
+
     #---------------------------------------------------------------------
     # M stage
     #---------------------------------------------------------------------
@@ -257,7 +428,7 @@ class ProcBaseDpathPRTL( Model ):
     s.ex_result_reg_M = m = RegEnRst( dtype = 32, reset_value = 0 )
     s.connect_pairs(
       m.en,  s.reg_en_M,
-      m.in_, s.alu_X.out,
+      m.in_, s.ex_result_sel_mux_X.out,
     )
 
     # Writeback result selection mux
@@ -269,6 +440,11 @@ class ProcBaseDpathPRTL( Model ):
       m.sel,    s.wb_result_sel_M
     )
 
+    # bypass the writeback result (including the load data)
+
+    if bypass:
+      s.connect( s.byp_data_M, s.wb_result_sel_mux_M.out )
+
     #---------------------------------------------------------------------
     # W stage
     #---------------------------------------------------------------------
@@ -285,6 +461,12 @@ class ProcBaseDpathPRTL( Model ):
 
     s.connect( s.rf_wdata_W, s.wb_result_reg_W.out )
 
+    # bypass the writeback result, the register file is only written at
+    # the end of the cycle
+
+    if bypass:
+      s.connect( s.byp_data_W, s.wb_result_reg_W.out )
+
     s.stats_en_reg_W = m = RegEnRst( dtype = 32, reset_value = 0 )
 
     # stats_en logic
@@ -15,7 +15,13 @@ from DropUnitPRTL        import DropUnitPRTL
 
 class ProcBasePRTL( Model ):
 
-  def __init__( s, num_cores = 1 ):
+  # With bpred we predict branches in the F stage with a BTB and a
+  # bimodal BHT (see BranchPredictorPRTL) instead of always predicting
+  # not taken. With bypass we bypass results into D instead of stalling
+  # on RAW hazards (see ProcAltPRTL).
+
+  def __init__( s, num_cores = 1, bpred = False, btb_nentries = 16,
+                bht_nentries = 64, bypass = False ):
 
     #---------------------------------------------------------------------
     # Interface
@@ -53,8 +59,9 @@ class ProcBasePRTL( Model ):
     # Structural composition
     #---------------------------------------------------------------------
 
-    s.ctrl  = ProcBaseCtrlPRTL()
-    s.dpath = ProcBaseDpathPRTL( num_cores )
+    s.ctrl  = ProcBaseCtrlPRTL( bypass )
+    s.dpath = ProcBaseDpathPRTL( num_cores, bpred, btb_nentries,
+                                 bht_nentries, bypass )
 
     # Connect parameters
 
@@ -119,6 +119,7 @@ module lab2_proc_ProcBaseVRTL
   logic        op1_sel_D;
   logic [1:0]  op2_sel_D;
   logic [1:0]  csrr_sel_D;
+  logic [31:0] perf_data_D;
   logic [2:0]  imm_type_D;
   logic        imul_req_val_D;
 
@@ -228,6 +229,7 @@ module lab2_proc_ProcBaseVRTL
     .op1_sel_D              (op1_sel_D),
     .op2_sel_D              (op2_sel_D),
     .csrr_sel_D             (csrr_sel_D),
+    .perf_data_D            (perf_data_D),
     .imm_type_D             (imm_type_D),
     .imul_req_val_D         (imul_req_val_D),
 
@@ -244,6 +246,7 @@ module lab2_proc_ProcBaseVRTL
     .rf_waddr_W             (rf_waddr_W),
     .rf_wen_W               (rf_wen_W),
     .stats_en_wen_W         (stats_en_wen_W),
+    .stats_en               (stats_en),
 
     // status signals (dpath->ctrl)
 
@@ -351,6 +354,7 @@ module lab2_proc_ProcBaseVRTL
     .op1_sel_D               (op1_sel_D),
     .op2_sel_D               (op2_sel_D),
     .csrr_sel_D              (csrr_sel_D),
+    .perf_data_D             (perf_data_D),
     .imm_type_D              (imm_type_D),
     .imul_req_val_D          (imul_req_val_D),
 
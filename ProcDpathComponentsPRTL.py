@@ -36,6 +36,14 @@ class ImmGenPRTL( Model ):
                                     s.inst[ B_IMM0 ],
                                     Bits( 1, 0 ) )
 
+      elif s.imm_type == 4: # J-type
+
+        s.imm.value = concat( sext( s.inst[ J_IMM3 ], 12 ),
+                                    s.inst[ J_IMM2 ],
+                                    s.inst[ J_IMM1 ],
+                                    s.inst[ J_IMM0 ],
+                                    Bits( 1, 0 ) )
+
       #''' LAB TASK ''''''''''''''''''''''''''''''''''''''''''''''''''''''
       # Add more immediate types
       #'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
@@ -77,6 +85,8 @@ class AluPRTL( Model ):
       elif s.fn == 11: s.out.value = s.in0               # CP OP0
       elif s.fn == 12: s.out.value = s.in1               # CP OP1
       elif s.fn == 1: s.out.value = s.in0 - s.in1       # SUB
+      elif s.fn ==  2: s.out.value = s.in0 & s.in1       # AND
+      elif s.fn ==  3: s.out.value = s.in0 | s.in1       # OR
 
       #''' LAB TASK ''''''''''''''''''''''''''''''''''''''''''''''''''''''
       # Add more ALU functions
@@ -8,7 +8,6 @@ from pclib.ifcs import MemReqMsg4B, MemRespMsg4B
 from pclib.fl   import InValRdyQueueAdapter, OutValRdyQueueAdapter
 from pclib.fl   import BytesMemPortAdapter
 
-from tinyrv2_encoding  import TinyRV2Inst
 from tinyrv2_semantics import TinyRV2Semantics
 
 class ProcFL( Model ):
@@ -52,15 +51,16 @@ class ProcFL( Model ):
     s.mngr2proc_q = InValRdyQueueAdapter  ( s.mngr2proc )
     s.proc2mngr_q = OutValRdyQueueAdapter ( s.proc2mngr )
 
-    # Construct the ISA semantics object
+    # Construct the ISA semantics object. We only use the (slower)
+    # tracing register file if we actually want to trace the registers.
 
     s.isa = TinyRV2Semantics( s.dmem, s.mngr2proc_q, s.proc2mngr_q,
-                              num_cores=num_cores )
+                              num_cores=num_cores, trace_regs=trace_regs )
 
     # Copies of pc and inst for line tracing
 
-    s.pc   = Bits( 32, 0x00000200 )
-    s.inst = Bits( 32, 0x00000000 )
+    s.pc   = 0x00000200
+    s.inst = None
 
     # Stats
 
@@ -71,7 +71,6 @@ class ProcFL( Model ):
     s.trace_regs = trace_regs
 
     s.isa.reset()
-    s.isa.R.trace_regs = trace_regs
 
     # used for counting commited insts
 
@@ -90,7 +89,7 @@ class ProcFL( Model ):
 
         s.num_total_inst += 1
         s.stats_en.next = s.isa.stats_en
-        s.isa.coreid = s.core_id
+        s.isa.coreid = s.core_id.value.uint()
         
         if s.isa.stats_en:
           s.num_inst += 1
@@ -100,10 +99,13 @@ class ProcFL( Model ):
 
         s.trace = " "*33
 
-        # Fetch instruction
+        # Fetch instruction. We only need to go to the instruction
+        # memory (and decode) the first time we see a given PC.
 
-        s.pc   = s.isa.PC.uint()
-        s.inst = TinyRV2Inst( s.imem[ s.pc : s.pc+4 ] )
+        s.pc   = s.isa.PC
+        s.inst = s.isa.decode_cache.get( s.pc )
+        if s.inst is None:
+          s.inst = s.isa.decode( s.pc, s.imem[ s.pc : s.pc+4 ] )
 
         # Set trace string in case the execution function yeilds
 
@@ -0,0 +1,81 @@
+//========================================================================
+// Performance Counters for 5-Stage Pipelined Processor
+//========================================================================
+// A bank of 32-bit event counters which only count while stats_en is
+// set. The counters are mapped to the RISC-V user-level counter CSRs
+// (cycle, instret, and hpmcounter3 to hpmcounter9) and can be read with
+// csrr. The read port takes the low five bits of the CSR number.
+//
+//  0xC00  cycle        cycles
+//  0xC02  instret      committed instructions
+//  0xC03  hpmcounter3  F stalls waiting for the imem response
+//  0xC04  hpmcounter4  D stalls due to RAW hazards
+//  0xC05  hpmcounter5  D stalls waiting for mngr2proc
+//  0xC06  hpmcounter6  X stalls (dmem request not ready, multiplier)
+//  0xC07  hpmcounter7  M stalls waiting for the dmem response
+//  0xC08  hpmcounter8  W stalls due to proc2mngr backpressure
+//  0xC09  hpmcounter9  squashes (taken branches and jumps)
+//
+// The stall counters count the cycles in which each ostall signal is
+// set. More than one stage can stall in the same cycle, so the stall
+// counters do not have to add up to the number of stall cycles.
+
+`ifndef LAB2_PROC_PERF_COUNTERS_V
+`define LAB2_PROC_PERF_COUNTERS_V
+
+module lab2_proc_ProcPerfCountersVRTL
+(
+  input  logic        clk,
+  input  logic        reset,
+
+  input  logic        stats_en,
+
+  // Events
+
+  input  logic        commit_inst,
+  input  logic        ostall_imem,
+  input  logic        ostall_hazard,
+  input  logic        ostall_mngr2proc,
+  input  logic        ostall_X,
+  input  logic        ostall_M,
+  input  logic        ostall_proc2mngr,
+  input  logic        squash,
+
+  // Read port
+
+  input  logic [4:0]  raddr,
+  output logic [31:0] rdata
+);
+
+  localparam c_num_counters = 10;
+
+  // One event per counter, counter 1 (time) never counts
+
+  logic [c_num_counters-1:0] events;
+
+  assign events = { squash, ostall_proc2mngr, ostall_M, ostall_X,
+                    ostall_mngr2proc, ostall_hazard, ostall_imem,
+                    commit_inst, 1'b0, 1'b1 };
+
+  // Counters
+
+  logic [31:0] counters [c_num_counters-1:0];
+
+  integer i;
+
+  always_ff @( posedge clk ) begin
+    for ( i = 0; i < c_num_counters; i = i + 1 ) begin
+      if ( reset )
+        counters[i] <= 32'd0;
+      else if ( stats_en && events[i] )
+        counters[i] <= counters[i] + 32'd1;
+    end
+  end
+
+  // Read port, unused counter CSRs read as zero
+
+  assign rdata = ( raddr < c_num_counters ) ? counters[raddr] : 32'd0;
+
+endmodule
+
+`endif
@@ -121,6 +121,12 @@
 `define RV2ISA_CPR_NUMCORES   12'hFC1
 `define RV2ISA_CPR_STATS_EN   12'h7C1
 
+// Performance counters (cycle, instret, hpmcounter3-31), the low five
+// bits select the counter
+
+`define RV2ISA_CPR_CYCLE      12'hC00
+`define RV2ISA_CPR_INSTRET    12'hC02
+
 //------------------------------------------------------------------------
 // Helper Tasks
 //------------------------------------------------------------------------
@@ -0,0 +1,62 @@
+#=========================================================================
+# proc_bpred_stats
+#=========================================================================
+# Branch prediction statistics for ProcBasePRTL. We look at the branch
+# logic in the X stage of the control unit every cycle and count the
+# resolved branches and how many of them went the other way than
+# predicted in the F stage. Without the branch predictor the processor
+# always predicts not taken, so we get the accuracy of that too.
+#
+#  bpred_stats = BranchPredStats( th.proc )
+#  sim.reset()
+#  while not th.done():
+#    sim.cycle()
+#    bpred_stats.tick()
+#
+
+#-------------------------------------------------------------------------
+# bpred_stats_supported
+#-------------------------------------------------------------------------
+
+def bpred_stats_supported( proc ):
+  return hasattr( proc, "ctrl" ) and hasattr( proc.ctrl, "bpred_update_X" )
+
+#-------------------------------------------------------------------------
+# BranchPredStats
+#-------------------------------------------------------------------------
+
+class BranchPredStats (object):
+
+  def __init__( s, proc ):
+
+    assert bpred_stats_supported( proc ), \
+      "Branch prediction statistics are only supported for ProcBasePRTL!"
+
+    s.ctrl         = proc.ctrl
+    s.num_branches = 0
+    s.num_mispred  = 0
+
+  #-----------------------------------------------------------------------
+  # tick
+  #-----------------------------------------------------------------------
+  # Call once per cycle after sim.cycle(). A branch is resolved in the
+  # cycle it updates the predictor (i.e., when it leaves X).
+
+  def tick( s ):
+
+    c = s.ctrl
+
+    if c.bpred_update_X:
+      s.num_branches += 1
+      if c.pc_redirect_X:
+        s.num_mispred += 1
+
+  #-----------------------------------------------------------------------
+  # accuracy
+  #-----------------------------------------------------------------------
+  # Fraction of correctly predicted branches, None without branches.
+
+  def accuracy( s ):
+    if s.num_branches == 0:
+      return None
+    return 1.0 - float( s.num_mispred ) / s.num_branches
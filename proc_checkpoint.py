@@ -0,0 +1,134 @@
+#=========================================================================
+# proc_checkpoint
+#=========================================================================
+# Save and restore architectural checkpoints. A checkpoint includes the
+# PC, the register file, stats_en, the positions in the mngr2proc and
+# proc2mngr message streams, and the memory contents. We only store the
+# memory pages which are not all zeros, so a checkpoint of a small
+# program is only a few KB even though the test memory is much larger.
+#
+# We save the state of the functional model (i.e., the translator), and
+# restoring a checkpoint gives us back a translator. We can then either
+# keep fast-forwarding or transfer the state into a processor model (see
+# proc_fast_forward). The test harness must already be loaded with the
+# same program, since the checkpoint does not include the mngr messages
+# themselves, only how far we got in each message stream.
+#
+# The file format is little endian:
+#
+#  header   : magic (8B), version, pc, stats_en, num mngr2proc messages
+#             not consumed yet, num proc2mngr messages received, memory
+#             size, page size, num pages (4B each)
+#  regs     : x0 to x31 (4B each)
+#  pages    : page address (4B) followed by the page data
+#
+
+import struct
+
+from tinyrv2_translator import TinyRV2Translator
+
+checkpoint_magic     = "TRV2CKPT"
+checkpoint_version   = 1
+checkpoint_page_size = 4096
+
+checkpoint_header_fmt = "<8s8I"
+
+#-------------------------------------------------------------------------
+# save_checkpoint
+#-------------------------------------------------------------------------
+# Save the state of the translator and the test harness.
+
+def save_checkpoint( filename, translator, th ):
+
+  mem       = th.mem.mem
+  page_size = checkpoint_page_size
+  zero_page = bytearray( page_size )
+
+  # Find the non-zero pages
+
+  page_addrs = [ addr for addr in xrange( 0, len(mem), page_size )
+                 if mem[addr:addr+page_size] != zero_page ]
+
+  # Header and registers
+
+  data = bytearray( struct.pack( checkpoint_header_fmt,
+    checkpoint_magic,
+    checkpoint_version,
+    translator.PC,
+    int( translator.stats_en ),
+    len( th.src.src.msgs ),
+    th.sink.sink.idx,
+    len( mem ),
+    page_size,
+    len( page_addrs ),
+  ))
+
+  data.extend( struct.pack( "<32I", *translator.R ) )
+
+  # Pages
+
+  for addr in page_addrs:
+    data.extend( struct.pack( "<I", addr ) )
+    data.extend( mem[addr:addr+page_size] )
+
+  with open( filename, "wb" ) as fd:
+    fd.write( data )
+
+#-------------------------------------------------------------------------
+# restore_checkpoint
+#-------------------------------------------------------------------------
+# Restore the checkpoint into the test harness, which must be loaded
+# with the same program but must not have been simulated yet. Returns a
+# translator with the architectural state from the checkpoint.
+
+def restore_checkpoint( filename, th, num_cores=1 ):
+
+  with open( filename, "rb" ) as fd:
+    data = fd.read()
+
+  header_nbytes = struct.calcsize( checkpoint_header_fmt )
+
+  ( magic, version, pc, stats_en, mngr2proc_left, proc2mngr_idx,
+    mem_nbytes, page_size, num_pages ) = \
+      struct.unpack_from( checkpoint_header_fmt, data, 0 )
+
+  if magic != checkpoint_magic or version != checkpoint_version:
+    raise Exception( "{} is not a valid checkpoint!".format( filename ) )
+
+  mem = th.mem.mem
+
+  if mem_nbytes != len( mem ):
+    raise Exception( "Checkpoint memory size ({}) does not match test "
+                     "memory size ({})!".format( mem_nbytes, len( mem ) ) )
+
+  # Memory. All pages which are not in the checkpoint are zero.
+
+  mem[:] = bytearray( len( mem ) )
+
+  offset = header_nbytes + 4*32
+  for i in xrange( num_pages ):
+    addr = struct.unpack_from( "<I", data, offset )[0]
+    mem[addr:addr+page_size] = data[offset+4:offset+4+page_size]
+    offset += 4 + page_size
+
+  # Message streams
+
+  msgs = th.src.src.msgs
+
+  if mngr2proc_left > len( msgs ) or proc2mngr_idx > len( th.sink.sink.msgs ):
+    raise Exception( "Checkpoint does not match the loaded program!" )
+
+  while len( msgs ) > mngr2proc_left:
+    msgs.popleft()
+
+  th.sink.sink.idx = proc2mngr_idx
+
+  # Architectural state
+
+  translator = TinyRV2Translator( mem, msgs, [], num_cores )
+
+  translator.PC       = pc
+  translator.stats_en = bool( stats_en )
+  translator.R[:]     = list( struct.unpack_from( "<32I", data, header_nbytes ) )
+
+  return translator
@@ -0,0 +1,158 @@
+#=========================================================================
+# proc_cpi_stack
+#=========================================================================
+# Per-stage stall and squash accounting (CPI stack) for ProcBasePRTL
+# (and ProcAltPRTL, which only stalls on load-use hazards). We
+# look at the stall and squash signals of the control unit every cycle
+# and attribute every cycle in which no instruction commits to a cause.
+#
+# A cycle without a commit is either a W stage stall (proc2mngr
+# backpressure) or a bubble in the W stage. A bubble can be inserted
+# into any stage and then travels down the pipeline, so we keep track of
+# the cause of the bubble in each stage (i.e., a shadow copy of the
+# pipeline registers) and attribute the cycle once the bubble reaches W.
+# The cause of a bubble is the stall or squash signal which kept the
+# previous stage from sending an instruction: either its own ostall
+# signal, or the ostall signal of a later stage if all stages in between
+# are empty.
+#
+#  cpi_stack = CpiStack( th.proc )
+#  sim.reset()
+#  while not th.done():
+#    sim.cycle()
+#    cpi_stack.tick()
+#
+
+#-------------------------------------------------------------------------
+# Causes
+#-------------------------------------------------------------------------
+
+cpi_stack_causes = [
+  "commit",     # an instruction commits
+  "imem",       # waiting for imem response (or for the first fetch)
+  "raw_X",      # RAW hazard on rs1/rs2 from an instruction in X
+  "raw_M",      # RAW hazard on rs1/rs2 from an instruction in M
+  "raw_W",      # RAW hazard on rs1/rs2 from an instruction in W
+  "mngr2proc",  # waiting for a mngr2proc message
+  "imul",       # waiting for the multiplier
+  "dmem_req",   # dmem request not ready
+  "dmem_resp",  # waiting for dmem response
+  "proc2mngr",  # proc2mngr backpressure
+  "squash",     # squashed by a taken branch or a jump
+]
+
+#-------------------------------------------------------------------------
+# cpi_stack_supported
+#-------------------------------------------------------------------------
+# We need access to the stall and squash signals inside the control
+# unit, so this only works for the PyMTL RTL models of the processor.
+
+def cpi_stack_supported( proc ):
+  return hasattr( proc, "ctrl" ) and hasattr( proc.ctrl, "ostall_hazard_D" ) \
+     and hasattr( proc.ctrl, "ostall_imul_X" )
+
+#-------------------------------------------------------------------------
+# CpiStack
+#-------------------------------------------------------------------------
+
+class CpiStack (object):
+
+  def __init__( s, proc ):
+
+    assert cpi_stack_supported( proc ), \
+      "The CPI stack is only supported for ProcBasePRTL and ProcAltPRTL!"
+
+    s.ctrl   = proc.ctrl
+    s.counts = dict([ ( cause, 0 ) for cause in cpi_stack_causes ])
+
+    # Cause of the bubble in each stage. The pipeline is empty after
+    # reset, so all stages are waiting for the first fetch.
+
+    s.bubble_D = "imem"
+    s.bubble_X = "imem"
+    s.bubble_M = "imem"
+    s.bubble_W = "imem"
+
+  #-----------------------------------------------------------------------
+  # Causes of stalls
+  #-----------------------------------------------------------------------
+  # Cause of a bubble which is inserted because stage A stalls, checking
+  # the ostall signals from stage A to W in order. In D a RAW hazard
+  # takes precedence over the multiplier (the mul request is only sent
+  # once the operands are available anyway). With bypassing the
+  # instruction in D can depend on an instruction without stalling, so
+  # we only look at the dependencies if there is a hazard stall.
+
+  def ostall_cause_D( s ):
+    c = s.ctrl
+    if   not c.ostall_D:             return s.ostall_cause_X()
+    elif c.ostall_mngr_D:            return "mngr2proc"
+    elif c.ostall_hazard_D:
+      if   c.ostall_waddr_X_rs1_D:   return "raw_X"
+      elif c.ostall_waddr_X_rs2_D:   return "raw_X"
+      elif c.ostall_waddr_M_rs1_D:   return "raw_M"
+      elif c.ostall_waddr_M_rs2_D:   return "raw_M"
+      else:                          return "raw_W"
+    else:                            return "imul"
+
+  def ostall_cause_X( s ):
+    if   s.ctrl.ostall_imul_X: return "imul"
+    elif s.ctrl.ostall_X:      return "dmem_req"
+    else:                      return s.ostall_cause_M()
+
+  def ostall_cause_M( s ):
+    if s.ctrl.ostall_M: return "dmem_resp"
+    else:               return "proc2mngr"
+
+  #-----------------------------------------------------------------------
+  # tick
+  #-----------------------------------------------------------------------
+  # Call once per cycle after sim.cycle() (i.e., when the combinational
+  # signals of the current cycle have settled).
+
+  def tick( s ):
+
+    c = s.ctrl
+
+    # Attribute the current cycle
+
+    if c.commit_inst:
+      s.counts["commit"] += 1
+    elif c.val_W:
+      s.counts["proc2mngr"] += 1
+    else:
+      s.counts[ s.bubble_W ] += 1
+
+    # Move the bubbles down the pipeline. A stage only gets a new cause
+    # if its pipeline register is enabled and the previous stage does
+    # not send an instruction.
+
+    if c.reg_en_W and not c.next_val_M:
+      if   not c.val_M: s.bubble_W = s.bubble_M
+      else:             s.bubble_W = s.ostall_cause_M()
+
+    if c.reg_en_M and not c.next_val_X:
+      if   not c.val_X: s.bubble_M = s.bubble_X
+      else:             s.bubble_M = s.ostall_cause_X()
+
+    if c.reg_en_X and not c.next_val_D:
+      if   not c.val_D: s.bubble_X = s.bubble_D
+      elif c.squash_D:  s.bubble_X = "squash"
+      else:             s.bubble_X = s.ostall_cause_D()
+
+    if c.reg_en_D and not c.next_val_F:
+      if   not c.val_F: s.bubble_D = "imem"
+      elif c.squash_F:  s.bubble_D = "squash"
+      elif c.ostall_F:  s.bubble_D = "imem"
+      else:             s.bubble_D = s.ostall_cause_D()
+
+  #-----------------------------------------------------------------------
+  # cpi_stack
+  #-----------------------------------------------------------------------
+  # Returns a list of ( cause, num_cycles, cpi ) tuples in the order of
+  # cpi_stack_causes. The CPI contributions add up to the total CPI.
+
+  def cpi_stack( s ):
+    num_insts = max( s.counts["commit"], 1 )
+    return [ ( cause, s.counts[cause], float( s.counts[cause] ) / num_insts )
+             for cause in cpi_stack_causes ]
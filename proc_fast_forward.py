@@ -0,0 +1,144 @@
+#=========================================================================
+# proc_fast_forward
+#=========================================================================
+# Helpers for fast-forwarding through the first part of a program. We
+# run the first N instructions with the translation-based functional
+# model directly on the memory and mngr queues of the test harness, and
+# then transfer the architectural state (PC, register file, stats_en)
+# into the processor model. The cycle-level simulation then continues
+# from where the functional model stopped, so long programs only pay
+# the cost of cycle-level simulation for the region of interest.
+#
+# The fast-forward must happen _before_ we reset the simulator so that
+# the test source picks up the first mngr2proc message which has not
+# been consumed yet. See transfer_state for when the state transfer has
+# to happen relative to reset.
+#
+#  translator = fast_forward( th, num_insts )
+#  reset_and_transfer_state( sim, translator, th.proc )
+#
+
+from pymtl              import Bits
+from tinyrv2_translator import TinyRV2Translator
+
+#-------------------------------------------------------------------------
+# fast_forward
+#-------------------------------------------------------------------------
+# Run up to num_insts instructions on the functional model. The model
+# operates directly on the test memory and takes mngr2proc messages
+# directly from the test source. Messages sent to the manager are
+# checked against (and consumed from) the test sink. Returns the
+# translator so that we can transfer its state into the processor. We
+# can pass in the translator from a previous call to keep going from
+# where it stopped.
+
+def fast_forward( th, num_insts, num_cores=1, translator=None ):
+
+  if translator is None:
+    translator = TinyRV2Translator( th.mem.mem, th.src.src.msgs, [],
+                                    num_cores )
+
+  translator.run( num_insts )
+
+  # Check the proc2mngr messages just like the test sink would
+
+  sink      = th.sink.sink
+  proc2mngr = translator.proc2mngr_queue
+
+  for msg in proc2mngr:
+
+    assert sink.idx < len( sink.msgs ), \
+      "Received more messages than expected during fast-forward!"
+
+    assert sink.msgs[ sink.idx ] == msg, \
+      "Received unexpected message during fast-forward ({:0>8x} != {:0>8x})!" \
+        .format( msg, int( sink.msgs[ sink.idx ] ) )
+
+    sink.idx += 1
+
+  del proc2mngr[:]
+
+  return translator
+
+#-------------------------------------------------------------------------
+# fast_forward_done
+#-------------------------------------------------------------------------
+# Same as the done signal of the test harness: all mngr2proc messages
+# have been consumed and all proc2mngr messages have been received.
+
+def fast_forward_done( th ):
+  return len( th.src.src.msgs ) == 0 \
+     and th.sink.sink.idx == len( th.sink.sink.msgs )
+
+#-------------------------------------------------------------------------
+# state_transfer_supported
+#-------------------------------------------------------------------------
+# We can transfer state into the FL model and the PyMTL RTL models, but
+# not into the Verilog models since they do not expose their internal
+# state.
+
+def state_transfer_supported( proc ):
+  return hasattr( proc, "isa" ) or hasattr( proc, "dpath" )
+
+#-------------------------------------------------------------------------
+# transfer_state
+#-------------------------------------------------------------------------
+# The FL model keeps ticking during reset and immediately starts to
+# fetch from its PC, so we have to transfer its state _before_ reset.
+# This only works if the FL model has not been simulated yet, since
+# otherwise it might be blocked in the middle of an instruction.
+#
+# The RTL model has to be transferred _after_ reset, since reset would
+# overwrite the PC. The F stage fetches from the PC register plus four
+# right after reset, so we set the PC register to the instruction
+# before the one we want to fetch. The control unit does not send any
+# requests during reset, so nothing has been fetched from the reset PC
+# yet.
+
+def transfer_state( translator, proc ):
+
+  # FL model
+
+  if hasattr( proc, "isa" ):
+
+    proc.isa.PC       = translator.PC
+    proc.isa.stats_en = translator.stats_en
+
+    for i in xrange( 32 ):
+      proc.isa.R[i] = translator.R[i]
+
+  # RTL model
+
+  elif hasattr( proc, "dpath" ):
+
+    dpath = proc.dpath
+
+    dpath.pc_reg_F.out.value       = Bits( 32, translator.PC - 4 )
+    dpath.stats_en_reg_W.out.value = Bits( 32, translator.stats_en )
+
+    for i in xrange( 32 ):
+      dpath.rf.regs[i].value = Bits( 32, translator.R[i] )
+
+  else:
+    raise Exception( "Cannot transfer state into {}!"
+                     .format( proc.__class__.__name__ ) )
+
+#-------------------------------------------------------------------------
+# reset_and_transfer_state
+#-------------------------------------------------------------------------
+# Reset the simulator and transfer the state in the right order for the
+# given processor model. We can hold reset for more than the usual two
+# cycles (e.g., to drain memory responses which are still in flight).
+
+def reset_and_transfer_state( sim, translator, proc, reset_cycles=2 ):
+
+  if hasattr( proc, "isa" ):
+    transfer_state( translator, proc )
+
+  sim.model.reset.value = 1
+  for i in xrange( reset_cycles ):
+    sim.cycle()
+  sim.model.reset.value = 0
+
+  if not hasattr( proc, "isa" ):
+    transfer_state( translator, proc )
@@ -0,0 +1,114 @@
+#=========================================================================
+# proc_icache
+#=========================================================================
+# Put an instruction cache between the imem port of a processor and the
+# test memory. icache_proc returns something that looks like a processor
+# class so that we can pass it to the test harness:
+#
+#  th = TestHarness( icache_proc( ProcBasePRTL, ICachePRTL, 1024, 16, 2 ),
+#                    ... )
+#
+# The processor itself is th.proc.proc (e.g., for the CPI stack), and
+# the cache is th.proc.icache. Both ICachePRTL and ICacheFL count the
+# accesses and misses, see icache_stats.
+#
+
+from pymtl      import *
+from pclib.ifcs import InValRdyBundle, OutValRdyBundle
+from pclib.ifcs import MemReqMsg4B, MemRespMsg4B
+
+from ICachePRTL import ICachePRTL
+from ICacheFL   import ICacheFL
+
+#-------------------------------------------------------------------------
+# Tables
+#-------------------------------------------------------------------------
+
+icache_impl_dict = {
+  "rtl": ICachePRTL,
+  "fl" : ICacheFL,
+}
+
+#-------------------------------------------------------------------------
+# ProcICache
+#-------------------------------------------------------------------------
+
+class ProcICache( Model ):
+
+  def __init__( s, ProcModel, ICacheModel, nbytes, line_nbytes, nways ):
+
+    #---------------------------------------------------------------------
+    # Interface
+    #---------------------------------------------------------------------
+
+    s.core_id     = InPort( 32 )
+
+    s.mngr2proc   = InValRdyBundle ( 32 )
+    s.proc2mngr   = OutValRdyBundle( 32 )
+
+    s.imemreq     = OutValRdyBundle( MemReqMsg4B  )
+    s.imemresp    = InValRdyBundle ( MemRespMsg4B )
+
+    s.dmemreq     = OutValRdyBundle( MemReqMsg4B  )
+    s.dmemresp    = InValRdyBundle ( MemRespMsg4B )
+
+    s.commit_inst = OutPort( 1 )
+    s.stats_en    = OutPort( 1 )
+
+    #---------------------------------------------------------------------
+    # Structural composition
+    #---------------------------------------------------------------------
+
+    s.proc   = ProcModel()
+    s.icache = ICacheModel( nbytes, line_nbytes, nways )
+
+    s.connect( s.core_id,     s.proc.core_id     )
+    s.connect( s.mngr2proc,   s.proc.mngr2proc   )
+    s.connect( s.proc2mngr,   s.proc.proc2mngr   )
+    s.connect( s.dmemreq,     s.proc.dmemreq     )
+    s.connect( s.dmemresp,    s.proc.dmemresp    )
+    s.connect( s.commit_inst, s.proc.commit_inst )
+    s.connect( s.stats_en,    s.proc.stats_en    )
+
+    # proc -> icache -> memory
+
+    s.connect( s.proc.imemreq,     s.icache.cachereq )
+    s.connect( s.icache.cacheresp, s.proc.imemresp   )
+    s.connect( s.icache.memreq,    s.imemreq         )
+    s.connect( s.imemresp,         s.icache.memresp  )
+
+  #-----------------------------------------------------------------------
+  # Line tracing
+  #-----------------------------------------------------------------------
+
+  def line_trace( s ):
+    return s.icache.line_trace() + " " + s.proc.line_trace()
+
+#-------------------------------------------------------------------------
+# icache_proc
+#-------------------------------------------------------------------------
+
+def icache_proc( ProcModel, ICacheModel, nbytes = 1024, line_nbytes = 16,
+                 nways = 1 ):
+
+  def ProcWithICache():
+    return ProcICache( ProcModel, ICacheModel, nbytes, line_nbytes, nways )
+
+  return ProcWithICache
+
+#-------------------------------------------------------------------------
+# icache_stats
+#-------------------------------------------------------------------------
+# Number of accesses and misses, and the hit rate (None without
+# accesses) of the instruction cache of a ProcICache.
+
+def icache_stats( proc ):
+
+  num_accesses = int( proc.icache.num_accesses )
+  num_misses   = int( proc.icache.num_misses   )
+
+  hit_rate = None
+  if num_accesses > 0:
+    hit_rate = 1.0 - float( num_misses ) / num_accesses
+
+  return ( num_accesses, num_misses, hit_rate )
@@ -0,0 +1,452 @@
+//========================================================================
+// proc_native_sim.cpp
+//========================================================================
+// Native stepping for a Verilated processor. The PyMTL wrapper for a
+// Verilog model crosses the Python/C boundary for every eval() and
+// copies every port through CFFI each cycle. Here we instead run many
+// cycles at a time in C against an embedded memory model, and only go
+// back to Python when the processor consumes a mngr2proc message, sends
+// a proc2mngr message, or changes stats_en.
+//
+// This file is compiled together with the Verilator output for a
+// flattened processor (see proc_native_sim.py), which defines the name
+// of the Verilated class and its header:
+//
+//  -DVTOP=VProcAltVRTL_0x29aabdcfab8cb09
+//  -DVTOP_HEADER='"VProcAltVRTL_0x29aabdcfab8cb09.h"'
+//
+// The processor must have the standard lab2 processor interface (4B
+// memory request/response messages, 32-bit mngr messages, commit_inst,
+// and stats_en).
+//
+// Every native_t has its own model, memory, and (with Verilator 4.200
+// or newer) its own VerilatedContext, so we can simulate many
+// independent processors side by side in the same process. Older
+// Verilators keep their state in globals, so there we only allow one
+// instance at a time (native_create returns NULL otherwise).
+
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "verilated.h"
+#include VTOP_HEADER
+
+#if defined(VERILATOR_VERSION_INTEGER) && VERILATOR_VERSION_INTEGER >= 4200000
+#define NATIVE_HAS_CONTEXT
+#endif
+
+//----------------------------------------------------------------------
+// Memory messages
+//----------------------------------------------------------------------
+// MemReqMsg(8,32,32) is 77 bits and MemRespMsg(8,32) is 47 bits. The
+// first field is the most significant one:
+//
+//  req  : type (3b), opaque (8b), addr (32b), len (2b), data (32b)
+//  resp : type (3b), opaque (8b), test (2b), len (2b), data (32b)
+//
+
+#define MEM_MSG_TYPE_READ  0
+#define MEM_MSG_TYPE_WRITE 1
+#define MEM_MSG_TYPE_INIT  2
+
+// Size of the response queue for each memory port. A port can have up
+// to latency+2 responses queued, so this limits the memory latency.
+
+#define MEM_QUEUE_SIZE 64
+
+//----------------------------------------------------------------------
+// Stop reasons
+//----------------------------------------------------------------------
+// native_cycle_n returns a bit mask with the reasons it stopped.
+
+#define NATIVE_STOP_MNGR2PROC 0x1 // consumed the mngr2proc message
+#define NATIVE_STOP_PROC2MNGR 0x2 // sent a proc2mngr message
+#define NATIVE_STOP_STATS_EN  0x4 // stats_en changed
+#define NATIVE_STOP_ERROR     0x8 // invalid memory request
+
+extern "C" {
+
+  typedef struct {
+    uint64_t msg;
+    uint64_t ready_cycle;
+  } mem_resp_entry_t;
+
+  typedef struct {
+    mem_resp_entry_t entries[MEM_QUEUE_SIZE];
+    unsigned int     head;
+    unsigned int     size;
+  } mem_queue_t;
+
+  typedef struct {
+
+    // State shared with Python (see proc_native_sim.py)
+
+    unsigned long long ncycles;
+    unsigned long long ninsts;
+    unsigned long long ncycles_stats_en;
+    unsigned long long ninsts_stats_en;
+
+    unsigned char      mngr2proc_val;   // set by Python
+    unsigned int       mngr2proc_msg;
+    unsigned char      proc2mngr_val;   // set when we stop, cleared by Python
+    unsigned int       proc2mngr_msg;
+    unsigned char      stats_en;
+
+    unsigned char *    mem;
+    unsigned int       mem_nbytes;
+    unsigned int       error_addr;
+
+    unsigned int       mem_latency;
+    double             mem_stall_prob;
+    unsigned int       core_id;         // set by Python before reset
+
+    // Private state
+
+#ifdef NATIVE_HAS_CONTEXT
+    VerilatedContext * context;
+#endif
+    VTOP *             model;
+    mem_queue_t        imem_queue;
+    mem_queue_t        dmem_queue;
+    uint64_t           rand_state;
+
+  } native_t;
+
+  native_t * native_create( unsigned int );
+  void       native_destroy( native_t * );
+  void       native_mem_write( native_t *, unsigned int, const unsigned char *, unsigned int );
+  void       native_mem_read( native_t *, unsigned int, unsigned char *, unsigned int );
+  void       native_mem_clear( native_t * );
+  void       native_set_mem_params( native_t *, unsigned int, double, unsigned int );
+  void       native_reset( native_t * );
+  int        native_cycle_n( native_t *, unsigned int );
+}
+
+//----------------------------------------------------------------------
+// sc_time_stamp
+//----------------------------------------------------------------------
+
+double sc_time_stamp()
+{
+  return 0;
+}
+
+//----------------------------------------------------------------------
+// Memory model
+//----------------------------------------------------------------------
+// Handle a request and return the response message. Returns false if
+// the request is not valid (e.g., out of bounds).
+
+static bool mem_handle( native_t * h, const uint32_t * req, uint64_t * resp )
+{
+  uint32_t data   = req[0];
+  uint32_t len    = req[1] & 0x3;
+  uint32_t addr   = ( req[1] >> 2 ) | ( ( req[2] & 0x3 ) << 30 );
+  uint32_t opaque = ( req[2] >> 2 ) & 0xff;
+  uint32_t type   = ( req[2] >> 10 ) & 0x7;
+
+  uint32_t nbytes = ( len == 0 ) ? 4 : len;
+
+  if ( ( (uint64_t) addr + nbytes ) > h->mem_nbytes ) {
+    h->error_addr = addr;
+    return false;
+  }
+
+  uint32_t rdata = 0;
+
+  if ( type == MEM_MSG_TYPE_READ ) {
+    for ( uint32_t i = 0; i < nbytes; i++ )
+      rdata |= ( (uint32_t) h->mem[addr+i] ) << ( 8*i );
+  }
+  else if ( type == MEM_MSG_TYPE_WRITE || type == MEM_MSG_TYPE_INIT ) {
+    for ( uint32_t i = 0; i < nbytes; i++ )
+      h->mem[addr+i] = ( data >> ( 8*i ) ) & 0xff;
+  }
+  else {
+    h->error_addr = addr;
+    return false;
+  }
+
+  *resp = ( (uint64_t) rdata )
+        | ( (uint64_t) len    << 32 )
+        | ( (uint64_t) opaque << 36 )
+        | ( (uint64_t) type   << 44 );
+
+  return true;
+}
+
+static void mem_queue_push( mem_queue_t * q, uint64_t msg, uint64_t ready_cycle )
+{
+  mem_resp_entry_t * e = &q->entries[ ( q->head + q->size ) % MEM_QUEUE_SIZE ];
+  e->msg         = msg;
+  e->ready_cycle = ready_cycle;
+  q->size++;
+}
+
+static void mem_queue_pop( mem_queue_t * q )
+{
+  q->head = ( q->head + 1 ) % MEM_QUEUE_SIZE;
+  q->size--;
+}
+
+static bool mem_queue_resp_val( mem_queue_t * q, uint64_t ncycles )
+{
+  return q->size > 0 && q->entries[q->head].ready_cycle <= ncycles;
+}
+
+// A port is ready unless it randomly stalls (same as the random stall
+// adapter in the Python test memory) or all latency stages are full. We
+// need one more entry than latency stages since the processor only
+// takes the response at the head of the queue after we decide whether
+// we are ready.
+
+static double rand_double( native_t * h )
+{
+  // xorshift64*
+
+  h->rand_state ^= h->rand_state >> 12;
+  h->rand_state ^= h->rand_state << 25;
+  h->rand_state ^= h->rand_state >> 27;
+
+  uint64_t r = h->rand_state * 0x2545F4914F6CDD1DULL;
+  return ( r >> 11 ) * ( 1.0 / 9007199254740992.0 );
+}
+
+static bool mem_queue_req_rdy( native_t * h, mem_queue_t * q )
+{
+  if ( h->mem_stall_prob > 0 && rand_double( h ) < h->mem_stall_prob )
+    return false;
+  return q->size < h->mem_latency + 2;
+}
+
+//----------------------------------------------------------------------
+// native_create / native_destroy
+//----------------------------------------------------------------------
+
+#ifndef NATIVE_HAS_CONTEXT
+static int num_instances = 0;
+#endif
+
+native_t * native_create( unsigned int mem_nbytes )
+{
+#ifndef NATIVE_HAS_CONTEXT
+  if ( num_instances > 0 )
+    return NULL;
+  num_instances++;
+#endif
+
+  native_t * h = (native_t *) calloc( 1, sizeof(native_t) );
+
+#ifdef NATIVE_HAS_CONTEXT
+  h->context = new VerilatedContext();
+  h->context->randReset( 0 );
+  h->model   = new VTOP( h->context );
+#else
+  Verilated::randReset( 0 );
+  h->model   = new VTOP();
+#endif
+
+  h->mem        = (unsigned char *) calloc( mem_nbytes, 1 );
+  h->mem_nbytes = mem_nbytes;
+  h->rand_state = 1;
+
+  return h;
+}
+
+void native_destroy( native_t * h )
+{
+  h->model->final();
+  delete h->model;
+#ifdef NATIVE_HAS_CONTEXT
+  delete h->context;
+#else
+  num_instances--;
+#endif
+  free( h->mem );
+  free( h );
+}
+
+//----------------------------------------------------------------------
+// native_mem_write / native_mem_read
+//----------------------------------------------------------------------
+// Bounds are checked on the Python side.
+
+void native_mem_write( native_t * h, unsigned int addr,
+                       const unsigned char * data, unsigned int nbytes )
+{
+  memcpy( h->mem + addr, data, nbytes );
+}
+
+void native_mem_read( native_t * h, unsigned int addr,
+                      unsigned char * data, unsigned int nbytes )
+{
+  memcpy( data, h->mem + addr, nbytes );
+}
+
+void native_mem_clear( native_t * h )
+{
+  memset( h->mem, 0, h->mem_nbytes );
+}
+
+//----------------------------------------------------------------------
+// native_set_mem_params
+//----------------------------------------------------------------------
+// Same parameters as the Python test memory: the number of extra cycles
+// before a response is valid and the probability that a port is not
+// ready for a request. The seed makes the random stalls repeatable.
+
+void native_set_mem_params( native_t * h, unsigned int latency,
+                            double stall_prob, unsigned int seed )
+{
+  if ( latency > MEM_QUEUE_SIZE - 2 )
+    latency = MEM_QUEUE_SIZE - 2;
+
+  h->mem_latency    = latency;
+  h->mem_stall_prob = stall_prob;
+  h->rand_state     = ( (uint64_t) seed << 1 ) | 1;
+}
+
+//----------------------------------------------------------------------
+// native_reset
+//----------------------------------------------------------------------
+// Same as sim.reset() in PyMTL: hold reset for two cycles.
+
+void native_reset( native_t * h )
+{
+  VTOP * model = h->model;
+
+  model->reset         = 1;
+  model->core_id       = h->core_id;
+  model->imemreq_rdy   = 0;
+  model->imemresp_val  = 0;
+  model->dmemreq_rdy   = 0;
+  model->dmemresp_val  = 0;
+  model->mngr2proc_val = 0;
+  model->proc2mngr_rdy = 0;
+
+  for ( int i = 0; i < 2; i++ ) {
+    model->clk = 0;
+    model->eval();
+    model->clk = 1;
+    model->eval();
+  }
+
+  model->reset = 0;
+  model->eval();
+
+  memset( &h->imem_queue, 0, sizeof(mem_queue_t) );
+  memset( &h->dmem_queue, 0, sizeof(mem_queue_t) );
+
+  h->ncycles          = 0;
+  h->ninsts           = 0;
+  h->ncycles_stats_en = 0;
+  h->ninsts_stats_en  = 0;
+  h->proc2mngr_val    = 0;
+  h->stats_en         = model->stats_en;
+}
+
+//----------------------------------------------------------------------
+// native_cycle_n
+//----------------------------------------------------------------------
+// Simulate up to n cycles. Every cycle we set the inputs, evaluate the
+// combinational logic, handle the handshakes, and then clock the model.
+// A memory request which is accepted in cycle t gets its response in
+// cycle t+1+mem_latency. We stop at the end of a cycle in which the processor
+// consumed the mngr2proc message, sent a proc2mngr message (proc2mngr
+// is always ready), or changed stats_en. Returns the stop reasons or
+// zero if we simulated all n cycles.
+
+int native_cycle_n( native_t * h, unsigned int n )
+{
+  VTOP * model = h->model;
+
+  for ( unsigned int i = 0; i < n; i++ ) {
+
+    int stop = 0;
+
+    // Set inputs
+
+    mem_queue_t * iq = &h->imem_queue;
+    mem_queue_t * dq = &h->dmem_queue;
+
+    model->imemresp_val  = mem_queue_resp_val( iq, h->ncycles );
+    model->imemresp_msg  = iq->entries[iq->head].msg;
+    model->imemreq_rdy   = mem_queue_req_rdy( h, iq );
+
+    model->dmemresp_val  = mem_queue_resp_val( dq, h->ncycles );
+    model->dmemresp_msg  = dq->entries[dq->head].msg;
+    model->dmemreq_rdy   = mem_queue_req_rdy( h, dq );
+
+    model->mngr2proc_val = h->mngr2proc_val;
+    model->mngr2proc_msg = h->mngr2proc_msg;
+    model->proc2mngr_rdy = 1;
+
+    model->eval();
+
+    // Memory handshakes
+
+    if ( model->imemresp_val && model->imemresp_rdy )
+      mem_queue_pop( iq );
+
+    if ( model->dmemresp_val && model->dmemresp_rdy )
+      mem_queue_pop( dq );
+
+    uint64_t resp;
+
+    if ( model->imemreq_val && model->imemreq_rdy ) {
+      if ( !mem_handle( h, model->imemreq_msg, &resp ) )
+        return NATIVE_STOP_ERROR;
+      mem_queue_push( iq, resp, h->ncycles + 1 + h->mem_latency );
+    }
+
+    if ( model->dmemreq_val && model->dmemreq_rdy ) {
+      if ( !mem_handle( h, model->dmemreq_msg, &resp ) )
+        return NATIVE_STOP_ERROR;
+      mem_queue_push( dq, resp, h->ncycles + 1 + h->mem_latency );
+    }
+
+    // Manager handshakes
+
+    if ( model->mngr2proc_val && model->mngr2proc_rdy ) {
+      h->mngr2proc_val = 0;
+      stop |= NATIVE_STOP_MNGR2PROC;
+    }
+
+    if ( model->proc2mngr_val ) {
+      h->proc2mngr_val = 1;
+      h->proc2mngr_msg = model->proc2mngr_msg;
+      stop |= NATIVE_STOP_PROC2MNGR;
+    }
+
+    // Statistics
+
+    if ( model->stats_en )
+      h->ncycles_stats_en++;
+
+    if ( model->commit_inst ) {
+      h->ninsts++;
+      if ( model->stats_en )
+        h->ninsts_stats_en++;
+    }
+
+    // Clock edge
+
+    model->clk = 0;
+    model->eval();
+    model->clk = 1;
+    model->eval();
+
+    h->ncycles++;
+
+    if ( model->stats_en != h->stats_en ) {
+      h->stats_en = model->stats_en;
+      stop |= NATIVE_STOP_STATS_EN;
+    }
+
+    if ( stop )
+      return stop;
+  }
+
+  return 0;
+}
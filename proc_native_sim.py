@@ -0,0 +1,549 @@
+#=========================================================================
+# proc_native_sim
+#=========================================================================
+# Run a Verilated processor natively (see proc_native_sim.cpp). We
+# Verilate the flattened Verilog which PyMTL generates when it imports a
+# Verilog model (e.g., ProcAltVRTL_0x29aabdcfab8cb09.v), compile it
+# together with proc_native_sim.cpp, and then step the processor many
+# cycles at a time in C. Python only handles the mngr2proc and
+# proc2mngr messages, using the test source and sink of the test
+# harness just like fast_forward does.
+#
+#  native = NativeProcSim( build_native_sim( th.proc.class_name ),
+#                          len( th.mem.mem ), mem_latency, mem_stall_prob )
+#  native.load_image( mem_image )
+#  native.reset()
+#  run_native( th, native, max_cycles )
+#
+
+import os
+import re
+import fcntl
+import shutil
+import hashlib
+import contextlib
+import tempfile
+import subprocess
+
+from cffi import FFI
+
+#-------------------------------------------------------------------------
+# C interface
+#-------------------------------------------------------------------------
+# Must match the public part of native_t in proc_native_sim.cpp.
+
+native_cdef = """
+  typedef struct {
+
+    unsigned long long ncycles;
+    unsigned long long ninsts;
+    unsigned long long ncycles_stats_en;
+    unsigned long long ninsts_stats_en;
+
+    unsigned char      mngr2proc_val;
+    unsigned int       mngr2proc_msg;
+    unsigned char      proc2mngr_val;
+    unsigned int       proc2mngr_msg;
+    unsigned char      stats_en;
+
+    unsigned char *    mem;
+    unsigned int       mem_nbytes;
+    unsigned int       error_addr;
+
+    unsigned int       mem_latency;
+    double             mem_stall_prob;
+    unsigned int       core_id;
+
+  } native_t;
+
+  native_t * native_create( unsigned int );
+  void       native_destroy( native_t * );
+  void       native_mem_write( native_t *, unsigned int, const unsigned char *, unsigned int );
+  void       native_mem_read( native_t *, unsigned int, unsigned char *, unsigned int );
+  void       native_mem_clear( native_t * );
+  void       native_set_mem_params( native_t *, unsigned int, double, unsigned int );
+  void       native_reset( native_t * );
+  int        native_cycle_n( native_t *, unsigned int );
+"""
+
+native_stop_mngr2proc = 0x1
+native_stop_proc2mngr = 0x2
+native_stop_stats_en  = 0x4
+native_stop_error     = 0x8
+
+native_cpp_file = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ),
+                                "proc_native_sim.cpp" )
+
+#-------------------------------------------------------------------------
+# Build cache
+#-------------------------------------------------------------------------
+# Verilating and compiling the processor takes much longer than most
+# simulations, so we keep the shared libraries in a persistent build
+# cache. The cache is keyed on the content of the flattened Verilog and
+# the native wrapper, the Verilator version, and the build flags, so it
+# can be shared across checkouts and worktrees. The cache directory is
+# LAB2_PROC_BUILD_CACHE or ~/.cache/lab2_proc by default.
+#
+# Concurrent workers can race to build the same key. Each key has a lock
+# file so that only one worker builds while the others wait, and we
+# build into a temporary directory which is then renamed into place, so
+# nobody ever sees a partially built library (even without working file
+# locks, e.g., on some network file systems).
+
+native_verilator_flags = [
+  "-O3", "--x-assign", "fast", "--x-initial", "fast",
+  "-Wno-lint", "-Wno-UNOPTFLAT", "-Wno-fatal",
+]
+
+native_cxx_flags = [ "-O3", "-fPIC", "-shared", "-std=c++14" ]
+
+def get_build_cache_dir():
+
+  if "LAB2_PROC_BUILD_CACHE" in os.environ:
+    return os.environ["LAB2_PROC_BUILD_CACHE"]
+
+  cache_root = os.environ.get( "XDG_CACHE_HOME",
+                               os.path.join( os.path.expanduser( "~" ), ".cache" ) )
+  return os.path.join( cache_root, "lab2_proc" )
+
+def get_verilator_version():
+  return subprocess.check_output([ "verilator", "--version" ]).strip()
+
+def get_native_build_key( top_module, verilog_file ):
+
+  key = hashlib.sha256()
+
+  for data in [ top_module, get_verilator_version(),
+                " ".join( native_verilator_flags ),
+                " ".join( native_cxx_flags ) ]:
+    key.update( data + "\0" )
+
+  for filename in [ verilog_file, native_cpp_file ]:
+    with open( filename, "rb" ) as fd:
+      key.update( fd.read() + "\0" )
+
+  return key.hexdigest()
+
+#-------------------------------------------------------------------------
+# build_native_sim
+#-------------------------------------------------------------------------
+# Verilate the flattened Verilog for the given top-level module and
+# compile it into a shared library, or reuse the library from the build
+# cache. Returns the path to the library. We use the same Verilator
+# include directory as PyMTL.
+
+def get_verilator_include():
+
+  if "PYMTL_VERILATOR_INCLUDE_DIR" in os.environ:
+    return os.environ["PYMTL_VERILATOR_INCLUDE_DIR"]
+
+  root = subprocess.check_output([ "verilator", "--getenv", "VERILATOR_ROOT" ])
+  return os.path.join( root.strip(), "include" )
+
+def compile_native_sim( top_module, verilog_file, build_dir, lib_file ):
+
+  obj_dir = os.path.join( build_dir, "obj_dir" )
+
+  # Verilate
+
+  subprocess.check_call([
+    "verilator", "--cc", verilog_file, "--top-module", top_module,
+    "--Mdir", obj_dir,
+  ] + native_verilator_flags )
+
+  # Compile the model, the Verilator runtime, and the native wrapper
+
+  include = get_verilator_include()
+
+  runtime = [ os.path.join( include, name ) for name in
+              [ "verilated.cpp", "verilated_dpi.cpp", "verilated_threads.cpp" ]
+              if os.path.exists( os.path.join( include, name ) ) ]
+
+  sources = [ os.path.join( obj_dir, name )
+              for name in sorted( os.listdir( obj_dir ) )
+              if name.endswith( ".cpp" ) ]
+
+  subprocess.check_call([ "g++" ] + native_cxx_flags + [
+    "-I", obj_dir, "-I", include, "-I", os.path.join( include, "vltstd" ),
+    "-DVTOP=V{}".format( top_module ),
+    "-DVTOP_HEADER=\"V{}.h\"".format( top_module ),
+    "-o", lib_file, native_cpp_file,
+  ] + sources + runtime + [ "-lpthread" ])
+
+  # We only need to keep the library
+
+  shutil.rmtree( obj_dir )
+
+def build_native_sim( top_module, verilog_file=None, cache_dir=None ):
+
+  # PyMTL writes the flattened Verilog into the current directory, the
+  # Verilog checked into this directory is the fallback
+
+  if verilog_file is None:
+    verilog_file = top_module + ".v"
+    if not os.path.exists( verilog_file ):
+      verilog_file = os.path.join( os.path.dirname( native_cpp_file ),
+                                   verilog_file )
+
+  if cache_dir is None:
+    cache_dir = get_build_cache_dir()
+
+  if not os.path.exists( verilog_file ):
+    raise Exception( "Cannot find the flattened Verilog ({}) for native "
+                     "simulation!".format( verilog_file ) )
+
+  key      = get_native_build_key( top_module, verilog_file )
+  key_dir  = os.path.join( cache_dir, "{}_{}".format( top_module, key[:32] ) )
+  lib_name = "lib{}_native.so".format( top_module )
+  lib_file = os.path.join( key_dir, lib_name )
+
+  if os.path.exists( lib_file ):
+    return lib_file
+
+  try:
+    os.makedirs( cache_dir )
+  except OSError:
+    if not os.path.isdir( cache_dir ):
+      raise
+
+  with open( os.path.join( cache_dir, key[:32] + ".lock" ), "w" ) as lock:
+
+    fcntl.flock( lock, fcntl.LOCK_EX )
+
+    # Somebody else might have built it while we were waiting
+
+    if os.path.exists( lib_file ):
+      return lib_file
+
+    build_dir = tempfile.mkdtemp( prefix=".build_", dir=cache_dir )
+    os.chmod( build_dir, 0o755 )
+
+    try:
+      compile_native_sim( top_module, os.path.abspath( verilog_file ),
+                          build_dir, os.path.join( build_dir, lib_name ) )
+      os.rename( build_dir, key_dir )
+
+    except OSError:
+      shutil.rmtree( build_dir, ignore_errors=True )
+      if not os.path.exists( lib_file ):
+        raise
+
+    except:
+      shutil.rmtree( build_dir, ignore_errors=True )
+      raise
+
+  return lib_file
+
+#-------------------------------------------------------------------------
+# Verilog import cache
+#-------------------------------------------------------------------------
+# When PyMTL imports a Verilog model (or translates a PyMTL model) it
+# writes the flattened Verilog, the C and Python wrappers, and the shared
+# library into the current directory, and it only Verilates again if the
+# freshly flattened Verilog differs from the one it finds there. So every
+# new build directory (or worktree) starts from scratch. We keep these
+# files in the same build cache, keyed on the top-level module, the
+# Verilator version, and the content of the flattened Verilog:
+#
+#  with verilog_import_cache( th.proc.class_name ):
+#    sim = SimulationTool( th )
+#
+# Before the import we copy the cached flattened Verilog and wrappers
+# into the current directory (preferring the entry with the same
+# flattened Verilog, otherwise the most recent one), and after the import
+# we save whatever PyMTL ended up with. We do not copy the library. The
+# Python wrapper opens it with dlopen('./lib..._v.so'), so we patch the
+# restored wrapper to open the library in the cache entry by its
+# absolute path instead. Restoring a stale entry is harmless, PyMTL
+# still compares the flattened Verilog and rebuilds (including the
+# wrapper and the library in the current directory) if it changed. The
+# files checked into this directory (e.g., for ProcAltVRTL) seed the
+# cache. We do not keep the Verilator obj_dir, PyMTL does not need it if
+# nothing changed.
+
+def get_verilog_import_files( top_module ):
+  return [ top_module + ".v", top_module + "_v.cpp", top_module + "_v.py",
+           get_verilog_import_lib( top_module ) ]
+
+def get_verilog_import_lib( top_module ):
+  return "lib{}_v.so".format( top_module )
+
+def get_verilog_import_key( top_module, verilog_file ):
+
+  key = hashlib.sha256()
+
+  for data in [ "import", top_module, get_verilator_version() ]:
+    key.update( data + "\0" )
+
+  with open( verilog_file, "rb" ) as fd:
+    key.update( fd.read() )
+
+  return key.hexdigest()
+
+def has_verilog_import( top_module, import_dir ):
+  return all( os.path.exists( os.path.join( import_dir, name ) )
+              for name in get_verilog_import_files( top_module ) )
+
+def save_verilog_import( top_module, import_dir=os.curdir, cache_dir=None ):
+
+  if cache_dir is None:
+    cache_dir = get_build_cache_dir()
+
+  if not has_verilog_import( top_module, import_dir ):
+    return None
+
+  key     = get_verilog_import_key( top_module,
+              os.path.join( import_dir, top_module + ".v" ) )
+  key_dir = os.path.join( cache_dir,
+                          "{}_import_{}".format( top_module, key[:32] ) )
+
+  if os.path.isdir( key_dir ):
+    return key_dir
+
+  try:
+    os.makedirs( cache_dir )
+  except OSError:
+    if not os.path.isdir( cache_dir ):
+      raise
+
+  # Copy into a temporary directory and rename it into place, if somebody
+  # else was faster we just use theirs
+
+  save_dir = tempfile.mkdtemp( prefix=".import_", dir=cache_dir )
+  os.chmod( save_dir, 0o755 )
+
+  try:
+    for name in get_verilog_import_files( top_module ):
+      shutil.copy( os.path.join( import_dir, name ), save_dir )
+    os.rename( save_dir, key_dir )
+
+  except OSError:
+    shutil.rmtree( save_dir, ignore_errors=True )
+    if not os.path.isdir( key_dir ):
+      raise
+
+  return key_dir
+
+def restore_verilog_import( top_module, import_dir=os.curdir,
+                            cache_dir=None ):
+
+  if cache_dir is None:
+    cache_dir = get_build_cache_dir()
+
+  if has_verilog_import( top_module, import_dir ):
+    return True
+
+  # Seed the cache with the files checked into this directory
+
+  module_dir = os.path.dirname( native_cpp_file )
+  if os.path.abspath( import_dir ) != module_dir:
+    save_verilog_import( top_module, module_dir, cache_dir )
+
+  prefix = "{}_import_".format( top_module )
+  if not os.path.isdir( cache_dir ):
+    return False
+
+  entries = [ os.path.join( cache_dir, name )
+              for name in os.listdir( cache_dir ) if name.startswith( prefix ) ]
+  entries = [ entry for entry in entries
+              if has_verilog_import( top_module, entry ) ]
+
+  if not entries:
+    return False
+
+  entries.sort( key=os.path.getmtime, reverse=True )
+
+  verilog_file = os.path.join( import_dir, top_module + ".v" )
+  if os.path.exists( verilog_file ):
+    key = get_verilog_import_key( top_module, verilog_file )
+    entries.sort( key=lambda entry: not entry.endswith( key[:32] ) )
+
+  lib_name = get_verilog_import_lib( top_module )
+
+  for name in get_verilog_import_files( top_module ):
+    if name != lib_name:
+      shutil.copy( os.path.join( entries[0], name ), import_dir )
+
+  patch_verilog_import_lib( top_module, import_dir,
+    os.path.abspath( os.path.join( entries[0], lib_name ) ) )
+
+  return True
+
+# Make the Python wrapper in import_dir open lib_file instead of the
+# library next to it
+
+def patch_verilog_import_lib( top_module, import_dir, lib_file ):
+
+  py_wrapper_file = os.path.join( import_dir, top_module + "_v.py" )
+
+  with open( py_wrapper_file ) as fd:
+    src = fd.read()
+
+  pattern = r"dlopen\(\s*'[^']*{}'\s*\)".format(
+              re.escape( get_verilog_import_lib( top_module ) ) )
+  (src,num_subs) = re.subn( pattern,
+                            lambda m: "dlopen({!r})".format( lib_file ), src )
+
+  if num_subs == 0:
+    raise Exception( "Cannot find the dlopen of the Verilog import library "
+                     "in {}!".format( py_wrapper_file ) )
+
+  with open( py_wrapper_file, "w" ) as fd:
+    fd.write( src )
+
+@contextlib.contextmanager
+def verilog_import_cache( top_module, import_dir=os.curdir, cache_dir=None ):
+  restore_verilog_import( top_module, import_dir, cache_dir )
+  yield
+  save_verilog_import( top_module, import_dir, cache_dir )
+
+#-------------------------------------------------------------------------
+# load_native_lib
+#-------------------------------------------------------------------------
+# Open a native simulator library. A relative path is resolved against
+# the current directory first and then against the directory of this
+# module, so we do not depend on where the simulator is started from
+# (build_native_sim returns an absolute path into the build cache). We
+# only open each library once, all instances share the same CFFI
+# interface.
+
+native_libs = {}
+
+def load_native_lib( lib_file ):
+
+  if not os.path.isabs( lib_file ) and not os.path.exists( lib_file ):
+    lib_file = os.path.join( os.path.dirname( native_cpp_file ), lib_file )
+
+  lib_file = os.path.abspath( lib_file )
+
+  if not os.path.exists( lib_file ):
+    raise Exception( "Cannot find the native simulator library ({})!"
+                     .format( lib_file ) )
+
+  if lib_file not in native_libs:
+    ffi = FFI()
+    ffi.cdef( native_cdef )
+    native_libs[ lib_file ] = ( ffi, ffi.dlopen( lib_file ) )
+
+  return native_libs[ lib_file ]
+
+#-------------------------------------------------------------------------
+# NativeProcSim
+#-------------------------------------------------------------------------
+# The memory latency and stall probability are the same as for the test
+# memory of the test harness. The random stalls are repeatable for a
+# given seed, but they are not the same as the ones of the Python test
+# memory.
+#
+# Every instance has its own model and memory, so we can create several
+# instances of the same library (e.g., one per core with different
+# core_ids) and step them independently. This needs Verilator 4.200 or
+# newer, older Verilators share their state between all models, so we
+# raise an exception for a second instance instead.
+
+class NativeProcSim (object):
+
+  def __init__( s, lib_file, mem_nbytes, mem_latency=0, mem_stall_prob=0.0,
+                seed=0xdeadbeef, core_id=0 ):
+
+    (s.ffi,s.lib) = load_native_lib( lib_file )
+
+    s.h = s.lib.native_create( mem_nbytes )
+    if s.h == s.ffi.NULL:
+      raise Exception( "More than one native simulator instance needs "
+                       "Verilator 4.200 or newer!" )
+
+    s.h.core_id = core_id
+
+    s.lib.native_set_mem_params( s.h, mem_latency, mem_stall_prob, seed )
+
+  def __del__( s ):
+    if s.h != s.ffi.NULL:
+      s.lib.native_destroy( s.h )
+
+  # Copy data into/out of the native memory
+
+  def mem_write( s, addr, data ):
+    assert addr + len( data ) <= s.h.mem_nbytes
+    s.lib.native_mem_write( s.h, addr, s.ffi.from_buffer( data ), len( data ) )
+
+  def mem_read( s, addr, nbytes ):
+    assert addr + nbytes <= s.h.mem_nbytes
+    data = bytearray( nbytes )
+    s.lib.native_mem_read( s.h, addr, s.ffi.from_buffer( data ), nbytes )
+    return data
+
+  def load( s, mem ):
+    s.mem_write( 0, mem )
+
+  # Load the sections of a SparseMemoryImage directly, everything else
+  # is zero
+
+  def load_image( s, mem_image ):
+    s.lib.native_mem_clear( s.h )
+    for section in mem_image.get_sections():
+      s.mem_write( section.addr, section.data )
+
+  def reset( s ):
+    s.lib.native_reset( s.h )
+
+  def cycle_n( s, n ):
+    return s.lib.native_cycle_n( s.h, n )
+
+#-------------------------------------------------------------------------
+# run_native
+#-------------------------------------------------------------------------
+# Run the native simulation until the test harness would be done (all
+# mngr2proc messages consumed and all proc2mngr messages received).
+# Messages sent to the manager are checked against (and consumed from)
+# the test sink. Copies the memory back into the test memory at the end
+# so that we can verify the results as usual. With exit_on_stats_off we
+# stop as soon as stats_en goes from one to zero.
+
+def run_native( th, native, max_cycles, exit_on_stats_off=False ):
+
+  h    = native.h
+  src  = th.src.src
+  sink = th.sink.sink
+
+  stats_en_seen = False
+
+  while h.ncycles < max_cycles:
+
+    # Offer the next mngr2proc message
+
+    if not h.mngr2proc_val and len( src.msgs ) > 0:
+      h.mngr2proc_msg = int( src.msgs.popleft() )
+      h.mngr2proc_val = 1
+
+    # Done once the last proc2mngr message has been received
+
+    if len( src.msgs ) == 0 and not h.mngr2proc_val \
+        and sink.idx == len( sink.msgs ):
+      break
+
+    stop = native.cycle_n( max_cycles - h.ncycles )
+
+    if stop & native_stop_error:
+      raise Exception( "Invalid memory request to {:0>8x} in native "
+                       "simulation!".format( h.error_addr ) )
+
+    if stop & native_stop_proc2mngr:
+
+      assert sink.idx < len( sink.msgs ), \
+        "Received more messages than expected!"
+
+      assert sink.msgs[ sink.idx ] == h.proc2mngr_msg, \
+        "Received unexpected message ({:0>8x} != {:0>8x})!" \
+          .format( h.proc2mngr_msg, int( sink.msgs[ sink.idx ] ) )
+
+      sink.idx += 1
+      h.proc2mngr_val = 0
+
+    if stop & native_stop_stats_en:
+      if h.stats_en:
+        stats_en_seen = True
+      elif exit_on_stats_off and stats_en_seen:
+        break
+
+  th.mem.mem[:] = native.mem_read( 0, h.mem_nbytes )
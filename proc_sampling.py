@@ -0,0 +1,143 @@
+#=========================================================================
+# proc_sampling
+#=========================================================================
+# SMARTS-style systematic sampling. The functional model executes the
+# entire program, and every sample_period instructions we take a sample
+# on the cycle-level model: we transfer the functional state into the
+# processor, simulate warmup instructions in detail to fill the
+# pipeline, and then measure the number of cycles for the next size
+# instructions. The detailed model only ever runs a few
+# thousand instructions at a time, so the simulation time is dominated
+# by the (fast) functional model.
+#
+# The functional model does not wait for the detailed model. After each
+# sample we throw away the state of the detailed model and restore the
+# memory and the mngr queues to what they were at the start of the
+# sample. The functional model then simply keeps going from where it
+# stopped.
+
+import math
+
+from proc_fast_forward import fast_forward, fast_forward_done
+from proc_fast_forward import reset_and_transfer_state
+
+#-------------------------------------------------------------------------
+# run_sample
+#-------------------------------------------------------------------------
+# Take a single sample starting from the current state of the
+# translator. Returns a (num_cycles, num_insts) tuple for the measured
+# part of the sample. We hold the processor in reset for a few cycles
+# before each sample so that any memory responses which were still in
+# flight at the end of the previous sample are drained.
+
+def run_sample( th, sim, translator, warmup, size, max_cycles,
+                reset_cycles=2 ):
+
+  # Save the state which the detailed model is going to modify
+
+  mem_data  = th.mem.mem[:]
+  mngr2proc = list( th.src.src.msgs )
+  sink_idx  = th.sink.sink.idx
+
+  # Reset and transfer the state into the processor
+
+  reset_and_transfer_state( sim, translator, th.proc, reset_cycles )
+
+  # Warm up, then measure
+
+  start_ncycles   = sim.ncycles
+  measure_ncycles = sim.ncycles
+  num_insts       = 0
+  num_cycles      = 0
+
+  while not th.done() and num_insts < warmup + size:
+
+    assert sim.ncycles - start_ncycles < max_cycles, \
+      "Sample did not finish in {} cycles!".format( max_cycles )
+
+    sim.cycle()
+
+    if th.proc.commit_inst:
+      num_insts += 1
+      if num_insts == warmup:
+        measure_ncycles = sim.ncycles
+
+  if num_insts > warmup:
+    num_cycles = sim.ncycles - measure_ncycles
+    num_insts  = num_insts - warmup
+  else:
+    num_insts  = 0
+
+  # Restore the state
+
+  th.mem.mem[:] = mem_data
+
+  th.src.src.msgs.clear()
+  th.src.src.msgs.extend( mngr2proc )
+  th.sink.sink.idx = sink_idx
+
+  return ( num_cycles, num_insts )
+
+#-------------------------------------------------------------------------
+# run_sampled
+#-------------------------------------------------------------------------
+# Run the whole program with systematic sampling. If a translator is
+# passed in (e.g., after fast-forwarding) we start from its state.
+# Returns the list of (num_cycles, num_insts) tuples, one per sample,
+# and the translator which has now executed the entire program. We can
+# only take more than one sample on the RTL models (see transfer_state
+# in proc_fast_forward).
+
+def run_sampled( th, sim, sample_period, warmup, size, max_cycles,
+                 reset_cycles=2, translator=None ):
+
+  assert hasattr( th.proc, "dpath" ), \
+    "Sampling is only supported for the PyMTL RTL models!"
+
+  if translator is None:
+    translator = fast_forward( th, 0 )
+
+  samples = []
+
+  while not fast_forward_done( th ):
+
+    sample = run_sample( th, sim, translator, warmup, size, max_cycles,
+                         reset_cycles )
+    if sample[1] > 0:
+      samples.append( sample )
+
+    # Stop if the functional model cannot make any more progress
+
+    num_insts = translator.num_insts
+    fast_forward( th, sample_period, translator=translator )
+
+    if translator.num_insts - num_insts < sample_period:
+      break
+
+  return ( samples, translator )
+
+#-------------------------------------------------------------------------
+# sample_cpi
+#-------------------------------------------------------------------------
+# Estimate the CPI from the samples. Returns the mean CPI and the half
+# width of the confidence interval for the given z score (the default
+# is 95% confidence). We need at least two samples to estimate the
+# variance, so with a single sample the half width is infinite. Without
+# any samples there is nothing to estimate, so both are None.
+
+def sample_cpi( samples, z=1.96 ):
+
+  cpis = [ float(num_cycles) / num_insts for (num_cycles,num_insts) in samples ]
+  n    = len( cpis )
+
+  if n == 0:
+    return ( None, None )
+
+  mean = sum( cpis ) / n
+
+  if n == 1:
+    return ( mean, float('inf') )
+
+  var  = sum([ ( cpi - mean )**2 for cpi in cpis ]) / ( n - 1 )
+
+  return ( mean, z * math.sqrt( var / n ) )
@@ -1,61 +1,184 @@
 #=========================================================================
 # proc_sim_eval
 #=========================================================================
-# Run the evaluations on the baseline and alternative design.
+# Run the evaluations on the baseline and alternative design. We run the
+# simulations in parallel with a pool of worker processes (one per core
+# by default). Each worker imports PyMTL and the models once and then
+# calls run_sim directly for every evaluation run it gets.
+#
+# base and alt are the models ProcBaseRTL and ProcAltRTL choose (i.e.,
+# the Verilog models unless rtl_language says otherwise).
+#
+# By default we only print the CPI of every run, as before. Two options
+# add more results:
+#
+#  --gains  Also print the CPI gains of alt over base
+#  --prtl   Also run the prtl_inputs on the PyMTL RTL models of base and
+#           alt (ProcBasePRTL and ProcAltPRTL only implement a few
+#           instructions, so they cannot run the other inputs)
+
+# Hack to add project root to python path
 
 import os
+import sys
 
-from subprocess import check_output, CalledProcessError
+sim_dir = os.path.dirname( os.path.abspath( __file__ ) )
+while sim_dir:
+  if os.path.exists( sim_dir + os.path.sep + ".pymtl-python-path" ):
+    sys.path.insert(0,sim_dir)
+    break
+  sim_dir = os.path.dirname(sim_dir)
 
-impls  = [ "fl", "base", "alt" ]
-inputs = [ "vvadd-unopt", "vvadd-opt", "cmult", "mfilt", "bsearch" ]
+import argparse
+import multiprocessing
+import traceback
 
-eval_runs = []
+from proc_sim_run   import run_sim, model_impl_dict
+from proc_translate import translate_impl_dict
 
-for impl in impls:
-  for input_ in inputs:
-    eval_runs.append([ impl, input_ ])
+impls       = [ "fl", "base", "alt" ]
+inputs      = [ "vvadd-unopt", "vvadd-opt", "cmult", "mfilt", "bsearch" ]
+prtl_impls  = [ "base", "alt" ]
+prtl_inputs = [ "dot" ]
 
-# Get path to simulator script
+def get_eval_runs( prtl ):
 
-sim_dir = os.path.dirname( os.path.abspath( __file__ ) )
-sim     = sim_dir + os.path.sep + 'proc-sim'
+  eval_runs = []
 
-# Print header
+  for impl in impls:
+    for input_ in inputs:
+      eval_runs.append([ impl, input_, False ])
 
-print ""
-print " Results from running simulator"
-print ""
+  if prtl:
+    for impl in prtl_impls:
+      for input_ in prtl_inputs:
+        eval_runs.append([ impl, input_, True ])
 
-# Run the simulator
+  return eval_runs
 
-for eval_run in eval_runs:
+#-------------------------------------------------------------------------
+# Workers
+#-------------------------------------------------------------------------
+# The workers throw away anything the simulations print (e.g., from the
+# verification functions) so it does not get mixed into the results
+# table. Instead of raising an exception, a worker returns the error in
+# the result so that we still get the results of all other runs.
 
-  # Command
+def init_worker():
+  sys.stdout = open( os.devnull, "w" )
 
-  impl   = eval_run[0]
-  input_ = eval_run[1]
+def run_eval( eval_run ):
 
-  cmd = [ sim, "--impl", impl, "--input", input_, "--stats", "--verify", "--max-cycles",  "15000", ]
+  (impl,input_,prtl) = eval_run
 
   try:
-    result = check_output( cmd ).strip()
-  except CalledProcessError as e:
-    raise Exception( "Error running simulator!\n\n"
-                     "Simulator command line: {cmd}\n\n"
-                     "Simulator output:\n {output}"
-                     .format( cmd=' '.join(e.cmd), output=e.output ) )
+    result = run_sim( impl=impl, input=input_, verify=True, max_cycles=15000,
+                      prtl=prtl )
+  except:
+    result = { "impl" : impl, "input" : input_, "passed" : False,
+               "error" : traceback.format_exc() }
+
+  result["prtl"] = prtl
+
+  return result
+
+#-------------------------------------------------------------------------
+# Results
+#-------------------------------------------------------------------------
+
+# The proc-sim options of an evaluation run
+
+def sim_opts( result ):
+  opts = "--impl {impl} --input {input}".format( **result )
+  if result["prtl"]:
+    opts += " --prtl"
+  return opts
+
+def print_cpis( results ):
+
+  for result in results:
+    print "  - {:<5} {:<13} {:>5}".format( result["impl"], result["input"],
+                                           "{:1.2f}".format( result["cpi"] ) )
+
+  print ""
+
+def print_gains( results, inputs, base_name, alt_name ):
+
+  cpis = dict([ ( ( result["impl"], result["input"] ), result["cpi"] )
+                for result in results ])
+
+  print " CPI gains of {} over {}".format( alt_name, base_name )
+  print ""
+
+  for input_ in inputs:
+    base_cpi = cpis[ "base", input_ ]
+    alt_cpi  = cpis[ "alt",  input_ ]
+    print "  - {:<13} {:>5} -> {:>5} ({:1.2f}x)".format( input_,
+      "{:1.2f}".format( base_cpi ), "{:1.2f}".format( alt_cpi ),
+      base_cpi / alt_cpi )
+
+  print ""
+
+#-------------------------------------------------------------------------
+# Main
+#-------------------------------------------------------------------------
+
+if __name__ == "__main__":
+
+  p = argparse.ArgumentParser()
+  p.add_argument( "--gains", action="store_true" )
+  p.add_argument( "--prtl",  action="store_true" )
+  opts = p.parse_args()
+
+  # Print header
+
+  print ""
+  print " Results from running simulator"
+  print ""
+
+  # Run the simulations
+
+  pool    = multiprocessing.Pool( multiprocessing.cpu_count(), init_worker )
+  results = pool.map( run_eval, get_eval_runs( opts.prtl ), chunksize=1 )
+
+  pool.close()
+  pool.join()
+
+  # Report any failures
+
+  for result in results:
+
+    if "error" in result:
+      raise Exception( "Error running simulator!\n\n"
+                       "Simulator run: {}\n\n"
+                       "Simulator error:\n {}".format( sim_opts( result ),
+                                                       result["error"] ) )
+
+    if not result["passed"]:
+      raise Exception( "Verification failed for {}!"
+                       .format( sim_opts( result ) ) )
+
+  # Display results
+
+  rtl_results  = [ result for result in results if not result["prtl"] ]
+  prtl_results = [ result for result in results if result["prtl"] ]
 
-  # Find result
+  print_cpis( rtl_results )
 
-  cpi = None
-  for line in result.splitlines():
-    if line.startswith(' CPI '):
-      cpi = line.split('=')[1].strip()
+  if opts.prtl:
+    print " Results from running the PyMTL RTL models"
+    print ""
+    print_cpis( prtl_results )
 
-  # Display result
+  # CPI gains of the alternative design (with bypassing) over the
+  # baseline design, labeled with the models we actually compared
 
-  print "  - {:<5} {:<13} {:>5}".format( impl, input_, cpi )
+  if opts.gains:
 
-print ""
+    print_gains( rtl_results, inputs, model_impl_dict["base"].__name__,
+                 model_impl_dict["alt"].__name__ )
 
+    if opts.prtl:
+      print_gains( prtl_results, prtl_inputs,
+                   translate_impl_dict["base"].__name__,
+                   translate_impl_dict["alt"].__name__ )
@@ -0,0 +1,433 @@
+#=========================================================================
+# proc_sim_run
+#=========================================================================
+# The simulation behind proc-sim. We keep it in a module so that other
+# scripts (e.g., proc_sim_eval) can run many simulations in the same
+# process instead of starting proc-sim (and importing PyMTL) for each
+# one. run_sim returns a dictionary with the results so the caller can
+# decide how to display them.
+
+import functools
+import math
+import random
+import time
+
+from pymtl                     import *
+
+from test.harness              import TestHarness
+
+from ProcBaseRTL               import ProcBaseRTL
+from ProcAltRTL                import ProcAltRTL
+from ProcFL                    import ProcFL
+from ProcBasePRTL              import ProcBasePRTL
+from proc_fast_forward         import fast_forward, reset_and_transfer_state
+from proc_fast_forward         import state_transfer_supported
+from proc_checkpoint           import save_checkpoint, restore_checkpoint
+from proc_sampling             import run_sampled, sample_cpi
+from proc_cpi_stack            import CpiStack, cpi_stack_supported
+from proc_native_sim           import NativeProcSim, build_native_sim
+from proc_native_sim           import run_native, verilog_import_cache
+from proc_translate            import translate_proc, translate_impl_dict
+from proc_static_sched         import StaticSchedule, CombEvalCounter
+from proc_trace                import TraceRecorder, trace_supported
+from proc_bpred_stats          import BranchPredStats, bpred_stats_supported
+from proc_icache               import icache_proc, icache_impl_dict
+from proc_icache               import icache_stats
+
+from ubmark.proc_ubmark_vvadd_unopt   import ubmark_vvadd_unopt
+from ubmark.proc_ubmark_vvadd_opt     import ubmark_vvadd_opt
+from ubmark.proc_ubmark_cmult         import ubmark_cmult
+from ubmark.proc_ubmark_bsearch       import ubmark_bsearch
+from ubmark.proc_ubmark_mfilt         import ubmark_mfilt
+from ubmark.proc_ubmark_dot           import ubmark_dot
+
+#-------------------------------------------------------------------------
+# Tables
+#-------------------------------------------------------------------------
+
+model_impl_dict = {
+  "base": ProcBaseRTL,
+  "alt" : ProcAltRTL,
+  "fl"  : ProcFL,
+}
+
+input_dict = {
+  "vvadd-unopt"   : ubmark_vvadd_unopt,
+  "vvadd-opt"     : ubmark_vvadd_opt,
+  "bsearch"       : ubmark_bsearch,
+  "mfilt"         : ubmark_mfilt,
+  "cmult"         : ubmark_cmult,
+  "dot"           : ubmark_dot,
+}
+
+#-------------------------------------------------------------------------
+# run_sim
+#-------------------------------------------------------------------------
+# The keyword arguments and their defaults are the same as the command
+# line options of proc-sim. The result always includes the impl, the
+# input, whether verification passed (None if we did not verify), the
+# wall-clock time of the simulation (sim_time, in seconds), and the
+# number of simulated cycles per second. A regular run also includes
+# num_cycles (only the cycles after reset, so that the PyMTL and the
+# native simulator count the same cycles), num_insts, and cpi, both for
+# the whole run and only for the cycles where stats_en is set (the
+# *_stats_en keys, cpi_stats_en is None if no instructions were
+# committed with stats_en set). A sampled run includes num_samples,
+# num_detailed, cpi, and cpi_err instead (cpi is None if we did not take
+# any samples, cpi_err is None if there are not enough samples to
+# estimate it). We never return an infinite or NaN number, so the result
+# can always be written as strict JSON.
+#
+# With exit_on_stats_off we stop the simulation as soon as stats_en goes
+# from one to zero (i.e., at the end of the kernel), so we do not have
+# to simulate the epilogue if we only care about the kernel.
+#
+# With cpi_stack a regular run also includes the CPI stack (cpi_stack,
+# see proc_cpi_stack) and the branch prediction statistics (num_branches,
+# num_mispred, and bpred_accuracy, see proc_bpred_stats) if the
+# processor model supports them.
+#
+# With prtl we use the PyMTL RTL model of the processor (ProcBasePRTL or
+# ProcAltPRTL) even if ProcBaseRTL and ProcAltRTL choose the Verilog
+# model. The PyMTL RTL models only implement a few instructions, so they
+# can only run the dot input.
+#
+# With bpred we use the PyMTL RTL baseline processor with the branch
+# predictor in the F stage (see BranchPredictorPRTL).
+#
+# With icache we put an instruction cache of icache_nbytes with lines of
+# icache_line_nbytes and icache_nways ways between the processor and the
+# memory (see proc_icache), either the RTL model (rtl) or the FL model
+# (fl) which only counts the misses. A regular run then also includes
+# icache_accesses, icache_misses, and icache_hit_rate (None without
+# accesses).
+#
+# With native we run a Verilog model natively (see proc_native_sim)
+# instead of through the PyMTL simulator. A native run includes the same
+# statistics as a regular run (without the cycles spent in reset).
+#
+# With translate we translate the PyMTL RTL model of the processor into
+# Verilog and simulate the Verilated model instead (see proc_translate),
+# either through the PyMTL simulator or, together with native, natively.
+#
+# With trace we record a binary pipeline trace into
+# proc-<impl>-<input>.trace (see proc_trace, the result then includes
+# trace_file) if the processor model supports it, otherwise we print the
+# line trace as usual.
+#
+# With static_sched we replace the combinational blocks of the control
+# unit with a single block which calls them in a static order (see
+# proc_static_sched). The single block still runs whenever one of the
+# signals it reads changes, so it can run more than once per cycle.
+# The result then also includes the schedule (static_schedule) and how
+# often the single block was called (static_sched_evals). With
+# cpi_stack (i.e., --stats) the result includes how often the blocks of
+# the control unit were called, with or without static_sched
+# (ctrl_block_evals), if the processor is a PyMTL RTL model.
+
+def run_sim( impl="base", input="vvadd-unopt", trace=False, verify=False,
+             dump_vcd=False, mem_latency=0, mem_dprob=0.0, max_cycles=15000,
+             fast_forward_insts=0, sample_period=0, sample_warmup=100,
+             sample_size=1000, save_checkpoint_file=None,
+             restore_checkpoint_file=None, exit_on_stats_off=False,
+             cpi_stack=False, native=False, translate=False,
+             static_sched=False, bpred=False, icache=None,
+             icache_nbytes=1024, icache_line_nbytes=16, icache_nways=1,
+             prtl=False ):
+
+  # Make sure the random memory delays are the same for every run
+
+  random.seed(0xdeadbeef)
+
+  ProcModel = model_impl_dict[ impl ]
+
+  if bpred:
+    if impl != "base":
+      raise Exception( "--bpred needs the baseline processor (base)" )
+    ProcModel = functools.partial( ProcBasePRTL, bpred=True )
+
+  if prtl or translate:
+    if impl not in translate_impl_dict:
+      raise Exception( "--prtl and --translate need a PyMTL RTL model "
+                       "(base or alt)" )
+    if not bpred:
+      ProcModel = translate_impl_dict[ impl ]
+
+  if translate:
+    ProcModel = translate_proc( ProcModel )
+
+  if icache:
+    if native:
+      raise Exception( "--icache cannot be combined with --native" )
+    ProcModel = icache_proc( ProcModel, icache_impl_dict[ icache ],
+                             icache_nbytes, icache_line_nbytes, icache_nways )
+
+  # Create VCD filename
+
+  vcd_file = ""
+  if dump_vcd:
+    vcd_file = "proc-{}-{}.vcd".format( impl, input )
+
+  # Create test harness and elaborate
+
+  model = TestHarness( ProcModel, vcd_file, 0, 0, mem_dprob, mem_latency )
+  model.vcd_file = vcd_file
+
+  model.elaborate()
+
+  # The processor behind the instruction cache
+
+  proc = model.proc
+  if icache:
+    proc = model.proc.proc
+
+  # We can only switch from the functional model to the FL model or the
+  # PyMTL RTL models
+
+  switch_models = fast_forward_insts or sample_period \
+               or restore_checkpoint_file or save_checkpoint_file
+
+  if switch_models and ( icache or not state_transfer_supported( proc ) ):
+    raise Exception( "--fast-forward, --sample-period, --save-checkpoint, "
+                     "and --restore need the FL model or a PyMTL RTL model "
+                     "(without --icache)" )
+
+  if native and ( switch_models or trace or dump_vcd ):
+    raise Exception( "--native cannot be combined with switching models, "
+                     "--trace, or --dump-vcd" )
+
+  if static_sched and ( native or not hasattr( proc, "ctrl" ) ):
+    raise Exception( "--static-sched needs a PyMTL RTL model" )
+
+  ubmark = input_dict[ input ]
+
+  # Assemble the test program
+
+  mem_image = ubmark.gen_mem_image()
+
+  # Load the program into the model
+
+  model.load( mem_image )
+
+  # Create a simulator using the simulation tool. This is where PyMTL
+  # imports a Verilog model, so we reuse the import from the build cache
+
+  if isinstance( proc, VerilogModel ):
+    with verilog_import_cache( proc.class_name ):
+      sim = SimulationTool( model )
+  else:
+    sim = SimulationTool( model )
+
+  # Statically schedule the control unit
+
+  sched = None
+  if static_sched:
+    sched = StaticSchedule( sim, proc.ctrl )
+
+  # Count the event-driven calls of the control unit blocks
+
+  counter = None
+  if cpi_stack and not static_sched and not native \
+      and hasattr( proc, "ctrl" ):
+    counter = CombEvalCounter( sim, proc.ctrl )
+
+  # Run the simulation
+
+  result     = { "impl" : impl, "input" : input, "passed" : None }
+  num_insts  = 0
+  start_time = time.time()
+
+  # Restore the checkpoint and fast-forward on the functional model. This
+  # has to happen before reset so that the test source starts from the
+  # first unconsumed message.
+
+  translator = None
+
+  if restore_checkpoint_file:
+    translator = restore_checkpoint( restore_checkpoint_file, model )
+
+  if fast_forward_insts:
+    translator = fast_forward( model, fast_forward_insts,
+                               translator=translator )
+    result["num_ff_insts"] = translator.num_insts
+
+  if save_checkpoint_file:
+    if translator is None:
+      translator = fast_forward( model, 0 )
+    save_checkpoint( save_checkpoint_file, translator, model )
+
+  ncycles = 0
+
+  if sample_period:
+
+    # Systematic sampling. We hold reset a little longer than the memory
+    # latency between samples to drain any outstanding memory responses.
+
+    (samples,translator) = \
+      run_sampled( model, sim, sample_period, sample_warmup, sample_size,
+                   max_cycles, reset_cycles=mem_latency+2,
+                   translator=translator )
+
+    (cpi,cpi_err) = sample_cpi( samples )
+
+    result["num_insts"]    = translator.num_insts
+    result["num_samples"]  = len( samples )
+    result["num_detailed"] = sum([ n for (c,n) in samples ])
+    result["cpi"]          = cpi
+    result["cpi_err"]      = None if cpi_err is None or math.isinf( cpi_err ) \
+                             else cpi_err
+
+    ncycles = sim.ncycles
+
+  elif native:
+
+    # The flattened Verilog has been generated when the simulator
+    # imported the Verilog model
+
+    native_sim = NativeProcSim( build_native_sim( model.proc.class_name ),
+                                len( model.mem.mem ), mem_latency,
+                                mem_dprob )
+
+    native_sim.load_image( mem_image )
+    native_sim.reset()
+
+    run_native( model, native_sim, max_cycles, exit_on_stats_off )
+
+    h = native_sim.h
+
+    # Force a test failure if we timed out
+
+    assert h.ncycles < max_cycles
+
+    result["num_cycles"] = h.ncycles
+    result["num_insts"]  = h.ninsts
+    result["cpi"]        = float(h.ncycles) / float(h.ninsts)
+
+    result["num_cycles_stats_en"] = h.ncycles_stats_en
+    result["num_insts_stats_en"]  = h.ninsts_stats_en
+    result["cpi_stats_en"]        = None
+
+    if h.ninsts_stats_en > 0:
+      result["cpi_stats_en"] = \
+        float(h.ncycles_stats_en) / float(h.ninsts_stats_en)
+
+    ncycles = h.ncycles
+
+  else:
+
+    if translator is not None:
+      reset_and_transfer_state( sim, translator, model.proc )
+    else:
+      sim.reset()
+
+    num_cycles_stats_en = 0
+    num_insts_stats_en  = 0
+    prev_stats_en       = False
+
+    stack = None
+    if cpi_stack and cpi_stack_supported( proc ):
+      stack = CpiStack( proc )
+
+    bpred_stats = None
+    if cpi_stack and bpred_stats_supported( proc ):
+      bpred_stats = BranchPredStats( proc )
+
+    recorder = None
+    if trace and trace_supported( proc ):
+      recorder = TraceRecorder( proc, max_cycles, sim.ncycles )
+
+    # Only count the cycles after reset, like the native simulator
+
+    num_cycles = 0
+
+    while not model.done() and num_cycles < max_cycles:
+      if recorder is not None:
+        recorder.record()
+      elif trace:
+        sim.print_line_trace()
+      sim.cycle()
+      num_cycles += 1
+
+      # count number of commited instructions, and the cycles and
+      # instructions inside the stats_en window
+
+      stats_en = sim.model.proc.stats_en
+
+      if stats_en:
+        num_cycles_stats_en += 1
+
+      if sim.model.proc.commit_inst:
+        num_insts += 1
+        if stats_en:
+          num_insts_stats_en += 1
+
+      if stack is not None:
+        stack.tick()
+
+      if bpred_stats is not None:
+        bpred_stats.tick()
+
+      if exit_on_stats_off and prev_stats_en and not stats_en:
+        break
+
+      prev_stats_en = bool( stats_en )
+
+    # Force a test failure if we timed out
+
+    assert num_cycles < max_cycles
+
+    # Add a couple extra ticks so that the VCD dump is nicer. We do not
+    # count them in num_cycles.
+
+    sim.cycle()
+    sim.cycle()
+    sim.cycle()
+
+    result["num_cycles"] = num_cycles
+    result["num_insts"]  = num_insts
+    result["cpi"]        = float(num_cycles) / float(num_insts)
+
+    result["num_cycles_stats_en"] = num_cycles_stats_en
+    result["num_insts_stats_en"]  = num_insts_stats_en
+    result["cpi_stats_en"]        = None
+
+    if num_insts_stats_en > 0:
+      result["cpi_stats_en"] = \
+        float(num_cycles_stats_en) / float(num_insts_stats_en)
+
+    if stack is not None:
+      result["cpi_stack"] = stack.cpi_stack()
+
+    if bpred_stats is not None:
+      result["num_branches"]   = bpred_stats.num_branches
+      result["num_mispred"]    = bpred_stats.num_mispred
+      result["bpred_accuracy"] = bpred_stats.accuracy()
+
+    if icache:
+      ( result["icache_accesses"], result["icache_misses"],
+        result["icache_hit_rate"] ) = icache_stats( model.proc )
+
+    if recorder is not None:
+      result["trace_file"] = "proc-{}-{}.trace".format( impl, input )
+      recorder.save( result["trace_file"] )
+
+    ncycles = sim.ncycles
+
+  if sched is not None:
+    result["static_schedule"]    = sched.report()
+    result["static_sched_evals"] = sched.num_evals
+    if cpi_stack:
+      result["ctrl_block_evals"] = sched.num_block_evals
+
+  if counter is not None:
+    result["ctrl_block_evals"] = counter.num_block_evals
+
+  # Simulator throughput
+
+  result["sim_time"]       = time.time() - start_time
+  result["cycles_per_sec"] = ncycles / max( result["sim_time"], 1e-9 )
+
+  if verify:
+    result["passed"] = bool( ubmark.verify( sim.model.mem.mem ) )
+
+  return result
@@ -0,0 +1,361 @@
+#=========================================================================
+# proc_static_sched
+#=========================================================================
+# Static scheduling of the combinational blocks of a control unit (e.g.,
+# ProcBaseCtrlPRTL). The event-driven simulator calls a combinational
+# block again whenever any signal it reads changes, so the control unit
+# blocks are called many times per cycle while the stall and squash
+# signals settle. The blocks form a DAG though, so we can instead call
+# all of them from a single block, in topological order.
+#
+# We find out which signals each block reads and writes from its source
+# code (including helper functions it calls, e.g., cs() in the control
+# signal table), and order the blocks into levels: a block is in level
+# n if the latest block it depends on is in level n-1. A combinational
+# loop between blocks is an error. Then we replace all the blocks with
+# a single block which calls them in order, and register that block on
+# every signal which any of the blocks reads. Writes between the blocks
+# do not trigger anything, since the simulator does not re-trigger the
+# block which is currently running. The single block can still run more
+# than once per cycle if a signal from outside the control unit (e.g.,
+# from the datapath) changes after it ran.
+#
+# This has to be done after the simulator has been created, since the
+# simulator replaces connected signals with the same signal value:
+#
+#  sim   = SimulationTool( th )
+#  sched = StaticSchedule( sim, th.proc.ctrl )
+#  print sched.report()
+#  sim.reset()
+#
+# CombEvalCounter counts the block calls of the event-driven simulator
+# in the same way, so that we can compare the two (num_block_evals):
+#
+#  sim     = SimulationTool( th )
+#  counter = CombEvalCounter( sim, th.proc.ctrl )
+#  sim.reset()
+#
+
+import ast
+import inspect
+import textwrap
+import types
+
+from pymtl import *
+
+#-------------------------------------------------------------------------
+# levelize
+#-------------------------------------------------------------------------
+# Takes a list of blocks and a dictionary with the set of signals each
+# block reads and writes. Returns a list of levels, each level is a list
+# of blocks in the original order. Raises an exception with the blocks
+# in the loop if there is a combinational loop. A block which reads a
+# signal it writes itself does not depend on itself.
+
+def levelize( blocks, reads, writes, names=None ):
+
+  if names is None:
+    names = dict([ ( block, str( block ) ) for block in blocks ])
+
+  preds = dict([ ( block, set() ) for block in blocks ])
+  succs = dict([ ( block, set() ) for block in blocks ])
+
+  for src in blocks:
+    for dst in blocks:
+      if src is not dst and writes[src] & reads[dst]:
+        preds[dst].add( src )
+        succs[src].add( dst )
+
+  # Kahn's algorithm, one level at a time
+
+  levels    = []
+  remaining = list( blocks )
+  done      = set()
+
+  while remaining:
+
+    level = [ block for block in remaining if preds[block] <= done ]
+
+    if not level:
+      loop = find_loop( remaining, succs )
+      raise Exception( "Combinational loop between blocks: {}"
+                       .format( " -> ".join([ names[b] for b in loop ]) ) )
+
+    levels.append( level )
+    done.update( level )
+    remaining = [ block for block in remaining if block not in done ]
+
+  return levels
+
+# Every block left over by Kahn's algorithm has a predecessor which is
+# left over too, so walking backwards from any of them has to run into a
+# loop.
+
+def find_loop( remaining, succs ):
+
+  remaining = set( remaining )
+  preds     = dict([ ( block, [ b for b in remaining if block in succs[b] ] )
+                     for block in remaining ])
+
+  path  = []
+  block = next( iter( remaining ) )
+  while block not in path:
+    path.append( block )
+    block = preds[block][0]
+
+  loop = path[ path.index( block ): ] + [ block ]
+  return list( reversed( loop ) )
+
+#-------------------------------------------------------------------------
+# Signal accesses
+#-------------------------------------------------------------------------
+# Find the signals a combinational block reads and writes. We look for
+# attribute chains starting at s (e.g., s.inst_D, s.ctrl.val_D.value)
+# and resolve them on the model. Writing .value is a write, everything
+# else is a read. Calls to helper functions in the closure of the block
+# are followed. We keep the signal values themselves in signals (keyed
+# by id, since signal values are not hashable by identity).
+
+def get_closure_vars( func ):
+  names = func.__code__.co_freevars
+  cells = func.__closure__ or ()
+  return dict([ ( name, cell.cell_contents ) for (name,cell) in zip( names, cells ) ])
+
+def get_attr_chain( node ):
+
+  names = []
+  while isinstance( node, ast.Attribute ):
+    names.insert( 0, node.attr )
+    node = node.value
+
+  if isinstance( node, ast.Name ) and node.id == "s":
+    return names
+  return None
+
+class SignalAccesses( ast.NodeVisitor ):
+
+  def __init__( s, func, reads, writes, signals, seen ):
+
+    s.closure = get_closure_vars( func )
+    s.model   = s.closure.get( "s" )
+    s.reads   = reads
+    s.writes  = writes
+    s.signals = signals
+    s.seen    = seen
+
+    seen.add( func )
+
+    tree = ast.parse( textwrap.dedent( inspect.getsource( func ) ) )
+    s.visit( tree.body[0] )
+
+  def visit_FunctionDef( s, node ):
+    # skip the decorators
+    for stmt in node.body:
+      s.visit( stmt )
+
+  def visit_Attribute( s, node ):
+
+    chain = get_attr_chain( node )
+    if chain is None or s.model is None:
+      s.generic_visit( node )
+      return
+
+    is_write = False
+    if chain[-1] in [ "value", "next" ]:
+      is_write = isinstance( node.ctx, ast.Store )
+      chain    = chain[:-1]
+
+    obj = s.model
+    try:
+      for name in chain:
+        obj = getattr( obj, name )
+    except AttributeError:
+      return
+
+    if isinstance( obj, ( Model, types.FunctionType, types.MethodType ) ):
+      return
+
+    s.signals[ id( obj ) ] = obj
+
+    if is_write:
+      s.writes.add( id( obj ) )
+    else:
+      s.reads.add( id( obj ) )
+
+  def visit_Call( s, node ):
+
+    if isinstance( node.func, ast.Name ):
+      helper = s.closure.get( node.func.id )
+      if isinstance( helper, types.FunctionType ) and helper not in s.seen:
+        SignalAccesses( helper, s.reads, s.writes, s.signals, s.seen )
+
+    s.generic_visit( node )
+
+#-------------------------------------------------------------------------
+# get_comb_blocks
+#-------------------------------------------------------------------------
+# All combinational blocks of a model and its submodules, together with
+# their (hierarchical) names.
+
+def get_comb_blocks( model, prefix="" ):
+
+  blocks = [ ( block, prefix + block.__name__ )
+             for block in model.get_combinational_blocks() ]
+
+  for name in sorted( vars( model ) ):
+    child = getattr( model, name )
+    if isinstance( child, Model ) and child in model.get_submodules():
+      blocks.extend( get_comb_blocks( child, prefix + name + "." ) )
+
+  return blocks
+
+#-------------------------------------------------------------------------
+# get_signal_accesses
+#-------------------------------------------------------------------------
+# The signals each of the blocks reads and writes (keyed by block), and
+# the signal values themselves (keyed by id).
+
+def get_signal_accesses( blocks ):
+
+  reads   = {}
+  writes  = {}
+  signals = {}
+
+  for block in blocks:
+    reads[block]  = set()
+    writes[block] = set()
+    SignalAccesses( block, reads[block], writes[block], signals, set() )
+
+  return ( reads, writes, signals )
+
+def check_event_driven( blocks, what ):
+  if not hasattr( blocks[0], "id" ):
+    raise Exception( "{} needs the event-driven PyMTL simulator!"
+                     .format( what ) )
+
+#-------------------------------------------------------------------------
+# StaticSchedule
+#-------------------------------------------------------------------------
+# num_evals counts the calls of the single block, num_block_evals the
+# calls of the blocks it calls in turn.
+
+class StaticSchedule (object):
+
+  def __init__( s, sim, model ):
+
+    s.num_evals       = 0
+    s.num_block_evals = 0
+
+    # Signal accesses of each block
+
+    blocks   = get_comb_blocks( model )
+    s.names  = dict( blocks )
+    s.blocks = [ block for (block,name) in blocks ]
+
+    (s.reads,s.writes,s.signals) = get_signal_accesses( s.blocks )
+
+    # Levelize, raises an exception if there is a combinational loop
+
+    s.levels   = levelize( s.blocks, s.reads, s.writes, s.names )
+    s.schedule = [ block for level in s.levels for block in level ]
+
+    # Replace the blocks with a single block
+
+    s.register( sim )
+
+  #-----------------------------------------------------------------------
+  # register
+  #-----------------------------------------------------------------------
+  # Swap the callbacks of the blocks on their signal values for a single
+  # block which reuses the event id of the first block. The blocks could
+  # already be in the event queue from the initial evaluation, so we
+  # drain the queue first. This relies on how the event-driven simulator
+  # keeps the callbacks (_callbacks) and deduplicates events (id), the
+  # lockstep test in proc_static_sched_test checks that the control unit
+  # still behaves the same.
+
+  def register( s, sim ):
+
+    schedule = s.schedule
+
+    check_event_driven( schedule, "Static scheduling" )
+
+    sim.eval_combinational()
+
+    def comb_static():
+      s.num_evals       += 1
+      s.num_block_evals += len( schedule )
+      for block in schedule:
+        block()
+
+    comb_static.id = schedule[0].id
+    comb_static.cb = comb_static
+
+    s.comb_static = comb_static
+
+    blocks = set( s.blocks )
+    reads  = set()
+    for block in s.blocks:
+      reads.update( s.reads[block] )
+
+    for signal in reads:
+      obj       = s.signals[signal]
+      callbacks = [ cb for cb in obj._callbacks if cb not in blocks ]
+      if len( callbacks ) != len( obj._callbacks ):
+        callbacks.append( comb_static )
+      obj._callbacks[:] = callbacks
+
+  #-----------------------------------------------------------------------
+  # report
+  #-----------------------------------------------------------------------
+
+  def report( s ):
+
+    lines = [ "{} blocks in {} levels".format( len( s.blocks ),
+                                               len( s.levels ) ) ]
+
+    for (i,level) in enumerate( s.levels ):
+      lines.append( "  level {:>2}: {}".format( i,
+        " ".join([ s.names[block] for block in level ]) ) )
+
+    return "\n".join( lines )
+
+#-------------------------------------------------------------------------
+# CombEvalCounter
+#-------------------------------------------------------------------------
+# Count how often the event-driven simulator calls the combinational
+# blocks of a model. We swap the callbacks of the blocks on their signal
+# values for wrappers which count the calls, and which keep the event id
+# of the block, so the simulator schedules them exactly like the blocks.
+
+class CombEvalCounter (object):
+
+  def __init__( s, sim, model ):
+
+    s.num_block_evals = 0
+
+    s.blocks = [ block for (block,name) in get_comb_blocks( model ) ]
+
+    (reads,writes,signals) = get_signal_accesses( s.blocks )
+
+    check_event_driven( s.blocks, "Counting block evaluations" )
+
+    sim.eval_combinational()
+
+    wrappers = dict([ ( block, s.wrap( block ) ) for block in s.blocks ])
+
+    for block in s.blocks:
+      for signal in reads[block]:
+        obj = signals[signal]
+        obj._callbacks[:] = [ wrappers.get( cb, cb ) for cb in obj._callbacks ]
+
+  def wrap( s, block ):
+
+    def comb_counted():
+      s.num_block_evals += 1
+      block()
+
+    comb_counted.id = block.id
+    comb_counted.cb = comb_counted
+
+    return comb_counted
@@ -0,0 +1,214 @@
+#=========================================================================
+# proc_trace
+#=========================================================================
+# Binary pipeline traces. Formatting the line trace of the processor
+# (disassembling the instruction in D and formatting all five stages)
+# every cycle makes traced simulations about 10x slower. Instead we only
+# record the state of the pipeline each cycle into a preallocated buffer
+# and render the usual line trace later, and only for the cycles we are
+# actually interested in.
+#
+# Each cycle is a fixed-size little-endian record:
+#
+#  flags     : val/stall/squash bits of each stage (2B, see trace_flags)
+#  pc_F      : PC of the instruction in F (4B)
+#  pc_D      : PC of the instruction in D (4B)
+#  inst_D    : instruction in D (4B)
+#  inst_type : instruction type in X, M, and W (1B each)
+#
+# The datapath does not keep the PC after the D stage, so we cannot
+# record the PCs of X, M, and W. The file starts with a magic string,
+# a version, the cycle of the first record, and the number of records
+# (4B each).
+#
+#  sim.reset()
+#  recorder = TraceRecorder( th.proc, max_cycles, sim.ncycles )
+#  while not th.done():
+#    recorder.record()
+#    sim.cycle()
+#  recorder.save( "proc.trace" )
+#
+#  for line in format_trace( "proc.trace", start=100, end=200 ):
+#    print line
+#
+
+import struct
+
+from tinyrv2_encoding import disassemble_inst
+from TinyRV2InstPRTL  import inst_dict
+
+trace_magic   = "TRV2TRCE"
+trace_version = 1
+
+trace_record  = struct.Struct( "<HIIIBBB" )
+trace_header  = struct.Struct( "<8sIII" )
+
+#-------------------------------------------------------------------------
+# Flags
+#-------------------------------------------------------------------------
+# The bit of each flag in the flags field is its index in this list.
+
+trace_flags = [
+  "val_F", "stall_F", "squash_F",
+  "val_D", "stall_D", "squash_D",
+  "val_X", "stall_X",
+  "val_M", "stall_M",
+  "val_W", "stall_W",
+]
+
+#-------------------------------------------------------------------------
+# trace_supported
+#-------------------------------------------------------------------------
+# We need the pipeline signals of the control unit and the PC registers
+# of the datapath, so this only works for the PyMTL RTL models.
+
+def trace_supported( proc ):
+  return hasattr( proc, "ctrl" ) and hasattr( proc, "dpath" ) \
+     and hasattr( proc.ctrl, "squash_F" ) and hasattr( proc.dpath, "pc_reg_D" )
+
+#-------------------------------------------------------------------------
+# TraceRecorder
+#-------------------------------------------------------------------------
+
+class TraceRecorder (object):
+
+  def __init__( s, proc, max_cycles, start_cycle=0 ):
+
+    assert trace_supported( proc ), \
+      "Binary traces are only supported for the PyMTL RTL models!"
+
+    s.ctrl        = proc.ctrl
+    s.dpath       = proc.dpath
+    s.max_cycles  = max_cycles
+    s.start_cycle = start_cycle
+    s.ncycles     = 0
+    s.data        = bytearray( max_cycles * trace_record.size )
+
+  #-----------------------------------------------------------------------
+  # record
+  #-----------------------------------------------------------------------
+  # Call once per cycle before sim.cycle() (i.e., where we would print
+  # the line trace). Cycles beyond max_cycles are not recorded.
+
+  def record( s ):
+
+    if s.ncycles >= s.max_cycles:
+      return
+
+    c = s.ctrl
+
+    flags = 0
+    for (i,name) in enumerate( trace_flags ):
+      if getattr( c, name ):
+        flags |= 1 << i
+
+    trace_record.pack_into( s.data, s.ncycles * trace_record.size, flags,
+      int( s.dpath.pc_reg_F.out ), int( s.dpath.pc_reg_D.out ),
+      int( c.inst_D ), int( c.inst_type_X ), int( c.inst_type_M ),
+      int( c.inst_type_W ) )
+
+    s.ncycles += 1
+
+  #-----------------------------------------------------------------------
+  # save
+  #-----------------------------------------------------------------------
+
+  def save( s, filename ):
+    with open( filename, "wb" ) as fd:
+      fd.write( trace_header.pack( trace_magic, trace_version,
+                                   s.start_cycle, s.ncycles ) )
+      fd.write( s.data[ : s.ncycles * trace_record.size ] )
+
+#-------------------------------------------------------------------------
+# format_trace_record
+#-------------------------------------------------------------------------
+# Renders one record exactly like ProcBasePRTL.line_trace.
+
+def format_trace_record( record ):
+
+  (flags,pc_F,pc_D,inst_D,inst_type_X,inst_type_M,inst_type_W) = record
+
+  f = dict([ ( name, bool( flags & ( 1 << i ) ) )
+             for (i,name) in enumerate( trace_flags ) ])
+
+  # F stage
+
+  if not f["val_F"]:
+    F_str = "{:<8s}".format( ' ' )
+  elif f["squash_F"]:
+    F_str = "{:<8s}".format( '~' )
+  elif f["stall_F"]:
+    F_str = "{:<8s}".format( '#' )
+  else:
+    F_str = "{:08x}".format( pc_F )
+
+  # D stage
+
+  if not f["val_D"]:
+    D_str = "{:<23s}".format( ' ' )
+  elif f["squash_D"]:
+    D_str = "{:<23s}".format( '~' )
+  elif f["stall_D"]:
+    D_str = "{:<23s}".format( '#' )
+  else:
+    D_str = "{:<23s}".format( disassemble_inst( inst_D ) )
+
+  # X, M, and W stages
+
+  def format_stage( val, stall, inst_type ):
+    if not val:
+      return "{:<5s}".format( ' ' )
+    elif stall:
+      return "{:<5s}".format( '#' )
+    else:
+      return "{:<5s}".format( inst_dict[ inst_type ] )
+
+  X_str = format_stage( f["val_X"], f["stall_X"], inst_type_X )
+  M_str = format_stage( f["val_M"], f["stall_M"], inst_type_M )
+  W_str = format_stage( f["val_W"], f["stall_W"], inst_type_W )
+
+  return F_str + "|" + D_str + "|" + X_str + "|" + M_str + "|" + W_str
+
+#-------------------------------------------------------------------------
+# read_trace
+#-------------------------------------------------------------------------
+# Returns the cycle of the first record we read and the records of a
+# trace file as a list of tuples. Only reads the records in the cycle
+# range [start,end).
+
+def read_trace( filename, start=None, end=None ):
+
+  with open( filename, "rb" ) as fd:
+
+    header = fd.read( trace_header.size )
+    (magic,version,start_cycle,ncycles) = trace_header.unpack( header )
+
+    if magic != trace_magic or version != trace_version:
+      raise Exception( "{} is not a pipeline trace!".format( filename ) )
+
+    # Record indices of the cycle range
+
+    first = 0       if start is None else start - start_cycle
+    last  = ncycles if end   is None else end   - start_cycle
+
+    last  = max( 0, min( last, ncycles ) )
+    first = max( 0, min( first, last ) )
+
+    fd.seek( trace_header.size + first * trace_record.size )
+    data = fd.read( ( last - first ) * trace_record.size )
+
+  records = [ trace_record.unpack_from( data, i * trace_record.size )
+              for i in xrange( last - first ) ]
+
+  return ( start_cycle + first, records )
+
+#-------------------------------------------------------------------------
+# format_trace
+#-------------------------------------------------------------------------
+# Renders the line trace for the cycle range [start,end), with the cycle
+# number in front like the simulator does.
+
+def format_trace( filename, start=None, end=None ):
+  (first,records) = read_trace( filename, start, end )
+  for (i,record) in enumerate( records ):
+    yield "{:3}: {}".format( first + i, format_trace_record( record ) )
@@ -0,0 +1,50 @@
+#=========================================================================
+# proc_translate
+#=========================================================================
+# Run a PyMTL RTL processor as compiled code. We translate the processor
+# into Verilog with the PyMTL TranslationTool, which Verilates it and
+# wraps the result just like a Verilog import (i.e., the same
+# Verilator/CFFI flow as ProcBaseVRTL and ProcAltVRTL). The translation
+# is cached: the TranslationTool only Verilates again if the translated
+# Verilog changed, and we keep its output in the build cache (see
+# verilog_import_cache in proc_native_sim) so that a new build directory
+# does not start from scratch. The flattened Verilog can also be
+# simulated with the native simulator, which uses the same build cache.
+#
+# translate_proc returns something that looks like a processor class so
+# that we can pass it to the test harness:
+#
+#  th = TestHarness( translate_proc( ProcBasePRTL ), ... )
+#
+
+from pymtl import *
+
+from ProcBasePRTL import ProcBasePRTL
+from ProcAltPRTL  import ProcAltPRTL
+
+from proc_native_sim import verilog_import_cache
+
+#-------------------------------------------------------------------------
+# Tables
+#-------------------------------------------------------------------------
+# The PyMTL RTL model for each processor implementation (ProcBaseRTL and
+# ProcAltRTL might be the Verilog models).
+
+translate_impl_dict = {
+  "base": ProcBasePRTL,
+  "alt" : ProcAltPRTL,
+}
+
+#-------------------------------------------------------------------------
+# translate_proc
+#-------------------------------------------------------------------------
+
+def translate_proc( ProcModel ):
+
+  def TranslatedProc( *args, **kwargs ):
+    proc = ProcModel( *args, **kwargs )
+    proc.elaborate()
+    with verilog_import_cache( proc.class_name ):
+      return TranslationTool( proc )
+
+  return TranslatedProc
@@ -0,0 +1,91 @@
+#========================================================================
+# ubmark-dot: dot product kernel
+#========================================================================
+#
+# This code computes the dot product of two arrays and sends it to the
+# manager. The code is equivalent to:
+#
+# int dot( int *src0, int *src1, int size ) {
+#   int sum = 0;
+#   for ( int i = 0; i < size; i++ )
+#     sum += *src0++ * *src1++;
+#   return sum;
+# }
+#
+# The kernel only uses instructions which the PyMTL RTL processors
+# implement (there is no sw), so we can compare ProcBasePRTL and
+# ProcAltPRTL on it. Every iteration has a load-use hazard and a chain
+# of RAW hazards through the mul and the add. We reuse the input arrays
+# of vvadd.
+
+from pymtl                                import *
+from lab2_proc.test.tinyrv2_encoding_test import mk_section
+from lab2_proc.tinyrv2_encoding           import assemble
+
+from proc_ubmark_vvadd_data      import src0, src1
+
+c_dot_src0_ptr = 0x2000;
+c_dot_src1_ptr = 0x3000;
+c_dot_size     = 100;
+
+# the dot product wraps around like the 32-bit registers do
+
+c_dot_ref = sum([ a * b for (a,b) in zip( src0, src1 ) ]) & 0xffffffff
+
+class ubmark_dot:
+
+  # verification function, argument is a bytearray from TestMemory
+  # instance. The kernel does not write memory, the test sink already
+  # checked the dot product the kernel sent to the manager.
+
+  @staticmethod
+  def verify( memory ):
+    print( " [ passed ]: dot" )
+    return True
+
+  @staticmethod
+  def gen_mem_image():
+
+    # text section
+
+    text = \
+           """
+           # load array pointers
+           csrr  x1, mngr2proc < 100
+           csrr  x2, mngr2proc < 0x2000
+           csrr  x3, mngr2proc < 0x3000
+           add   x4, x0, x0
+
+         loop:
+           lw    x6, 0(x2)
+           lw    x7, 0(x3)
+           mul   x8, x6, x7
+           add   x4, x4, x8
+           addi  x2, x2, 4
+           addi  x3, x3, 4
+           addi  x1, x1, -1
+           bne   x1, x0, loop
+
+           # end of the program
+           csrw  proc2mngr, x4 > 0x{:08x}
+           nop
+           nop
+           nop
+           nop
+           nop
+           nop
+           """.format( c_dot_ref )
+
+    mem_image = assemble( text )
+
+    # load data by manually create data sections using binutils
+
+    src0_section = mk_section( ".data", c_dot_src0_ptr, src0 )
+    src1_section = mk_section( ".data", c_dot_src1_ptr, src1 )
+
+    # load data
+
+    mem_image.add_section( src0_section )
+    mem_image.add_section( src1_section )
+
+    return mem_image
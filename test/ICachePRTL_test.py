@@ -0,0 +1,214 @@
+#=========================================================================
+# ICachePRTL_test.py
+#=========================================================================
+
+import pytest
+import random
+import struct
+
+from pymtl      import *
+from harness    import *
+from pclib.ifcs import MemMsg4B, MemReqMsg4B, MemRespMsg4B
+from pclib.test import TestSource, TestSink, TestMemory, run_sim
+
+from lab2_proc.ICachePRTL       import ICachePRTL
+from lab2_proc.ICacheFL         import ICacheFL, ICacheTags
+from lab2_proc.ProcFL           import ProcFL
+from lab2_proc.ProcBasePRTL     import ProcBasePRTL
+from lab2_proc.proc_icache      import icache_proc, icache_stats
+
+from proc_test_utils import gen_nested_loop_test, mk_harness, run_cycles
+
+#-------------------------------------------------------------------------
+# ICacheTestHarness
+#-------------------------------------------------------------------------
+
+class ICacheTestHarness (Model):
+
+  def __init__( s, ICacheModel, nbytes, line_nbytes, nways, msgs,
+                src_delay, sink_delay, mem_stall_prob, mem_latency ):
+
+    s.src   = TestSource  ( MemReqMsg4B,  msgs[::2],  src_delay  )
+    s.cache = ICacheModel ( nbytes, line_nbytes, nways )
+    s.mem   = TestMemory  ( MemMsg4B(), 1, mem_stall_prob, mem_latency )
+    s.sink  = TestSink    ( MemRespMsg4B, msgs[1::2], sink_delay )
+
+    s.connect( s.src.out,         s.cache.cachereq )
+    s.connect( s.cache.memreq,    s.mem.reqs[0]    )
+    s.connect( s.mem.resps[0],    s.cache.memresp  )
+    s.connect( s.cache.cacheresp, s.sink.in_       )
+
+  def done( s ):
+    return s.src.done and s.sink.done
+
+  def line_trace( s ):
+    return s.src.line_trace()   + " > " + \
+           s.cache.line_trace() + " " + \
+           s.mem.line_trace()   + " > " + \
+           s.sink.line_trace()
+
+#-------------------------------------------------------------------------
+# Messages
+#-------------------------------------------------------------------------
+# The word at addr holds addr + 0x10000000, so every response tells us
+# which address it came from.
+
+def mk_req( opaque, addr ):
+  msg        = MemReqMsg4B()
+  msg.type_  = 0
+  msg.opaque = opaque
+  msg.addr   = addr
+  msg.len    = 0
+  msg.data   = 0
+  return msg
+
+def mk_resp( opaque, addr ):
+  msg        = MemRespMsg4B()
+  msg.type_  = 0
+  msg.opaque = opaque
+  msg.test   = 0
+  msg.len    = 0
+  msg.data   = addr + 0x10000000
+  return msg
+
+def gen_msgs( addrs ):
+  msgs = []
+  for (i,addr) in enumerate( addrs ):
+    msgs.extend([ mk_req( i & 0xff, addr ), mk_resp( i & 0xff, addr ) ])
+  return msgs
+
+#-------------------------------------------------------------------------
+# Address streams
+#-------------------------------------------------------------------------
+
+def seq_addrs():
+  return [ 0x1000 + 4*i for i in range( 64 ) ]
+
+def loop_addrs():
+  return [ 0x1000 + 4*i for j in range( 4 ) for i in range( 12 ) ]
+
+def conflict_addrs():
+  return [ 0x1000, 0x1040, 0x1004, 0x1044 ] * 4
+
+def random_addrs():
+  return [ 0x1000 + 4*random.randint( 0, 63 ) for i in range( 100 ) ]
+
+#-------------------------------------------------------------------------
+# run_icache_test
+#-------------------------------------------------------------------------
+
+def run_icache_test( ICacheModel, nbytes, line_nbytes, nways, addrs,
+                     dump_vcd, src_delay=0, sink_delay=0,
+                     mem_stall_prob=0, mem_latency=0 ):
+
+  th = ICacheTestHarness( ICacheModel, nbytes, line_nbytes, nways,
+                          gen_msgs( addrs ), src_delay, sink_delay,
+                          mem_stall_prob, mem_latency )
+
+  for addr in range( 0x1000, 0x1100, 4 ):
+    data = struct.pack( "<I", addr + 0x10000000 )
+    th.mem.write_mem( addr, bytearray( data ) )
+
+  run_sim( th, dump_vcd )
+
+  # Same misses as the tags on their own
+
+  tags = ICacheTags( nbytes, line_nbytes, nways )
+  num_misses = len([ a for a in addrs if not tags.access( a ) ])
+
+  assert int( th.cache.num_accesses ) == len( addrs )
+  assert int( th.cache.num_misses   ) == num_misses
+
+  return num_misses
+
+#-------------------------------------------------------------------------
+# Test cases
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "ICacheModel", [ ICacheFL, ICachePRTL ] )
+@pytest.mark.parametrize( "nbytes,line_nbytes,nways", [
+  ( 64,  16, 1 ), # direct-mapped
+  ( 64,  16, 2 ), # 2-way set-associative
+  ( 64,  16, 4 ), # fully associative
+  ( 64,  4,  1 ), # one word per line
+  ( 256, 32, 2 ),
+])
+@pytest.mark.parametrize( "gen_addrs", [
+  seq_addrs, loop_addrs, conflict_addrs, random_addrs
+])
+def test_icache( ICacheModel, nbytes, line_nbytes, nways, gen_addrs,
+                 dump_vcd ):
+  run_icache_test( ICacheModel, nbytes, line_nbytes, nways, gen_addrs(),
+                   dump_vcd )
+
+@pytest.mark.parametrize( "ICacheModel", [ ICacheFL, ICachePRTL ] )
+@pytest.mark.parametrize( "gen_addrs", [
+  seq_addrs, loop_addrs, conflict_addrs, random_addrs
+])
+def test_icache_rand_delays( ICacheModel, gen_addrs, dump_vcd ):
+  run_icache_test( ICacheModel, 64, 16, 2, gen_addrs(), dump_vcd,
+                   src_delay=3, sink_delay=5, mem_stall_prob=0.5,
+                   mem_latency=3 )
+
+# 0x1000 and 0x1040 map to the same set, so they keep replacing each
+# other in the direct-mapped cache but fit into the 2-way cache
+
+@pytest.mark.parametrize( "ICacheModel", [ ICacheFL, ICachePRTL ] )
+@pytest.mark.parametrize( "nways,num_misses", [ ( 1, 16 ), ( 2, 2 ) ] )
+def test_icache_conflict( ICacheModel, nways, num_misses, dump_vcd ):
+  assert run_icache_test( ICacheModel, 64, 16, nways, conflict_addrs(),
+                          dump_vcd ) == num_misses
+
+#-------------------------------------------------------------------------
+# Processor with an instruction cache
+#-------------------------------------------------------------------------
+
+ProcICachePRTL = icache_proc( ProcBasePRTL, ICachePRTL, 64, 16, 2 )
+ProcICacheFL   = icache_proc( ProcFL,       ICacheFL,   64, 16, 2 )
+
+import inst_add
+
+@pytest.mark.parametrize( "ProcModel", [ ProcICacheFL, ProcICachePRTL ] )
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_add.gen_basic_test     ) ,
+  asm_test( inst_add.gen_srcs_dep_test  ) ,
+  asm_test( inst_add.gen_value_test     ) ,
+  asm_test( inst_add.gen_random_test    ) ,
+])
+def test_add( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcICacheFL, ProcICachePRTL ] )
+def test_add_rand_delays( ProcModel, dump_vcd ):
+  run_test( ProcModel, inst_add.gen_random_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3 )
+
+#-------------------------------------------------------------------------
+# test_icache_proc_stats
+#-------------------------------------------------------------------------
+# The nested loops fit into the cache, so we only miss on the first
+# fetch from each line (and maybe on a fetch past the end of the
+# program), and with a slow memory the cache pays off.
+
+def run_proc( ProcModel, mem_latency ):
+
+  th  = mk_harness( ProcModel, gen_nested_loop_test,
+                    mem_latency=mem_latency )
+  sim = SimulationTool( th )
+  sim.reset()
+
+  return ( run_cycles( th, sim ), th.proc )
+
+def test_icache_proc_stats():
+
+  (base_cycles,_)         = run_proc( ProcBasePRTL, 4 )
+  (cycles,proc)           = run_proc( icache_proc( ProcBasePRTL, ICachePRTL,
+                                                   256, 16, 1 ), 4 )
+
+  (num_accesses,num_misses,hit_rate) = icache_stats( proc )
+
+  assert num_accesses >  80
+  assert num_misses   <= 5
+  assert hit_rate     >  0.9
+
+  assert cycles < base_cycles
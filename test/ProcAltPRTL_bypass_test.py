@@ -0,0 +1,251 @@
+#=========================================================================
+# ProcAltPRTL_bypass_test.py
+#=========================================================================
+# Run the instruction tests which only use instructions supported by the
+# PyMTL RTL processors on both the FL model and the bypassed processor
+# (the jump and mul tests are in ProcBasePRTL_jump_test and
+# ProcBasePRTL_mul_test). addi, andi, and or are new in the control
+# signal table the two PyMTL processors share, so we run them on the
+# baseline processor as well.
+
+import pytest
+import random
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.proc_cpi_stack import CpiStack
+from lab2_proc.ProcFL         import ProcFL
+from lab2_proc.ProcBasePRTL   import ProcBasePRTL
+from lab2_proc.ProcAltPRTL    import ProcAltPRTL
+
+from proc_test_utils import gen_stall_test, mk_harness, run_cycles
+
+#-------------------------------------------------------------------------
+# add
+#-------------------------------------------------------------------------
+
+import inst_add
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_add.gen_basic_test     ) ,
+  asm_test( inst_add.gen_dest_dep_test  ) ,
+  asm_test( inst_add.gen_src0_dep_test  ) ,
+  asm_test( inst_add.gen_src1_dep_test  ) ,
+  asm_test( inst_add.gen_srcs_dep_test  ) ,
+  asm_test( inst_add.gen_srcs_dest_test ) ,
+  asm_test( inst_add.gen_value_test     ) ,
+  asm_test( inst_add.gen_random_test    ) ,
+  asm_test( inst_add.gen_raw_test       ) ,
+  asm_test( inst_add.gen_waw_test       ) ,
+  asm_test( inst_add.gen_war_test       ) ,
+  asm_test( inst_add.gen_multiple_test  ) ,
+])
+def test_add( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+#-------------------------------------------------------------------------
+# addi
+#-------------------------------------------------------------------------
+
+import inst_addi
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_addi.gen_basic_test     ) ,
+  asm_test( inst_addi.gen_dest_dep_test  ) ,
+  asm_test( inst_addi.gen_src_dep_test   ) ,
+  asm_test( inst_addi.gen_srcs_dest_test ) ,
+  asm_test( inst_addi.gen_value_test     ) ,
+  asm_test( inst_addi.gen_random_test    ) ,
+  asm_test( inst_addi.gen_raw_test       ) ,
+  asm_test( inst_addi.gen_waw_test       ) ,
+  asm_test( inst_addi.gen_war_test       ) ,
+  asm_test( inst_addi.gen_multiple_test  ) ,
+])
+def test_addi( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+def test_addi_rand_delays( ProcModel, dump_vcd ):
+  run_test( ProcModel, inst_addi.gen_random_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3 )
+
+#-------------------------------------------------------------------------
+# andi
+#-------------------------------------------------------------------------
+
+import inst_andi
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_andi.gen_basic_test     ) ,
+  asm_test( inst_andi.gen_dest_dep_test  ) ,
+  asm_test( inst_andi.gen_src_dep_test   ) ,
+  asm_test( inst_andi.gen_srcs_dest_test ) ,
+  asm_test( inst_andi.gen_value_test     ) ,
+  asm_test( inst_andi.gen_random_test    ) ,
+  asm_test( inst_andi.gen_raw_test       ) ,
+  asm_test( inst_andi.gen_waw_test       ) ,
+  asm_test( inst_andi.gen_war_test       ) ,
+  asm_test( inst_andi.gen_multiple_test  ) ,
+])
+def test_andi( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+def test_andi_rand_delays( ProcModel, dump_vcd ):
+  run_test( ProcModel, inst_andi.gen_random_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3 )
+
+#-------------------------------------------------------------------------
+# or
+#-------------------------------------------------------------------------
+
+import inst_or
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_or.gen_basic_test     ) ,
+  asm_test( inst_or.gen_dest_dep_test  ) ,
+  asm_test( inst_or.gen_src0_dep_test  ) ,
+  asm_test( inst_or.gen_src1_dep_test  ) ,
+  asm_test( inst_or.gen_srcs_dep_test  ) ,
+  asm_test( inst_or.gen_srcs_dest_test ) ,
+  asm_test( inst_or.gen_value_test     ) ,
+  asm_test( inst_or.gen_random_test    ) ,
+  asm_test( inst_or.gen_raw_test       ) ,
+  asm_test( inst_or.gen_waw_test       ) ,
+  asm_test( inst_or.gen_war_test       ) ,
+  asm_test( inst_or.gen_multiple_test  ) ,
+])
+def test_or( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+def test_or_rand_delays( ProcModel, dump_vcd ):
+  run_test( ProcModel, inst_or.gen_random_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3 )
+
+#-------------------------------------------------------------------------
+# csr
+#-------------------------------------------------------------------------
+
+import inst_csr
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_csr.gen_basic_test      ),
+  asm_test( inst_csr.gen_bypass_test     ),
+  asm_test( inst_csr.gen_value_test      ),
+  asm_test( inst_csr.gen_random_test     ),
+  asm_test( inst_csr.gen_core_stats_test ),
+])
+def test_csr( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+#-------------------------------------------------------------------------
+# bypass
+#-------------------------------------------------------------------------
+# Back-to-back dependencies through X, M, and W, a load-use dependency
+# on both operands, and a branch which depends on a load.
+
+def gen_bypass_test():
+  return """
+    csrr x1, mngr2proc < 0x2000
+    lw   x2, 0(x1)
+    add  x3, x2, x2
+    lw   x4, 4(x1)
+    sub  x5, x4, x2
+    add  x6, x5, x3
+    add  x7, x6, x5
+    add  x8, x7, x6
+    nop
+    add  x9, x8, x6
+    csrw proc2mngr, x9 > 58
+    lw   x10, 8(x1)
+    bne  x10, x0, skip
+    add  x10, x0, x0
+  skip:
+    csrw proc2mngr, x10 > 1
+
+    .data
+    .word 5
+    .word 12
+    .word 1
+  """
+
+# The mul result is bypassed from X, the jalr target is computed from a
+# register bypassed from X (and the link register of the jal from W).
+
+def gen_bypass_jump_test():
+  return """
+    csrr x1, mngr2proc < 3
+    csrr x2, mngr2proc < 4
+    mul  x3, x1, x2
+    add  x4, x3, x1
+    csrw proc2mngr, x4 > 15
+    jal  x5, func
+    csrw proc2mngr, x6 > 17
+    jal  x0, done
+  func:
+    addi x6, x3, 5
+    addi x7, x5, 0
+    jalr x0, x7, 0
+  done:
+    csrw proc2mngr, x3 > 12
+  """
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "gen_test", [
+  gen_bypass_test, gen_bypass_jump_test
+])
+def test_bypass( gen_test, ProcModel, dump_vcd ):
+  run_test( ProcModel, gen_test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "gen_test", [
+  gen_bypass_test, gen_bypass_jump_test
+])
+def test_bypass_rand_delays( gen_test, ProcModel, dump_vcd ):
+  run_test( ProcModel, gen_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3 )
+
+#-------------------------------------------------------------------------
+# test_bypass_cpi
+#-------------------------------------------------------------------------
+# With bypassing, the RAW hazards of the stall test do not cost anything,
+# so the bypassed processor has to be faster than the baseline.
+
+def run_stall_test( ProcModel ):
+
+  th  = mk_harness( ProcModel, gen_stall_test )
+  sim = SimulationTool( th )
+  sim.reset()
+
+  return run_cycles( th, sim )
+
+def test_bypass_cpi():
+  assert run_stall_test( ProcAltPRTL ) < run_stall_test( ProcBasePRTL )
+
+#-------------------------------------------------------------------------
+# test_bypass_cpi_stack
+#-------------------------------------------------------------------------
+# The bypassed processor only stalls on the three load-use hazards of the
+# bypass test, never on an instruction in M or W.
+
+def test_bypass_cpi_stack():
+
+  th    = mk_harness( ProcAltPRTL, gen_bypass_test )
+  sim   = SimulationTool( th )
+  stack = CpiStack( th.proc )
+
+  sim.reset()
+
+  num_cycles = run_cycles( th, sim, tick=stack.tick )
+
+  assert stack.counts["raw_X"] == 3
+  assert stack.counts["raw_M"] == 0
+  assert stack.counts["raw_W"] == 0
+  assert sum( stack.counts.values() ) == num_cycles
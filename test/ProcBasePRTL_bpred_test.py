@@ -0,0 +1,113 @@
+#=========================================================================
+# ProcBasePRTL_bpred_test.py
+#=========================================================================
+
+import pytest
+import random
+import functools
+
+from pymtl      import *
+from harness    import *
+from pclib.test import run_test_vector_sim
+
+from lab2_proc.BranchPredictorPRTL import BranchPredictorPRTL
+from lab2_proc.ProcBasePRTL        import ProcBasePRTL
+from lab2_proc.proc_bpred_stats    import BranchPredStats
+
+from proc_test_utils import gen_stall_test, gen_nested_loop_test
+from proc_test_utils import mk_harness, run_cycles
+
+ProcBpredPRTL = functools.partial( ProcBasePRTL, bpred=True )
+
+#-------------------------------------------------------------------------
+# BranchPredictorPRTL
+#-------------------------------------------------------------------------
+# 0x208 and 0x248 map to the same BTB entry but to different BHT
+# entries. Updates show up in the prediction of the next row.
+
+def test_bpred( dump_vcd ):
+  run_test_vector_sim( BranchPredictorPRTL( 16, 64 ), [
+    ('pc_F   update_en update_pc update_taken update_target pred_taken_F* pred_target_F*'),
+    [ 0x200, 0,        0x000,    0,           0x000,        0,            '?'   ],
+    [ 0x200, 1,        0x208,    1,           0x200,        0,            '?'   ], # miss
+    [ 0x208, 0,        0x000,    0,           0x000,        1,            0x200 ], # weakly taken
+    [ 0x208, 1,        0x208,    0,           0x000,        1,            0x200 ],
+    [ 0x208, 0,        0x000,    0,           0x000,        0,            '?'   ], # weakly not taken
+    [ 0x248, 1,        0x208,    1,           0x200,        0,            '?'   ], # tag mismatch
+    [ 0x208, 1,        0x248,    1,           0x300,        1,            0x200 ],
+    [ 0x248, 1,        0x248,    1,           0x300,        1,            0x300 ], # replaced
+    [ 0x208, 1,        0x248,    1,           0x300,        0,            '?'   ], # tag mismatch
+    [ 0x248, 1,        0x248,    0,           0x000,        1,            0x300 ], # saturated
+    [ 0x248, 0,        0x000,    0,           0x000,        1,            0x300 ], # weakly taken
+  ], dump_vcd )
+
+#-------------------------------------------------------------------------
+# Instruction tests
+#-------------------------------------------------------------------------
+
+import inst_add
+
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_add.gen_basic_test     ) ,
+  asm_test( inst_add.gen_srcs_dep_test  ) ,
+  asm_test( inst_add.gen_value_test     ) ,
+  asm_test( inst_add.gen_random_test    ) ,
+])
+def test_add( name, test, dump_vcd ):
+  run_test( ProcBpredPRTL, test, dump_vcd )
+
+import inst_csr
+
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_csr.gen_basic_test      ),
+  asm_test( inst_csr.gen_bypass_test     ),
+  asm_test( inst_csr.gen_value_test      ),
+])
+def test_csr( name, test, dump_vcd ):
+  run_test( ProcBpredPRTL, test, dump_vcd )
+
+#-------------------------------------------------------------------------
+# nested loops
+#-------------------------------------------------------------------------
+# The inner loop branch is only mispredicted once per outer loop
+# iteration (see gen_nested_loop_test in proc_test_utils).
+
+@pytest.mark.parametrize( "ProcModel", [ ProcBasePRTL, ProcBpredPRTL ] )
+def test_nested_loop( ProcModel, dump_vcd ):
+  run_test( ProcModel, gen_nested_loop_test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcBasePRTL, ProcBpredPRTL ] )
+def test_nested_loop_rand_delays( ProcModel, dump_vcd ):
+  run_test( ProcModel, gen_nested_loop_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3 )
+
+#-------------------------------------------------------------------------
+# test_bpred_stats
+#-------------------------------------------------------------------------
+# The predictor has to pay off on loops, and the statistics have to see
+# every branch.
+
+def run_bpred_stats( ProcModel, gen_test ):
+
+  th    = mk_harness( ProcModel, gen_test )
+  sim   = SimulationTool( th )
+  stats = BranchPredStats( th.proc )
+
+  sim.reset()
+
+  return ( run_cycles( th, sim, tick=stats.tick ), stats )
+
+@pytest.mark.parametrize( "gen_test,num_branches", [
+  ( gen_stall_test,       5  ),
+  ( gen_nested_loop_test, 40 ),
+])
+def test_bpred_stats( gen_test, num_branches ):
+
+  (base_cycles,base_stats) = run_bpred_stats( ProcBasePRTL,  gen_test )
+  (cycles,stats)           = run_bpred_stats( ProcBpredPRTL, gen_test )
+
+  assert base_stats.num_branches == num_branches
+  assert stats.num_branches      == num_branches
+
+  assert stats.num_mispred < base_stats.num_mispred
+  assert cycles            < base_cycles
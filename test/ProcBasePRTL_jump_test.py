@@ -0,0 +1,115 @@
+#=========================================================================
+# ProcBasePRTL_jump_test.py
+#=========================================================================
+
+import pytest
+import random
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.proc_cpi_stack import CpiStack
+from lab2_proc.ProcFL         import ProcFL
+from lab2_proc.ProcBasePRTL   import ProcBasePRTL
+from lab2_proc.ProcAltPRTL    import ProcAltPRTL
+
+from proc_test_utils import mk_harness, run_cycles
+
+#-------------------------------------------------------------------------
+# jal
+#-------------------------------------------------------------------------
+# The instructions after the jal must not be executed, and the link
+# register gets the address of the instruction after the jal.
+
+def gen_jal_test():
+  return """
+    csrr x1, mngr2proc < 1
+    csrr x2, mngr2proc < 0
+    jal  x3, target
+    add  x2, x2, x1
+    add  x2, x2, x1
+  target:
+    csrw proc2mngr, x2 > 0
+    csrw proc2mngr, x3 > 0x0000020c
+  """
+
+#-------------------------------------------------------------------------
+# jalr
+#-------------------------------------------------------------------------
+# The jalr depends on the jal right in front of it, and the lowest bit
+# of the target (0x20c + 17) has to be cleared.
+
+def gen_jalr_test():
+  return """
+    csrr x1, mngr2proc < 1
+    csrr x2, mngr2proc < 0
+    jal  x3, next
+  next:
+    jalr x5, x3, 17
+    add  x2, x2, x1
+    add  x2, x2, x1
+    add  x2, x2, x1
+    csrw proc2mngr, x2 > 0
+    csrw proc2mngr, x5 > 0x00000210
+  """
+
+#-------------------------------------------------------------------------
+# call
+#-------------------------------------------------------------------------
+# Function calls and returns in a loop.
+
+def gen_call_test():
+  return """
+    csrr x2, mngr2proc < 5
+    csrr x3, mngr2proc < 0
+    csrr x4, mngr2proc < 1
+    jal  x0, loop
+  func:
+    add  x3, x3, x2
+    jalr x0, x1, 0
+  loop:
+    jal  x1, func
+    sub  x2, x2, x4
+    bne  x2, x0, loop
+    csrw proc2mngr, x3 > 15
+    csrw proc2mngr, x1 > 0x0000021c
+  """
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "gen_test", [
+  gen_jal_test, gen_jalr_test, gen_call_test
+])
+def test_jump( gen_test, ProcModel, dump_vcd ):
+  run_test( ProcModel, gen_test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "gen_test", [
+  gen_jal_test, gen_jalr_test, gen_call_test
+])
+def test_jump_rand_delays( gen_test, ProcModel, dump_vcd ):
+  run_test( ProcModel, gen_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3 )
+
+#-------------------------------------------------------------------------
+# test_jump_squash
+#-------------------------------------------------------------------------
+# Jumps are resolved in D, so each jump only squashes the instruction in
+# F (the call test has the jal to the loop, five calls, five returns,
+# and four taken branches which squash two instructions each).
+
+@pytest.mark.parametrize( "gen_test,num_squashed", [
+  ( gen_jal_test,  1  ),
+  ( gen_jalr_test, 2  ),
+  ( gen_call_test, 19 ),
+])
+def test_jump_squash( gen_test, num_squashed ):
+
+  th    = mk_harness( ProcBasePRTL, gen_test )
+  sim   = SimulationTool( th )
+  stack = CpiStack( th.proc )
+
+  sim.reset()
+
+  run_cycles( th, sim, tick=stack.tick )
+
+  assert stack.counts["squash"] == num_squashed
@@ -0,0 +1,175 @@
+#=========================================================================
+# ProcBasePRTL_mul_test.py
+#=========================================================================
+
+import pytest
+import random
+
+from pymtl      import *
+from harness    import *
+from pclib.test import TestSource, TestSink, run_sim
+
+from lab2_proc.proc_cpi_stack   import CpiStack
+from lab2_proc.IntMulVarLatPRTL import IntMulVarLatPRTL
+from lab2_proc.ProcFL           import ProcFL
+from lab2_proc.ProcBasePRTL     import ProcBasePRTL
+from lab2_proc.ProcAltPRTL      import ProcAltPRTL
+
+from proc_test_utils import mk_harness, run_cycles
+
+#-------------------------------------------------------------------------
+# IntMulVarLatPRTL
+#-------------------------------------------------------------------------
+
+class MulTestHarness (Model):
+
+  def __init__( s, msgs, src_delay, sink_delay ):
+
+    s.src  = TestSource( 64, msgs[::2],  src_delay  )
+    s.imul = IntMulVarLatPRTL()
+    s.sink = TestSink  ( 32, msgs[1::2], sink_delay )
+
+    s.connect( s.src.out,   s.imul.req )
+    s.connect( s.imul.resp, s.sink.in_ )
+
+  def done( s ):
+    return s.src.done and s.sink.done
+
+  def line_trace( s ):
+    return s.src.line_trace()  + " > " + \
+           s.imul.line_trace() + " > " + \
+           s.sink.line_trace()
+
+def mk_imsg( a, b ):
+  return concat( Bits( 32, a & 0xffffffff ), Bits( 32, b & 0xffffffff ) )
+
+def mk_omsg( a, b ):
+  return Bits( 32, ( a * b ) & 0xffffffff )
+
+def gen_imul_msgs():
+
+  operands = [ ( 0, 0 ), ( 1, 1 ), ( 3, 7 ), ( 7, 0 ), ( -5, 7 ), ( 7, -5 ),
+               ( -1, -1 ), ( 0x7fffffff, 0x7fffffff ), ( 0x80000000, 2 ) ]
+
+  for i in xrange(50):
+    operands.append(( random.randint( 0, 0xffffffff ),
+                      random.randint( 0, 0xffffffff ) ))
+
+  msgs = []
+  for (a,b) in operands:
+    msgs.extend([ mk_imsg( a, b ), mk_omsg( a, b ) ])
+  return msgs
+
+@pytest.mark.parametrize( "src_delay,sink_delay", [
+  ( 0, 0 ),
+  ( 3, 5 ),
+])
+def test_imul( src_delay, sink_delay, dump_vcd ):
+  run_sim( MulTestHarness( gen_imul_msgs(), src_delay, sink_delay ),
+           dump_vcd )
+
+#-------------------------------------------------------------------------
+# mul
+#-------------------------------------------------------------------------
+# The functional model executes mul in a single step, the RTL model has
+# to get exactly the same results.
+
+import inst_mul
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_mul.gen_basic_test     ) ,
+  asm_test( inst_mul.gen_dest_dep_test  ) ,
+  asm_test( inst_mul.gen_src0_dep_test  ) ,
+  asm_test( inst_mul.gen_src1_dep_test  ) ,
+  asm_test( inst_mul.gen_srcs_dep_test  ) ,
+  asm_test( inst_mul.gen_srcs_dest_test ) ,
+  asm_test( inst_mul.gen_value_test     ) ,
+  asm_test( inst_mul.gen_random_test    ) ,
+])
+def test_mul( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+def test_mul_rand_delays( ProcModel, dump_vcd ):
+  run_test( ProcModel, inst_mul.gen_random_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3 )
+
+#-------------------------------------------------------------------------
+# complex multiply
+#-------------------------------------------------------------------------
+# The cmult kernel on three complex numbers, only with instructions the
+# baseline processor implements. We sum up the real and imaginary parts
+# of the products: (1+2i)(7+8i) + (3-4i)(-9+10i) + (-5+6i)(11+12i).
+
+def gen_cmult_test():
+  return """
+    csrr x1,  mngr2proc < 3
+    csrr x2,  mngr2proc < 0x2000
+    csrr x3,  mngr2proc < 0x2018
+    csrr x14, mngr2proc < 1
+    csrr x15, mngr2proc < 8
+    csrr x16, mngr2proc < 0
+    csrr x17, mngr2proc < 0
+  loop:
+    lw   x6, 0(x2)
+    lw   x8, 0(x3)
+    lw   x7, 4(x2)
+    lw   x9, 4(x3)
+    mul  x10, x6, x8
+    mul  x11, x7, x9
+    mul  x12, x7, x8
+    mul  x13, x6, x9
+    sub  x10, x10, x11
+    add  x12, x12, x13
+    add  x16, x16, x10
+    add  x17, x17, x12
+    add  x2, x2, x15
+    add  x3, x3, x15
+    sub  x1, x1, x14
+    bne  x1, x0, loop
+    csrw proc2mngr, x16 > 0xffffff85
+    csrw proc2mngr, x17 > 94
+
+    .data
+    .word 1
+    .word 2
+    .word 3
+    .word 0xfffffffc
+    .word 0xfffffffb
+    .word 6
+    .word 7
+    .word 8
+    .word 0xfffffff7
+    .word 10
+    .word 11
+    .word 12
+  """
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+def test_cmult( ProcModel, dump_vcd ):
+  run_test( ProcModel, gen_cmult_test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL, ProcAltPRTL ] )
+def test_cmult_rand_delays( ProcModel, dump_vcd ):
+  run_test( ProcModel, gen_cmult_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3 )
+
+#-------------------------------------------------------------------------
+# test_cmult_cpi_stack
+#-------------------------------------------------------------------------
+# The cycles waiting for the multiplier show up in the CPI stack.
+
+def test_cmult_cpi_stack():
+
+  th    = mk_harness( ProcBasePRTL, gen_cmult_test )
+  sim   = SimulationTool( th )
+  stack = CpiStack( th.proc )
+
+  sim.reset()
+
+  num_cycles = run_cycles( th, sim, tick=stack.tick )
+
+  assert stack.counts["commit"] == 7 + 3*16 + 2
+  assert stack.counts["imul"]   >  0
+  assert sum( stack.counts.values() ) == num_cycles
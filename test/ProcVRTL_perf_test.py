@@ -0,0 +1,33 @@
+#=========================================================================
+# ProcVRTL_perf_test.py
+#=========================================================================
+# Only the Verilog processors have the performance counter CSRs, so we
+# test them directly instead of through ProcBaseRTL and ProcAltRTL
+# (which are the PyMTL models with --prtl).
+
+import pytest
+import random
+
+from pymtl   import *
+from harness import *
+from lab2_proc.ProcBaseRTL import ProcBaseVRTL
+from lab2_proc.ProcAltRTL  import ProcAltVRTL
+
+#-------------------------------------------------------------------------
+# perf
+#-------------------------------------------------------------------------
+
+import inst_perf
+
+@pytest.mark.parametrize( "ProcModel", [ ProcBaseVRTL, ProcAltVRTL ] )
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_perf.gen_frozen_test ),
+  asm_test( inst_perf.gen_count_test  ),
+])
+def test_perf( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+@pytest.mark.parametrize( "ProcModel", [ ProcBaseVRTL, ProcAltVRTL ] )
+def test_perf_rand_delays( ProcModel, dump_vcd ):
+  run_test( ProcModel, inst_perf.gen_count_test, dump_vcd,
+            src_delay=3, sink_delay=10, mem_stall_prob=0.5, mem_latency=3)
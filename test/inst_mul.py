@@ -0,0 +1,155 @@
+#=========================================================================
+# mul
+#=========================================================================
+
+import random
+
+from pymtl import *
+from inst_utils import *
+
+#-------------------------------------------------------------------------
+# gen_basic_test
+#-------------------------------------------------------------------------
+
+def gen_basic_test():
+  return """
+    csrr x1, mngr2proc < 5
+    csrr x2, mngr2proc < 4
+    nop
+    nop
+    nop
+    nop
+    nop
+    nop
+    nop
+    nop
+    mul x3, x1, x2
+    nop
+    nop
+    nop
+    nop
+    nop
+    nop
+    nop
+    nop
+    csrw proc2mngr, x3 > 20
+    nop
+    nop
+    nop
+    nop
+    nop
+    nop
+    nop
+    nop
+  """
+
+#-------------------------------------------------------------------------
+# gen_dest_dep_test
+#-------------------------------------------------------------------------
+
+def gen_dest_dep_test():
+  return [
+    gen_rr_dest_dep_test( 5, "mul", 2, 3,  6 ),
+    gen_rr_dest_dep_test( 4, "mul", 3, 3,  9 ),
+    gen_rr_dest_dep_test( 3, "mul", 4, 3, 12 ),
+    gen_rr_dest_dep_test( 2, "mul", 5, 3, 15 ),
+    gen_rr_dest_dep_test( 1, "mul", 6, 3, 18 ),
+    gen_rr_dest_dep_test( 0, "mul", 7, 3, 21 ),
+  ]
+
+#-------------------------------------------------------------------------
+# gen_src0_dep_test
+#-------------------------------------------------------------------------
+
+def gen_src0_dep_test():
+  return [
+    gen_rr_src0_dep_test( 5, "mul",  8, 2, 16 ),
+    gen_rr_src0_dep_test( 4, "mul",  9, 2, 18 ),
+    gen_rr_src0_dep_test( 3, "mul", 10, 2, 20 ),
+    gen_rr_src0_dep_test( 2, "mul", 11, 2, 22 ),
+    gen_rr_src0_dep_test( 1, "mul", 12, 2, 24 ),
+    gen_rr_src0_dep_test( 0, "mul", 13, 2, 26 ),
+  ]
+
+#-------------------------------------------------------------------------
+# gen_src1_dep_test
+#-------------------------------------------------------------------------
+
+def gen_src1_dep_test():
+  return [
+    gen_rr_src1_dep_test( 5, "mul", 2, 14, 28 ),
+    gen_rr_src1_dep_test( 4, "mul", 2, 15, 30 ),
+    gen_rr_src1_dep_test( 3, "mul", 2, 16, 32 ),
+    gen_rr_src1_dep_test( 2, "mul", 2, 17, 34 ),
+    gen_rr_src1_dep_test( 1, "mul", 2, 18, 36 ),
+    gen_rr_src1_dep_test( 0, "mul", 2, 19, 38 ),
+  ]
+
+#-------------------------------------------------------------------------
+# gen_srcs_dep_test
+#-------------------------------------------------------------------------
+
+def gen_srcs_dep_test():
+  return [
+    gen_rr_srcs_dep_test( 5, "mul", 12, 2,  24 ),
+    gen_rr_srcs_dep_test( 4, "mul", 13, 3,  39 ),
+    gen_rr_srcs_dep_test( 3, "mul", 14, 4,  56 ),
+    gen_rr_srcs_dep_test( 2, "mul", 15, 5,  75 ),
+    gen_rr_srcs_dep_test( 1, "mul", 16, 6,  96 ),
+    gen_rr_srcs_dep_test( 0, "mul", 17, 7, 119 ),
+  ]
+
+#-------------------------------------------------------------------------
+# gen_srcs_dest_test
+#-------------------------------------------------------------------------
+
+def gen_srcs_dest_test():
+  return [
+    gen_rr_src0_eq_dest_test( "mul", 25, 2, 50 ),
+    gen_rr_src1_eq_dest_test( "mul", 26, 2, 52 ),
+    gen_rr_src0_eq_src1_test( "mul", 27, 729 ),
+    gen_rr_srcs_eq_dest_test( "mul", 28, 784 ),
+  ]
+
+#-------------------------------------------------------------------------
+# gen_value_test
+#-------------------------------------------------------------------------
+
+def gen_value_test():
+  return [
+
+    gen_rr_value_test( "mul", 0x00000000, 0x00000000, 0x00000000 ),
+    gen_rr_value_test( "mul", 0x00000001, 0x00000001, 0x00000001 ),
+    gen_rr_value_test( "mul", 0x00000003, 0x00000007, 0x00000015 ),
+
+    gen_rr_value_test( "mul", 0x00000000, 0xffff8000, 0x00000000 ),
+    gen_rr_value_test( "mul", 0x80000000, 0x00000000, 0x00000000 ),
+    gen_rr_value_test( "mul", 0x80000000, 0xffff8000, 0x00000000 ),
+
+    gen_rr_value_test( "mul", 0x00000000, 0x00007fff, 0x00000000 ),
+    gen_rr_value_test( "mul", 0x7fffffff, 0x00000000, 0x00000000 ),
+    gen_rr_value_test( "mul", 0x7fffffff, 0x00007fff, 0x7fff8001 ),
+
+    gen_rr_value_test( "mul", 0x80000000, 0x00007fff, 0x80000000 ),
+    gen_rr_value_test( "mul", 0x7fffffff, 0xffff8000, 0x00008000 ),
+
+    gen_rr_value_test( "mul", 0xfffffffb, 0x00000007, 0xffffffdd ),
+    gen_rr_value_test( "mul", 0xffffffff, 0x00000001, 0xffffffff ),
+    gen_rr_value_test( "mul", 0xffffffff, 0xffffffff, 0x00000001 ),
+    gen_rr_value_test( "mul", 0x7fffffff, 0x7fffffff, 0x00000001 ),
+    gen_rr_value_test( "mul", 0x12345678, 0x9abcdef0, 0x242d2080 ),
+
+  ]
+
+#-------------------------------------------------------------------------
+# gen_random_test
+#-------------------------------------------------------------------------
+
+def gen_random_test():
+  asm_code = []
+  for i in xrange(100):
+    src0 = Bits( 32, random.randint(0,0xffffffff) )
+    src1 = Bits( 32, random.randint(0,0xffffffff) )
+    dest = Bits( 32, ( src0.uint() * src1.uint() ) & 0xffffffff )
+    asm_code.append( gen_rr_value_test( "mul", src0.uint(), src1.uint(), dest.uint() ) )
+  return asm_code
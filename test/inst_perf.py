@@ -0,0 +1,77 @@
+#=========================================================================
+# perf
+#=========================================================================
+# Tests for the performance counter CSRs (cycle, instret, hpmcounterN).
+# The counter values depend on the microarchitecture, so we only check
+# that they stay frozen while stats_en is not set and that they count
+# while it is set.
+
+import random
+
+from pymtl import *
+from inst_utils import *
+
+#-------------------------------------------------------------------------
+# gen_frozen_test
+#-------------------------------------------------------------------------
+
+def gen_frozen_test():
+  return """
+    csrr x1, cycle
+    csrr x2, instret
+    csrr x3, hpmcounter9
+    nop
+    nop
+    nop
+    nop
+    csrr x4, cycle
+    csrr x5, instret
+    csrr x6, hpmcounter9
+    csrw proc2mngr, x1 > 0
+    csrw proc2mngr, x2 > 0
+    csrw proc2mngr, x3 > 0
+    csrw proc2mngr, x4 > 0
+    csrw proc2mngr, x5 > 0
+    csrw proc2mngr, x6 > 0
+  """
+
+#-------------------------------------------------------------------------
+# gen_count_test
+#-------------------------------------------------------------------------
+# The nops make sure that the csrw to stats_en has committed before we
+# read the counters.
+
+def gen_count_test():
+  return """
+    addi x1, x0, 1
+    csrw stats_en, x1
+    nop
+    nop
+    nop
+    nop
+    csrr x2, cycle
+    csrr x3, instret
+    nop
+    nop
+    nop
+    nop
+    csrr x4, cycle
+    csrr x5, instret
+    csrw stats_en, x0
+    nop
+    nop
+    nop
+    nop
+    csrr x6, cycle
+    nop
+    nop
+    nop
+    nop
+    csrr x7, cycle
+    sltu x8, x2, x4
+    sltu x9, x3, x5
+    sub  x10, x7, x6
+    csrw proc2mngr, x8  > 1
+    csrw proc2mngr, x9  > 1
+    csrw proc2mngr, x10 > 0
+  """
@@ -0,0 +1,67 @@
+#=========================================================================
+# proc_checkpoint_test.py
+#=========================================================================
+
+import pytest
+import os
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.proc_fast_forward import fast_forward
+from lab2_proc.proc_fast_forward import reset_and_transfer_state
+from lab2_proc.proc_checkpoint   import save_checkpoint, restore_checkpoint
+from lab2_proc.proc_checkpoint   import checkpoint_page_size
+from lab2_proc.ProcFL            import ProcFL
+from lab2_proc.ProcBasePRTL      import ProcBasePRTL
+
+from proc_test_utils import gen_loop_test, mk_harness, run_cycles
+
+#-------------------------------------------------------------------------
+# test_save_restore
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "num_ff_insts", [ 0, 3, 17, 105 ] )
+def test_save_restore( tmpdir, num_ff_insts ):
+
+  filename = str( tmpdir.join( "test.ckpt" ) )
+
+  th = mk_harness( ProcFL, gen_loop_test )
+  translator = fast_forward( th, num_ff_insts )
+  save_checkpoint( filename, translator, th )
+
+  # Only the pages with the program and the data are in the checkpoint
+
+  assert os.path.getsize( filename ) < 4 * checkpoint_page_size
+
+  th_restored = mk_harness( ProcFL, gen_loop_test )
+  translator_restored = restore_checkpoint( filename, th_restored )
+
+  assert translator_restored.PC       == translator.PC
+  assert translator_restored.R        == translator.R
+  assert translator_restored.stats_en == translator.stats_en
+
+  assert th_restored.mem.mem == th.mem.mem
+  assert list( th_restored.src.src.msgs ) == list( th.src.src.msgs )
+  assert th_restored.sink.sink.idx == th.sink.sink.idx
+
+#-------------------------------------------------------------------------
+# test_restore_and_run
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL ] )
+@pytest.mark.parametrize( "num_ff_insts", [ 0, 3, 17, 105 ] )
+def test_restore_and_run( tmpdir, ProcModel, num_ff_insts ):
+
+  filename = str( tmpdir.join( "test.ckpt" ) )
+
+  th = mk_harness( ProcFL, gen_loop_test )
+  save_checkpoint( filename, fast_forward( th, num_ff_insts ), th )
+
+  th  = mk_harness( ProcModel, gen_loop_test )
+  sim = SimulationTool( th )
+
+  translator = restore_checkpoint( filename, th )
+  reset_and_transfer_state( sim, translator, th.proc )
+
+  run_cycles( th, sim )
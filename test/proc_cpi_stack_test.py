@@ -0,0 +1,88 @@
+#=========================================================================
+# proc_cpi_stack_test.py
+#=========================================================================
+
+import pytest
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.proc_cpi_stack import CpiStack, cpi_stack_causes
+from lab2_proc.ProcBasePRTL   import ProcBasePRTL
+
+from proc_test_utils import gen_stall_test, mk_harness, run_cycles
+
+#-------------------------------------------------------------------------
+# test_cpi_stack
+#-------------------------------------------------------------------------
+# Every cycle is attributed to exactly one cause, so the CPI stack has
+# to add up to the total number of cycles and the total CPI.
+
+@pytest.mark.parametrize( "src_delay,sink_delay,mem_stall_prob,mem_latency", [
+  ( 0, 0, 0.0, 0 ),
+  ( 3, 5, 0.0, 0 ),
+  ( 0, 0, 0.5, 3 ),
+])
+def test_cpi_stack( src_delay, sink_delay, mem_stall_prob, mem_latency ):
+
+  th    = mk_harness( ProcBasePRTL, gen_stall_test, src_delay, sink_delay,
+                      mem_stall_prob, mem_latency )
+  sim   = SimulationTool( th )
+  stack = CpiStack( th.proc )
+
+  sim.reset()
+
+  num_cycles = run_cycles( th, sim, tick=stack.tick )
+
+  result = stack.cpi_stack()
+
+  assert [ cause for (cause,n,cpi) in result ] == cpi_stack_causes
+  assert sum([ n for (cause,n,cpi) in result ]) == num_cycles
+  assert abs( sum([ cpi for (cause,n,cpi) in result ])
+              - num_cycles / 19.0 ) < 1e-9
+
+  assert stack.counts["commit"] == 19
+  assert stack.counts["raw_X"]  >  0
+  assert stack.counts["squash"] >  0
+
+#-------------------------------------------------------------------------
+# test_ostall_cause_D
+#-------------------------------------------------------------------------
+# A RAW hazard on an instruction in W and a busy multiplier can stall
+# the instruction in D in the same cycle. We check the order of the
+# causes directly on a stand-in for the control unit, since it is hard
+# to line up both stalls in a program.
+
+class StubCtrl (object):
+
+  def __init__( s, **signals ):
+
+    s.ostall_D        = 1
+    s.ostall_mngr_D   = 0
+    s.ostall_hazard_D = 0
+    s.ostall_imul_D   = 0
+    s.ostall_imul_X   = 0
+
+    for stage in "XMW":
+      for rs in [ "rs1", "rs2" ]:
+        setattr( s, "ostall_waddr_{}_{}_D".format( stage, rs ), 0 )
+
+    for ( name, value ) in signals.items():
+      setattr( s, name, value )
+
+class StubProc (object):
+
+  def __init__( s, **signals ):
+    s.ctrl = StubCtrl( **signals )
+
+@pytest.mark.parametrize( "signals,cause", [
+  ( dict( ostall_hazard_D=1, ostall_waddr_W_rs1_D=1, ostall_imul_D=1 ),
+    "raw_W" ),
+  ( dict( ostall_hazard_D=1, ostall_waddr_M_rs2_D=1,
+          ostall_waddr_W_rs1_D=1, ostall_imul_D=1 ), "raw_M" ),
+  ( dict( ostall_imul_D=1 ), "imul" ),
+  ( dict( ostall_mngr_D=1, ostall_hazard_D=1, ostall_waddr_W_rs1_D=1,
+          ostall_imul_D=1 ), "mngr2proc" ),
+])
+def test_ostall_cause_D( signals, cause ):
+  assert CpiStack( StubProc( **signals ) ).ostall_cause_D() == cause
@@ -0,0 +1,42 @@
+#=========================================================================
+# proc_fast_forward_test.py
+#=========================================================================
+
+import pytest
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.proc_fast_forward import fast_forward
+from lab2_proc.proc_fast_forward import reset_and_transfer_state
+from lab2_proc.ProcFL            import ProcFL
+from lab2_proc.ProcBasePRTL      import ProcBasePRTL
+
+from proc_test_utils import gen_loop_test, mk_harness, run_cycles
+
+#-------------------------------------------------------------------------
+# run_fast_forward_test
+#-------------------------------------------------------------------------
+
+def run_fast_forward_test( ProcModel, gen_test, num_ff_insts,
+                           max_cycles=5000 ):
+
+  th  = mk_harness( ProcModel, gen_test )
+  sim = SimulationTool( th )
+
+  translator = fast_forward( th, num_ff_insts )
+  reset_and_transfer_state( sim, translator, th.proc )
+
+  run_cycles( th, sim, max_cycles=max_cycles )
+
+  return translator
+
+#-------------------------------------------------------------------------
+# test_fast_forward
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "ProcModel", [ ProcFL, ProcBasePRTL ] )
+@pytest.mark.parametrize( "num_ff_insts", [ 0, 1, 3, 4, 17, 100, 105 ] )
+def test_fast_forward( ProcModel, num_ff_insts ):
+  translator = run_fast_forward_test( ProcModel, gen_loop_test, num_ff_insts )
+  assert translator.num_insts == num_ff_insts
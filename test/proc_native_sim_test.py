@@ -0,0 +1,335 @@
+#=========================================================================
+# proc_native_sim_test.py
+#=========================================================================
+
+import os
+import pytest
+import struct
+import threading
+import distutils.spawn
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.tinyrv2_encoding import assemble
+from lab2_proc.proc_native_sim  import NativeProcSim, build_native_sim
+from lab2_proc.proc_native_sim  import run_native, get_native_build_key
+from lab2_proc.proc_native_sim  import verilog_import_cache
+from lab2_proc.proc_native_sim  import save_verilog_import
+from lab2_proc.proc_native_sim  import restore_verilog_import
+from lab2_proc.proc_native_sim  import get_verilog_import_files
+from lab2_proc.proc_native_sim  import get_verilator_version
+from lab2_proc.proc_sim_run     import run_sim
+from lab2_proc.ProcAltRTL       import ProcAltRTL
+
+from proc_test_utils import gen_loop_test, mk_harness
+
+if not distutils.spawn.find_executable( "verilator" ):
+  pytest.skip( "verilator is not installed", allow_module_level=True )
+
+#-------------------------------------------------------------------------
+# run_native_test
+#-------------------------------------------------------------------------
+
+def run_native_test( gen_test, exit_on_stats_off=False, max_cycles=5000,
+                     mem_stall_prob=0, mem_latency=0 ):
+
+  th        = mk_harness( ProcAltRTL, gen_test )
+  mem_image = assemble( gen_test() )
+
+  # The simulator imports the Verilog model, which generates the
+  # flattened Verilog we need to build the native simulator
+
+  with verilog_import_cache( th.proc.class_name ):
+    sim = SimulationTool( th )
+
+  native = NativeProcSim( build_native_sim( th.proc.class_name ),
+                          len( th.mem.mem ), mem_latency, mem_stall_prob )
+  native.load_image( mem_image )
+  native.reset()
+
+  run_native( th, native, max_cycles, exit_on_stats_off )
+
+  return ( th, native )
+
+#-------------------------------------------------------------------------
+# test_native
+#-------------------------------------------------------------------------
+
+def test_native():
+
+  (th,native) = run_native_test( gen_loop_test )
+
+  assert th.done()
+  assert native.h.ninsts == 110
+  assert native.h.ncycles >= 110
+
+  # The stores of the loop have been copied back into the test memory
+
+  for i in xrange( 20 ):
+    word = th.mem.mem[ 0x2000 + 4*i : 0x2000 + 4*i + 4 ]
+    assert word == bytearray( struct.pack( "<I", i*(i+1)/2 ) )
+
+#-------------------------------------------------------------------------
+# test_native_mem_delays
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "mem_stall_prob,mem_latency", [
+  ( 0.0, 3  ),
+  ( 0.5, 0  ),
+  ( 0.5, 10 ),
+])
+def test_native_mem_delays( mem_stall_prob, mem_latency ):
+
+  # Only one instance at a time, see test_native_multi_instance
+
+  (th,fast)    = run_native_test( gen_loop_test )
+  fast_ncycles = fast.h.ncycles
+  del fast
+
+  (th,slow) = run_native_test( gen_loop_test, max_cycles=50000,
+                               mem_stall_prob=mem_stall_prob,
+                               mem_latency=mem_latency )
+
+  assert th.done()
+  assert slow.h.ninsts  == 110
+  assert slow.h.ncycles >  fast_ncycles
+
+  for i in xrange( 20 ):
+    word = th.mem.mem[ 0x2000 + 4*i : 0x2000 + 4*i + 4 ]
+    assert word == bytearray( struct.pack( "<I", i*(i+1)/2 ) )
+
+#-------------------------------------------------------------------------
+# test_native_multi_instance
+#-------------------------------------------------------------------------
+# Several independent processors from the same library, stepped in an
+# interleaved order, each with its own core_id.
+
+def gen_core_id_test( core_id ):
+  def gen_test():
+    return """
+      csrr x1, mngr2proc < 0
+      csrr x2, coreid
+      add  x3, x2, x1
+      csrw proc2mngr, x3 > {}
+    """.format( core_id )
+  return gen_test
+
+# Only Verilator 4.200 and newer have a VerilatedContext per model
+
+def verilator_has_context():
+  version = get_verilator_version().split()[1]
+  return tuple( int( x ) for x in version.split( "." )[:2] ) >= ( 4, 200 )
+
+def test_native_multi_instance():
+
+  if not verilator_has_context():
+    pytest.skip( "needs Verilator 4.200 or newer" )
+
+  num_cores = 4
+  cores     = []
+
+  for core_id in xrange( num_cores ):
+
+    th        = mk_harness( ProcAltRTL, gen_core_id_test( core_id ) )
+    mem_image = assemble( gen_core_id_test( core_id )() )
+
+    sim = SimulationTool( th )
+
+    native = NativeProcSim( build_native_sim( th.proc.class_name ),
+                            len( th.mem.mem ), mem_latency=core_id,
+                            core_id=core_id )
+    native.load_image( mem_image )
+    native.reset()
+
+    cores.append( ( th, native ) )
+
+  # Run all cores a few cycles at a time in reverse order
+
+  for max_cycles in xrange( 5, 500, 5 ):
+    for (th,native) in reversed( cores ):
+      run_native( th, native, max_cycles )
+
+  for (th,native) in cores:
+    assert th.done()
+    assert native.h.ninsts == 4
+
+# Older Verilators share their state between models, so a second
+# instance is an error instead of silently sharing it
+
+def test_native_multi_instance_old_verilator():
+
+  if verilator_has_context():
+    pytest.skip( "only for Verilator older than 4.200" )
+
+  th = mk_harness( ProcAltRTL, gen_core_id_test( 0 ) )
+  with verilog_import_cache( th.proc.class_name ):
+    sim = SimulationTool( th )
+
+  lib_file = build_native_sim( th.proc.class_name )
+  native   = NativeProcSim( lib_file, len( th.mem.mem ) )
+
+  with pytest.raises( Exception ):
+    NativeProcSim( lib_file, len( th.mem.mem ) )
+
+  # Once the first instance is gone we can create a new one
+
+  del native
+  native = NativeProcSim( lib_file, len( th.mem.mem ) )
+
+#-------------------------------------------------------------------------
+# test_native_exit_on_stats_off
+#-------------------------------------------------------------------------
+
+def gen_stats_en_test():
+  return """
+    csrr x1, mngr2proc < 1
+    csrw stats_en, x1
+    addi x2, x0, 1
+    addi x2, x2, 1
+    addi x2, x2, 1
+    csrw stats_en, x0
+    csrw proc2mngr, x2 > 3
+  """
+
+def test_native_exit_on_stats_off():
+
+  (th,native) = run_native_test( gen_stats_en_test, exit_on_stats_off=True )
+
+  # We stopped before the processor sent the proc2mngr message
+
+  assert th.sink.sink.idx == 0
+  assert native.h.ninsts_stats_en > 0
+  assert native.h.ncycles_stats_en >= native.h.ninsts_stats_en
+
+#-------------------------------------------------------------------------
+# test_native_run_sim_cycles
+#-------------------------------------------------------------------------
+# run_sim has to report the same number of cycles with and without the
+# native simulator (i.e., both only count the cycles after reset).
+
+def test_native_run_sim_cycles():
+
+  pymtl  = run_sim( impl="alt", input="vvadd-unopt", verify=True )
+  native = run_sim( impl="alt", input="vvadd-unopt", verify=True,
+                    native=True )
+
+  assert pymtl["passed"] and native["passed"]
+  assert native["num_insts"]  == pymtl["num_insts"]
+  assert native["num_cycles"] == pymtl["num_cycles"]
+
+#-------------------------------------------------------------------------
+# test_native_build_cache
+#-------------------------------------------------------------------------
+# Several workers race to build the same library, only one of them should
+# actually build it and all of them should get the same library.
+
+def test_native_build_cache( tmpdir ):
+
+  th  = mk_harness( ProcAltRTL, gen_loop_test )
+  sim = SimulationTool( th )
+
+  top_module = th.proc.class_name
+  cache_dir  = str( tmpdir )
+  lib_files  = []
+
+  def build():
+    lib_files.append( build_native_sim( top_module, cache_dir=cache_dir ) )
+
+  workers = [ threading.Thread( target=build ) for i in xrange( 4 ) ]
+  for worker in workers: worker.start()
+  for worker in workers: worker.join()
+
+  assert len( lib_files ) == 4
+  assert len( set( lib_files ) ) == 1
+  assert os.path.exists( lib_files[0] )
+
+  key = get_native_build_key( top_module, top_module + ".v" )
+  assert key[:32] in lib_files[0]
+
+  # No leftover build directories
+
+  assert not [ name for name in os.listdir( cache_dir )
+               if name.startswith( ".build_" ) ]
+
+  # Building again reuses the cached library
+
+  mtime = os.path.getmtime( lib_files[0] )
+  assert build_native_sim( top_module, cache_dir=cache_dir ) == lib_files[0]
+  assert os.path.getmtime( lib_files[0] ) == mtime
+
+#-------------------------------------------------------------------------
+# test_verilog_import_cache
+#-------------------------------------------------------------------------
+# The restored wrapper opens the library in the cache entry, which is not
+# copied into the import directory
+
+def check_verilog_import( top_module, import_dir, key_dir ):
+
+  lib_file = get_verilog_import_files( top_module )[-1]
+
+  for name in get_verilog_import_files( top_module )[:-1]:
+    assert os.path.exists( os.path.join( import_dir, name ) )
+  assert not os.path.exists( os.path.join( import_dir, lib_file ) )
+
+  with open( os.path.join( import_dir, top_module + "_v.py" ) ) as fd:
+    assert "dlopen({!r})".format( os.path.join( key_dir, lib_file ) ) \
+      in fd.read()
+
+# A new directory gets the files of the PyMTL Verilog import from the
+# build cache, and PyMTL uses the cached library (by its absolute path)
+# instead of building its own library.
+
+def test_verilog_import_cache( tmpdir ):
+
+  cache_dir  = str( tmpdir.mkdir( "cache" ) )
+  import_dir = str( tmpdir.mkdir( "import" ) )
+
+  th  = mk_harness( ProcAltRTL, gen_loop_test )
+  sim = SimulationTool( th )
+
+  top_module = th.proc.class_name
+  lib_file   = get_verilog_import_files( top_module )[-1]
+
+  key_dir = save_verilog_import( top_module, cache_dir=cache_dir )
+  assert os.path.exists( os.path.join( key_dir, lib_file ) )
+
+  # Saving again reuses the cache entry
+
+  assert save_verilog_import( top_module, cache_dir=cache_dir ) == key_dir
+
+  assert restore_verilog_import( top_module, import_dir, cache_dir )
+  check_verilog_import( top_module, import_dir, key_dir )
+
+  # The library is not built again in the new directory
+
+  mtime = os.path.getmtime( os.path.join( key_dir, lib_file ) )
+
+  cwd = os.getcwd()
+  os.chdir( import_dir )
+  try:
+    th  = mk_harness( ProcAltRTL, gen_loop_test )
+    sim = SimulationTool( th )
+  finally:
+    os.chdir( cwd )
+
+  assert not os.path.exists( os.path.join( import_dir, lib_file ) )
+  assert os.path.getmtime( os.path.join( key_dir, lib_file ) ) == mtime
+
+# The files checked into the repository seed an empty cache
+
+def test_verilog_import_cache_seed( tmpdir ):
+
+  cache_dir  = str( tmpdir.mkdir( "cache" ) )
+  import_dir = str( tmpdir.mkdir( "import" ) )
+
+  top_module = "ProcAltVRTL_0x29aabdcfab8cb09"
+
+  assert restore_verilog_import( top_module, import_dir, cache_dir )
+
+  key_dirs = [ name for name in os.listdir( cache_dir )
+               if name.startswith( top_module + "_import_" ) ]
+  assert len( key_dirs ) == 1
+
+  check_verilog_import( top_module, import_dir,
+                        os.path.join( cache_dir, key_dirs[0] ) )
@@ -0,0 +1,61 @@
+#=========================================================================
+# proc_sampling_test.py
+#=========================================================================
+
+import pytest
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.proc_sampling import run_sampled, sample_cpi
+from lab2_proc.ProcBasePRTL  import ProcBasePRTL
+
+from proc_test_utils import gen_loop_test, mk_harness
+
+#-------------------------------------------------------------------------
+# test_sample_cpi
+#-------------------------------------------------------------------------
+
+def test_sample_cpi():
+
+  assert sample_cpi( [] ) == ( None, None )
+  assert sample_cpi( [ ( 150, 100 ) ] ) == ( 1.5, float('inf') )
+
+  (cpi,cpi_err) = sample_cpi( [ ( 100, 100 ), ( 200, 100 ) ] )
+  assert cpi == 1.5
+  assert abs( cpi_err - 1.96 * 0.5 ) < 1e-9
+
+  (cpi,cpi_err) = sample_cpi( [ ( 120, 100 ) ] * 4 )
+  assert abs( cpi - 1.2 ) < 1e-9
+  assert cpi_err < 1e-9
+
+#-------------------------------------------------------------------------
+# test_run_sampled
+#-------------------------------------------------------------------------
+# The loop test has 110 instructions, and the functional model has to
+# execute all of them with the correct mngr messages no matter what the
+# detailed model does during the samples. Samples which start less than
+# warmup instructions before the end of the program are dropped.
+
+@pytest.mark.parametrize( "sample_period,warmup,size,num_samples", [
+  ( 10,  0,  5, 11 ),
+  ( 20,  5, 10,  6 ),
+  ( 50, 10, 20,  2 ),
+  ( 20, 10, 80,  5 ),
+])
+def test_run_sampled( sample_period, warmup, size, num_samples ):
+
+  th  = mk_harness( ProcBasePRTL, gen_loop_test )
+  sim = SimulationTool( th )
+
+  (samples,translator) = run_sampled( th, sim, sample_period, warmup, size,
+                                      max_cycles=5000 )
+
+  assert translator.num_insts == 110
+  assert th.sink.sink.idx == len( th.sink.sink.msgs )
+  assert len( th.src.src.msgs ) == 0
+
+  assert len( samples ) == num_samples
+  for (num_cycles,num_insts) in samples:
+    assert 0 < num_insts <= size
+    assert num_cycles >= num_insts
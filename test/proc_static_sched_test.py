@@ -0,0 +1,182 @@
+#=========================================================================
+# proc_static_sched_test.py
+#=========================================================================
+
+import pytest
+import random
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.proc_static_sched import StaticSchedule, CombEvalCounter
+from lab2_proc.proc_static_sched import levelize
+from lab2_proc.ProcBasePRTL      import ProcBasePRTL
+from lab2_proc.ProcAltPRTL       import ProcAltPRTL
+
+from proc_test_utils import gen_stall_test, gen_loop_test
+from proc_test_utils import mk_harness, run_cycles
+
+#-------------------------------------------------------------------------
+# test_levelize
+#-------------------------------------------------------------------------
+
+def test_levelize():
+
+  blocks = [ "a", "b", "c", "d" ]
+  reads  = { "a" : set([1]), "b" : set([2,3]), "c" : set([4]), "d" : set([7]) }
+  writes = { "a" : set([2]), "b" : set([4,5]), "c" : set([6]), "d" : set([3]) }
+
+  assert levelize( blocks, reads, writes ) == [ ["a","d"], ["b"], ["c"] ]
+
+def test_levelize_loop():
+
+  blocks = [ "a", "b", "c" ]
+  reads  = { "a" : set([3]), "b" : set([1]), "c" : set([2]) }
+  writes = { "a" : set([1]), "b" : set([2]), "c" : set([3]) }
+
+  with pytest.raises( Exception ) as excinfo:
+    levelize( blocks, reads, writes )
+
+  assert "Combinational loop" in str( excinfo.value )
+
+#-------------------------------------------------------------------------
+# test_static_sched
+#-------------------------------------------------------------------------
+# The statically scheduled processor has to behave exactly like the
+# event-driven one, and every block of the control unit has to be in the
+# schedule exactly once. We count the calls of the control unit blocks
+# in both runs.
+
+def run_static_sched_test( static_sched, src_delay, sink_delay,
+                           mem_stall_prob, mem_latency ):
+
+  # Same random delays for both runs
+
+  random.seed( 0xdeadbeef )
+
+  th    = mk_harness( ProcBasePRTL, gen_stall_test, src_delay, sink_delay,
+                      mem_stall_prob, mem_latency )
+  sim   = SimulationTool( th )
+  if static_sched:
+    evals = StaticSchedule( sim, th.proc.ctrl )
+  else:
+    evals = CombEvalCounter( sim, th.proc.ctrl )
+
+  sim.reset()
+
+  trace = []
+
+  def tick():
+    trace.append(( int( th.proc.commit_inst ), int( th.proc.ctrl.stall_D ),
+                   int( th.proc.ctrl.squash_F ) ))
+
+  run_cycles( th, sim, tick=tick )
+
+  return ( trace, evals )
+
+@pytest.mark.parametrize( "src_delay,sink_delay,mem_stall_prob,mem_latency", [
+  ( 0, 0, 0.0, 0 ),
+  ( 3, 5, 0.5, 3 ),
+])
+def test_static_sched( src_delay, sink_delay, mem_stall_prob, mem_latency ):
+
+  (ref_trace,counter) = run_static_sched_test( False, src_delay, sink_delay,
+                                               mem_stall_prob, mem_latency )
+  (trace,sched)       = run_static_sched_test( True,  src_delay, sink_delay,
+                                               mem_stall_prob, mem_latency )
+
+  assert trace == ref_trace
+
+  assert len( sched.schedule ) == len( sched.blocks )
+  assert set( sched.schedule ) == set( sched.blocks )
+
+  # The event-driven simulator calls the blocks again while the stall
+  # and squash signals settle, the schedule calls them fewer times
+
+  assert sched.num_block_evals == sched.num_evals * len( sched.schedule )
+  assert sched.num_block_evals <  counter.num_block_evals
+
+#-------------------------------------------------------------------------
+# test_static_sched_lockstep
+#-------------------------------------------------------------------------
+# Run the statically scheduled and the event-driven processor side by
+# side and compare all output ports of the control unit after every
+# cycle. We only use fixed memory latencies here, since the random
+# delays of the two harnesses would draw from the same random number
+# generator in an interleaved order.
+
+@pytest.mark.parametrize( "ProcModel", [ ProcBasePRTL, ProcAltPRTL ] )
+@pytest.mark.parametrize( "gen_test",  [ gen_stall_test, gen_loop_test ] )
+@pytest.mark.parametrize( "mem_latency", [ 0, 3 ] )
+def test_static_sched_lockstep( ProcModel, gen_test, mem_latency ):
+
+  ref_th  = mk_harness( ProcModel, gen_test, mem_latency=mem_latency )
+  ref_sim = SimulationTool( ref_th )
+
+  th  = mk_harness( ProcModel, gen_test, mem_latency=mem_latency )
+  sim = SimulationTool( th )
+  StaticSchedule( sim, th.proc.ctrl )
+
+  names = sorted([ port.name for port in th.proc.ctrl.get_outports() ])
+
+  def outputs( ctrl ):
+    return [ ( name, int( getattr( ctrl, name ) ) ) for name in names ]
+
+  ref_sim.reset()
+  sim.reset()
+
+  assert outputs( th.proc.ctrl ) == outputs( ref_th.proc.ctrl )
+
+  def tick():
+    ref_sim.cycle()
+    assert outputs( th.proc.ctrl ) == outputs( ref_th.proc.ctrl ), \
+      "Control unit outputs differ in cycle {}".format( sim.ncycles )
+
+  run_cycles( th, sim, tick=tick )
+
+  assert ref_th.done()
+
+#-------------------------------------------------------------------------
+# test_static_sched_no_retrigger
+#-------------------------------------------------------------------------
+# The scheduled block writes signals which it also reads (comb_a writes
+# tmp, which comb_b reads). The simulator must not call it again for
+# these writes, one input change means exactly one call.
+
+class CombChain (Model):
+
+  def __init__( s ):
+
+    s.in_ = InPort ( 8 )
+    s.out = OutPort( 8 )
+    s.tmp = Wire   ( 8 )
+
+    @s.combinational
+    def comb_b():
+      s.out.value = s.tmp + 1
+
+    @s.combinational
+    def comb_a():
+      s.tmp.value = s.in_ + 1
+
+def test_static_sched_no_retrigger():
+
+  model = CombChain()
+  model.elaborate()
+
+  sim   = SimulationTool( model )
+  sched = StaticSchedule( sim, model )
+  sim.reset()
+
+  assert [ sched.names[block] for block in sched.schedule ] \
+      == [ "comb_a", "comb_b" ]
+
+  for value in [ 3, 7, 42 ]:
+
+    num_evals = sched.num_evals
+
+    model.in_.value = value
+    sim.eval_combinational()
+
+    assert model.out == value + 2
+    assert sched.num_evals == num_evals + 1
@@ -0,0 +1,130 @@
+#=========================================================================
+# proc_test_utils.py
+#=========================================================================
+# Test programs and helpers shared by the tests which look at a whole
+# simulation instead of single instructions (CPI stack, fast-forward,
+# checkpoints, sampling, ...). The tests create the simulator
+# themselves, since some of them have to hook into it before reset:
+#
+#  th    = mk_harness( ProcBasePRTL, gen_stall_test )
+#  sim   = SimulationTool( th )
+#  stack = CpiStack( th.proc )
+#  sim.reset()
+#  num_cycles = run_cycles( th, sim, tick=stack.tick )
+#
+
+from pymtl   import *
+from harness import TestHarness
+
+from lab2_proc.tinyrv2_encoding import assemble
+
+#-------------------------------------------------------------------------
+# gen_stall_test
+#-------------------------------------------------------------------------
+# Every iteration has a RAW hazard between the sub and the bne and a
+# taken branch (except for the last one). Only uses instructions which
+# are implemented in the baseline processor.
+
+def gen_stall_test():
+  return """
+    csrr x1, mngr2proc < 5
+    csrr x2, mngr2proc < 1
+    csrr x3, mngr2proc < 0
+  loop:
+    add  x3, x3, x1
+    sub  x1, x1, x2
+    bne  x1, x0, loop
+    csrw proc2mngr, x3 > 15
+  """
+
+#-------------------------------------------------------------------------
+# gen_nested_loop_test
+#-------------------------------------------------------------------------
+# The inner loop branch is not taken on the last iteration of the inner
+# loop, so once it has been seen taken it is only mispredicted once per
+# outer loop iteration. Only uses instructions which are implemented in
+# the baseline processor.
+
+def gen_nested_loop_test():
+  return """
+    csrr x1, mngr2proc < 10
+    csrr x2, mngr2proc < 1
+    csrr x3, mngr2proc < 0
+    csrr x4, mngr2proc < 3
+  outer:
+    add  x5, x4, x0
+  inner:
+    add  x3, x3, x2
+    sub  x5, x5, x2
+    bne  x5, x0, inner
+    sub  x1, x1, x2
+    bne  x1, x0, outer
+    csrw proc2mngr, x3 > 30
+  """
+
+#-------------------------------------------------------------------------
+# gen_loop_test
+#-------------------------------------------------------------------------
+# The loop uses values from the manager, keeps live values in registers,
+# writes memory, and sends values to the manager both before and after
+# the switch, so all of the state has to be transferred correctly.
+
+def gen_loop_test():
+  return """
+    csrr x1, mngr2proc < 20
+    csrr x4, mngr2proc < 0x2000
+    csrw proc2mngr, x1 > 20
+    addi x2, x0, 0
+    addi x3, x0, 0
+  loop:
+    add  x3, x3, x2
+    sw   x3, 0(x4)
+    addi x4, x4, 4
+    addi x2, x2, 1
+    bne  x2, x1, loop
+    lw   x5, -4(x4)
+    csrr x6, mngr2proc < 7
+    add  x5, x5, x6
+    csrw proc2mngr, x5 > 197
+    csrw proc2mngr, x3 > 190
+  """
+
+#-------------------------------------------------------------------------
+# mk_harness
+#-------------------------------------------------------------------------
+# Elaborated test harness with the program already loaded.
+
+def mk_harness( ProcModel, gen_test, src_delay=0, sink_delay=0,
+                mem_stall_prob=0, mem_latency=0 ):
+
+  th = TestHarness( ProcModel, False, src_delay, sink_delay,
+                    mem_stall_prob, mem_latency )
+  th.vcd_file = False
+  th.elaborate()
+
+  th.load( assemble( gen_test() ) )
+
+  return th
+
+#-------------------------------------------------------------------------
+# run_cycles
+#-------------------------------------------------------------------------
+# Run the simulator (after reset) until the test harness is done. We
+# call pre_tick before and tick after every cycle. Returns the number of
+# cycles we ran (i.e., without the reset cycles).
+
+def run_cycles( th, sim, tick=None, pre_tick=None, max_cycles=5000 ):
+
+  num_cycles = 0
+  while not th.done() and num_cycles < max_cycles:
+    sim.print_line_trace()
+    if pre_tick is not None:
+      pre_tick()
+    sim.cycle()
+    if tick is not None:
+      tick()
+    num_cycles += 1
+
+  assert th.done()
+
+  return num_cycles
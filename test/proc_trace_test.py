@@ -0,0 +1,52 @@
+#=========================================================================
+# proc_trace_test.py
+#=========================================================================
+
+import pytest
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.proc_trace   import TraceRecorder, format_trace
+from lab2_proc.ProcBasePRTL import ProcBasePRTL
+
+from proc_test_utils import gen_stall_test, mk_harness, run_cycles
+
+#-------------------------------------------------------------------------
+# test_trace
+#-------------------------------------------------------------------------
+# The formatted binary trace has to be exactly the same as the line
+# trace of the processor.
+
+@pytest.mark.parametrize( "src_delay,sink_delay,mem_stall_prob,mem_latency", [
+  ( 0, 0, 0.0, 0 ),
+  ( 3, 5, 0.5, 3 ),
+])
+def test_trace( tmpdir, src_delay, sink_delay, mem_stall_prob, mem_latency ):
+
+  th  = mk_harness( ProcBasePRTL, gen_stall_test, src_delay, sink_delay,
+                    mem_stall_prob, mem_latency )
+  sim = SimulationTool( th )
+  sim.reset()
+
+  recorder = TraceRecorder( th.proc, 5000, sim.ncycles )
+  expected = []
+
+  def record():
+    expected.append( "{:3}: {}".format( sim.ncycles, th.proc.line_trace() ) )
+    recorder.record()
+
+  run_cycles( th, sim, pre_tick=record )
+
+  trace_file = str( tmpdir.join( "proc.trace" ) )
+  recorder.save( trace_file )
+
+  assert list( format_trace( trace_file ) ) == expected
+
+  # Only a range of cycles
+
+  start = recorder.start_cycle + 10
+  assert list( format_trace( trace_file, start, start + 5 ) ) \
+      == expected[10:15]
+
+  assert list( format_trace( trace_file, start=100000 ) ) == []
@@ -0,0 +1,57 @@
+#=========================================================================
+# proc_translate_test.py
+#=========================================================================
+
+import pytest
+import distutils.spawn
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.tinyrv2_encoding import assemble
+from lab2_proc.proc_translate   import translate_proc
+from lab2_proc.proc_native_sim  import NativeProcSim, build_native_sim
+from lab2_proc.proc_native_sim  import run_native
+from lab2_proc.ProcBasePRTL     import ProcBasePRTL
+
+from proc_test_utils import gen_stall_test, mk_harness, run_cycles
+
+if not distutils.spawn.find_executable( "verilator" ):
+  pytest.skip( "verilator is not installed", allow_module_level=True )
+
+#-------------------------------------------------------------------------
+# test_translate
+#-------------------------------------------------------------------------
+# The translated model has to take exactly as many cycles as the PyMTL
+# model.
+
+def run_translate_test( ProcModel ):
+
+  th  = mk_harness( ProcModel, gen_stall_test )
+  sim = SimulationTool( th )
+  sim.reset()
+
+  return run_cycles( th, sim )
+
+def test_translate():
+  assert run_translate_test( translate_proc( ProcBasePRTL ) ) \
+      == run_translate_test( ProcBasePRTL )
+
+#-------------------------------------------------------------------------
+# test_translate_native
+#-------------------------------------------------------------------------
+
+def test_translate_native():
+
+  th        = mk_harness( translate_proc( ProcBasePRTL ), gen_stall_test )
+  mem_image = assemble( gen_stall_test() )
+
+  native = NativeProcSim( build_native_sim( th.proc.class_name ),
+                          len( th.mem.mem ) )
+  native.load_image( mem_image )
+  native.reset()
+
+  run_native( th, native, 5000 )
+
+  assert th.done()
+  assert native.h.ninsts == 19
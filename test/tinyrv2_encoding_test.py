@@ -0,0 +1,203 @@
+#=========================================================================
+# tinyrv2_encoding_test.py
+#=========================================================================
+
+import pytest
+import random
+import struct
+
+from pymtl import *
+
+from lab2_proc.SparseMemoryImage import SparseMemoryImage
+from lab2_proc.tinyrv2_encoding  import tinyrv2_encoding_table
+from lab2_proc.tinyrv2_encoding  import tinyrv2_isa_impl
+from lab2_proc.tinyrv2_encoding  import assemble_inst, decode_inst_name
+from lab2_proc.tinyrv2_encoding  import decode, decode_cache
+from lab2_proc.tinyrv2_encoding  import decode_batch, disassemble
+from lab2_proc.tinyrv2_encoding  import disassemble_inst
+from lab2_proc.tinyrv2_encoding  import TinyRV2Inst, TinyRV2DecodedInst
+
+#-------------------------------------------------------------------------
+# mk_section
+#-------------------------------------------------------------------------
+# Helper to create a section from a list of words
+
+def mk_section( name, addr, words ):
+
+  data = bytearray()
+  for word in words:
+    data.extend(struct.pack("<I",word))
+
+  return SparseMemoryImage.Section( name, addr, data )
+
+#-------------------------------------------------------------------------
+# gen_random_words
+#-------------------------------------------------------------------------
+# Generate random legal instruction words by filling in the don't care
+# bits of each row in the encoding table.
+
+def gen_random_words( nwords_per_inst ):
+
+  words = []
+  for row in tinyrv2_encoding_table:
+    opcode_mask  = row[1]
+    opcode_match = row[2]
+    for i in xrange( nwords_per_inst ):
+      word = ( random.getrandbits(32) & ~opcode_mask ) | opcode_match
+      try:
+        decode_inst_name( Bits( 32, word ) )
+      except AssertionError:
+        continue
+      words.append( word )
+
+  return words
+
+#-------------------------------------------------------------------------
+# test_decode
+#-------------------------------------------------------------------------
+# Compare the table-driven decoder against a linear search through the
+# encoding table for both legal and completely random words.
+
+def check_decode( word ):
+
+  try:
+    ref_tmpl = tinyrv2_isa_impl.decode_tmpl_linear( word )
+  except AssertionError:
+    with pytest.raises( AssertionError ):
+      decode( word )
+    return
+
+  if word == 0:
+    assert decode( word ) == " "
+  else:
+    assert decode( word ) == ref_tmpl.partition(' ')[0]
+    assert tinyrv2_isa_impl.decode_tmpl( word ) == ref_tmpl
+
+  assert decode_inst_name( Bits( 32, word ) ) == decode( word )
+
+def test_decode_legal():
+  for word in gen_random_words( 50 ):
+    check_decode( word )
+
+def test_decode_random():
+  for i in xrange( 5000 ):
+    check_decode( random.getrandbits(32) )
+
+def test_decode_special():
+
+  assert decode( 0 ) == " "
+  assert decode( 0x00000013 ) == "nop"
+  assert decode( 0x00100013 ) == "addi"
+
+  # Field values which are don't cares in the encoding table are
+  # illegal if they do not match
+
+  with pytest.raises( AssertionError ):
+    decode( 0x40001013 ) # slli with funct7 != 0
+
+def test_decode_memoized():
+
+  word = assemble_inst( {}, 0x200, "add x1, x2, x3" ).uint()
+  assert decode( word ) == "add"
+  assert decode_cache[ word ] == "add"
+
+#-------------------------------------------------------------------------
+# test_decoded_inst_fields
+#-------------------------------------------------------------------------
+
+def test_decoded_inst_fields():
+
+  for word in gen_random_words( 50 ):
+
+    inst         = TinyRV2Inst( Bits( 32, word ) )
+    decoded_inst = TinyRV2DecodedInst( word )
+
+    assert decoded_inst.name   == inst.name
+    assert decoded_inst.rd     == inst.rd
+    assert decoded_inst.rs1    == inst.rs1
+    assert decoded_inst.rs2    == inst.rs2
+    assert decoded_inst.shamt  == inst.shamt
+    assert decoded_inst.csrnum == inst.csrnum
+    assert decoded_inst.u_imm  == inst.u_imm
+
+    assert decoded_inst.i_imm  == inst.i_imm.int()
+    assert decoded_inst.s_imm  == inst.s_imm.int()
+    assert decoded_inst.b_imm  == inst.b_imm.int()
+    assert decoded_inst.j_imm  == inst.j_imm.int()
+
+    assert str(decoded_inst)   == str(inst)
+
+def test_decoded_inst_negative_imm():
+
+  inst = TinyRV2DecodedInst( assemble_inst( {}, 0x200, "addi x1, x2, 0xfff" ) )
+  assert inst.name  == "addi"
+  assert inst.i_imm == -1
+
+  inst = TinyRV2DecodedInst( assemble_inst( {}, 0x200, "bne x1, x2, 0x1ff8" ) )
+  assert inst.name  == "bne"
+  assert inst.b_imm == -8
+
+#-------------------------------------------------------------------------
+# test_decode_batch
+#-------------------------------------------------------------------------
+
+def test_decode_batch():
+
+  np = pytest.importorskip( "numpy" )
+
+  words  = gen_random_words( 50 )
+  fields = decode_batch( np.array( words, dtype=np.uint32 ) )
+
+  for i, word in enumerate( words ):
+
+    decoded_inst = TinyRV2DecodedInst( word )
+
+    assert fields["name"][i]   == decoded_inst.name
+    assert fields["rd"][i]     == decoded_inst.rd
+    assert fields["rs1"][i]    == decoded_inst.rs1
+    assert fields["rs2"][i]    == decoded_inst.rs2
+    assert fields["shamt"][i]  == decoded_inst.shamt
+    assert fields["csrnum"][i] == decoded_inst.csrnum
+    assert fields["i_imm"][i]  == decoded_inst.i_imm
+    assert fields["s_imm"][i]  == decoded_inst.s_imm
+    assert fields["b_imm"][i]  == decoded_inst.b_imm
+    assert fields["u_imm"][i]  == decoded_inst.u_imm
+    assert fields["j_imm"][i]  == decoded_inst.j_imm
+
+def test_decode_batch_illegal():
+
+  np = pytest.importorskip( "numpy" )
+
+  fields = decode_batch( np.array( [ 0, 0x40001013, 0x13 ], dtype=np.uint32 ) )
+
+  assert list( fields["idx"]  ) == [ -1, -1, 0 ]
+  assert list( fields["name"] ) == [ "", "", "nop" ]
+
+#-------------------------------------------------------------------------
+# test_disassemble
+#-------------------------------------------------------------------------
+
+def test_disassemble():
+
+  pytest.importorskip( "numpy" )
+
+  words = gen_random_words( 10 ) + [ 0 ]
+
+  mem_image = SparseMemoryImage()
+  mem_image.add_section( mk_section( ".text", 0x200, words ) )
+
+  ref = "".join([ " {:0>8x}  {:0>8x}  {}\n".format( 0x200+4*i, word,
+                    disassemble_inst( Bits( 32, word ) ) )
+                  for i, word in enumerate( words ) ])
+
+  assert disassemble( mem_image ) == ref
+
+def test_disassemble_illegal():
+
+  pytest.importorskip( "numpy" )
+
+  mem_image = SparseMemoryImage()
+  mem_image.add_section( mk_section( ".text", 0x200, [ 0x13, 0x40001013 ] ) )
+
+  with pytest.raises( AssertionError ):
+    disassemble( mem_image )
@@ -0,0 +1,59 @@
+#=========================================================================
+# tinyrv2_semantics_test.py
+#=========================================================================
+
+import pytest
+
+from lab2_proc.tinyrv2_semantics import TinyRV2Semantics
+
+#-------------------------------------------------------------------------
+# test_regfile
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "RegisterFile", [
+  TinyRV2Semantics.RegisterFile,
+  TinyRV2Semantics.TracingRegisterFile,
+])
+def test_regfile( RegisterFile ):
+
+  R = RegisterFile()
+
+  # x0 is hardwired to zero
+
+  R[0] = 42
+  assert R[0] == 0
+
+  # Writes are truncated to unsigned 32-bit values
+
+  R[1] = -1
+  assert R[1] == 0xffffffff
+
+  R[2] = 0x123456789
+  assert R[2] == 0x23456789
+
+  R[3] = True
+  assert R[3] == 1
+
+#-------------------------------------------------------------------------
+# test_regfile_trace
+#-------------------------------------------------------------------------
+
+def test_regfile_trace():
+
+  R = TinyRV2Semantics.TracingRegisterFile()
+
+  R[1] = 0xdeadbeef
+  R[2] = R[1] + R[0]
+
+  assert R.trace_regs_str() == \
+    "{:14} {:14} {:14}".format( "X[ 2]=deadbeef", "X[ 1]=deadbeef", "X[ 0]=00000000" )
+
+  assert R.trace_regs_str() == "{:14} {:14} {:14}".format( "", "", "" )
+
+def test_semantics_regfile_select():
+
+  isa = TinyRV2Semantics( None, None, None )
+  assert type( isa.R ) is TinyRV2Semantics.RegisterFile
+
+  isa = TinyRV2Semantics( None, None, None, trace_regs=True )
+  assert type( isa.R ) is TinyRV2Semantics.TracingRegisterFile
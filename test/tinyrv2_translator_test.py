@@ -0,0 +1,301 @@
+#=========================================================================
+# tinyrv2_translator_test.py
+#=========================================================================
+
+import pytest
+import random
+import struct
+import collections
+
+from pymtl   import *
+from harness import *
+
+from lab2_proc.tinyrv2_encoding   import assemble, assemble_inst
+from lab2_proc.tinyrv2_translator import TinyRV2Translator
+from lab2_proc.tinyrv2_semantics  import TinyRV2Semantics
+
+#-------------------------------------------------------------------------
+# run_translator_test
+#-------------------------------------------------------------------------
+# Assemble the test program, run it on the translator, and check the
+# proc2mngr messages against the ones expected by the assembly test.
+
+def unpack_words( section ):
+  return list( struct.unpack( "<{}I".format( len(section.data)/4 ),
+                              str(section.data) ) )
+
+def load_test( gen_test ):
+
+  mem_image = assemble( gen_test() )
+
+  memory    = bytearray( 1 << 20 )
+  mngr2proc = collections.deque()
+  ref       = []
+
+  for section in mem_image.get_sections():
+    if   section.name == ".mngr2proc":
+      mngr2proc.extend( unpack_words( section ) )
+    elif section.name == ".proc2mngr":
+      ref = unpack_words( section )
+    else:
+      start_addr = section.addr
+      stop_addr  = section.addr + len(section.data)
+      memory[start_addr:stop_addr] = section.data
+
+  return ( memory, mngr2proc, ref )
+
+def run_translator_test( gen_test, max_insts=10000 ):
+
+  (memory,mngr2proc,ref) = load_test( gen_test )
+  proc2mngr = []
+
+  translator = TinyRV2Translator( memory, mngr2proc, proc2mngr )
+  translator.run( max_insts )
+
+  assert proc2mngr == ref
+  assert len(mngr2proc) == 0
+
+  return translator
+
+#-------------------------------------------------------------------------
+# instruction tests
+#-------------------------------------------------------------------------
+
+import inst_add
+import inst_addi
+import inst_andi
+import inst_or
+
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_add.gen_basic_test      ),
+  asm_test( inst_add.gen_dest_dep_test   ),
+  asm_test( inst_add.gen_srcs_dep_test   ),
+  asm_test( inst_add.gen_value_test      ),
+  asm_test( inst_add.gen_random_test     ),
+  asm_test( inst_addi.gen_basic_test     ),
+  asm_test( inst_addi.gen_value_test     ),
+  asm_test( inst_addi.gen_random_test    ),
+  asm_test( inst_andi.gen_value_test     ),
+  asm_test( inst_andi.gen_random_test    ),
+  asm_test( inst_or.gen_value_test       ),
+  asm_test( inst_or.gen_random_test      ),
+])
+def test_translator( name, test ):
+  run_translator_test( test )
+
+#-------------------------------------------------------------------------
+# run_lockstep_test
+#-------------------------------------------------------------------------
+# Run the translator and TinyRV2Semantics side by side. After every
+# block of the translator we execute the same number of instructions on
+# TinyRV2Semantics and compare the PC, all registers, and the memory.
+
+class BitsMemory (object):
+
+  # TinyRV2Semantics reads Bits from memory (like ProcFL does through the
+  # BytesMemPortAdapter), so we wrap a plain bytearray
+
+  def __init__( s, data ):
+    s.data = data
+
+  def __getitem__( s, idx ):
+    if isinstance( idx, slice ):
+      nbytes = idx.stop - idx.start
+      value  = 0
+      for i in xrange( nbytes ):
+        value |= s.data[ idx.start + i ] << ( 8*i )
+      return Bits( 8*nbytes, value )
+    return Bits( 8, s.data[ idx ] )
+
+  def __setitem__( s, idx, value ):
+    if isinstance( idx, slice ):
+      for i in xrange( idx.stop - idx.start ):
+        s.data[ idx.start + i ] = ( int( value ) >> ( 8*i ) ) & 0xff
+    else:
+      s.data[ idx ] = int( value ) & 0xff
+
+def run_lockstep_test( gen_test, max_blocks=10000 ):
+
+  (memory,mngr2proc,ref) = load_test( gen_test )
+
+  translator = TinyRV2Translator( memory, mngr2proc, [] )
+
+  isa = TinyRV2Semantics( BitsMemory( bytearray( memory ) ),
+                          collections.deque( mngr2proc ), [] )
+  isa.coreid = translator.coreid
+
+  num_blocks = 0
+  while num_blocks < max_blocks:
+
+    # Execute exactly one block on the translator
+
+    (block,block_ninsts) = translator.block_cache.get( translator.PC ) \
+                        or translator.translate( translator.PC )
+
+    ninsts = translator.run( block_ninsts )
+    if ninsts == 0:
+      break
+
+    for i in xrange( ninsts ):
+      inst = isa.decode_cache.get( isa.PC )
+      if inst is None:
+        pc   = int( isa.PC )
+        inst = isa.decode( isa.PC, isa.M[ pc : pc+4 ] )
+      isa.execute( inst )
+
+    assert translator.PC == int( isa.PC )
+    assert translator.R  == [ int( x ) for x in isa.R.regs ]
+    assert translator.M  == isa.M.data
+
+    assert translator.proc2mngr_queue \
+        == [ int( x ) for x in isa.proc2mngr_queue ]
+    assert len( translator.mngr2proc_queue ) == len( isa.mngr2proc_queue )
+
+    num_blocks += 1
+
+  assert translator.proc2mngr_queue == ref
+  assert len( translator.mngr2proc_queue ) == 0
+
+  return num_blocks
+
+#-------------------------------------------------------------------------
+# test_lockstep
+#-------------------------------------------------------------------------
+
+import inst_mul
+
+# All test programs of the given instruction test modules (but not the
+# generators they import from inst_utils)
+
+def inst_tests( *modules ):
+  return [ asm_test( func ) for module in modules
+           for (name,func) in sorted( vars( module ).items() )
+           if name.startswith( "gen_" ) and name.endswith( "_test" )
+           and func.__module__ == module.__name__ ]
+
+@pytest.mark.parametrize( "name,test",
+  inst_tests( inst_add, inst_addi, inst_andi, inst_or, inst_mul )
+)
+def test_lockstep( name, test ):
+  assert run_lockstep_test( test ) > 0
+
+# Random programs with arithmetic, loads and stores into a data section,
+# and forward branches and jumps, so that blocks end in all the
+# different ways. The programs do not send anything to the manager, we
+# only compare the state after every block.
+
+random_rr_insts = [ "add", "sub", "mul", "and", "or", "xor", "slt", "sltu",
+                    "sll", "srl", "sra" ]
+random_ri_insts = [ "addi", "andi", "ori", "xori", "slti", "sltiu" ]
+random_sh_insts = [ "slli", "srli", "srai" ]
+random_br_insts = [ "beq", "bne", "blt", "bge", "bltu", "bgeu" ]
+
+def gen_random_program( seed, ninsts=200 ):
+
+  rng = random.Random( seed )
+
+  # x10 points to the data section and is never overwritten
+
+  def reg():
+    return "x{}".format( rng.choice( range( 10 ) + range( 11, 32 ) ) )
+
+  asm = [ "csrr x10, mngr2proc < 0x2000" ]
+  for i in xrange( 1, 10 ):
+    asm.append( "csrr x{}, mngr2proc < 0x{:08x}"
+                .format( i, rng.getrandbits( 32 ) ) )
+
+  for i in xrange( ninsts ):
+
+    kind = rng.randint( 0, 9 )
+
+    if kind < 3:
+      asm.append( "{} {}, {}, {}".format(
+        rng.choice( random_rr_insts ), reg(), reg(), reg() ) )
+    elif kind < 5:
+      asm.append( "{} {}, {}, {}".format(
+        rng.choice( random_ri_insts ), reg(), reg(),
+        rng.randint( -2048, 2047 ) ) )
+    elif kind < 6:
+      asm.append( "{} {}, {}, {}".format(
+        rng.choice( random_sh_insts ), reg(), reg(), rng.randint( 0, 31 ) ) )
+    elif kind < 7:
+      asm.append( "lw {}, {}(x10)".format( reg(), 4*rng.randint( 0, 63 ) ) )
+    elif kind < 8:
+      asm.append( "sw {}, {}(x10)".format( reg(), 4*rng.randint( 0, 63 ) ) )
+    elif kind < 9:
+      asm.append( "{} {}, {}, label{}".format(
+        rng.choice( random_br_insts ), reg(), reg(), i ) )
+      asm.append( "label{}:".format( i ) if rng.randint( 0, 1 ) else
+                  "addi {}, {}, 1\nlabel{}:".format( reg(), reg(), i ) )
+    else:
+      asm.append( "jal {}, label{}\nlui {}, {}\nlabel{}:".format(
+        reg(), i, reg(), rng.randint( 0, 0xfffff ), i ) )
+
+  asm.append( ".data" )
+  for i in xrange( 64 ):
+    asm.append( ".word 0x{:08x}".format( rng.getrandbits( 32 ) ) )
+
+  return "\n".join( asm ) + "\n"
+
+@pytest.mark.parametrize( "seed", range( 8 ) )
+def test_lockstep_random( seed ):
+  assert run_lockstep_test( lambda: gen_random_program( seed ) ) > 0
+
+#-------------------------------------------------------------------------
+# test_loop
+#-------------------------------------------------------------------------
+# The loop body is translated once and then reused from the block cache.
+
+def gen_loop_test():
+  return """
+    csrr x1, mngr2proc < 100
+    addi x2, x0, 0
+    addi x3, x0, 0
+  loop:
+    add  x3, x3, x2
+    addi x2, x2, 1
+    bne  x2, x1, loop
+    csrw proc2mngr, x3 > 4950
+  """
+
+def test_loop():
+  translator = run_translator_test( gen_loop_test )
+  assert translator.num_insts == 3 + 3*100 + 1
+  assert 0x20c in translator.block_cache
+
+def test_max_insts():
+
+  mem_image = assemble( gen_loop_test() )
+  memory    = bytearray( 1 << 20 )
+  text      = mem_image.get_section( ".text" )
+  memory[text.addr:text.addr+len(text.data)] = text.data
+
+  translator = TinyRV2Translator( memory, collections.deque([ 100 ]), [] )
+
+  # We must stop exactly after the requested number of instructions,
+  # even in the middle of a block
+
+  assert translator.run( 5 ) == 5
+  assert translator.PC == 0x214
+  assert translator.R[3] == 0
+  assert translator.R[2] == 1
+
+#-------------------------------------------------------------------------
+# test_self_modifying_code
+#-------------------------------------------------------------------------
+# Overwrite an instruction which has already been translated.
+
+def test_self_modifying_code():
+
+  new_inst = assemble_inst( {}, 0, "addi x5, x0, 7" ).uint()
+
+  def gen_test():
+    return """
+      csrr x1, mngr2proc < {}
+      addi x2, x0, 0x20c
+      sw   x1, 0(x2)
+      addi x5, x0, 1
+      csrw proc2mngr, x5 > 7
+    """.format( new_inst )
+
+  run_translator_test( gen_test )
@@ -271,13 +271,22 @@ def assemble_field_i_imm( bits, sym, pc, field_str ):
 def disassemble_field_i_imm( bits ):
   return "0x{:0>3x}".format( bits[ tinyrv2_field_slice_i_imm ].uint() )
 
+# Performance counter CSRs (only implemented in the Verilog RTL models)
+
+tinyrv2_perf_csrs = dict(
+  [ ( "cycle", 0xC00 ), ( "instret", 0xC02 ) ] +
+  [ ( "hpmcounter{}".format(i), 0xC00 + i ) for i in xrange( 3, 32 ) ]
+)
+
 def assemble_field_csrnum( bits, sym, pc, field_str ):
 
   assert (field_str == "proc2mngr") or (field_str == "mngr2proc") \
       or (field_str == "numcores" ) or (field_str == "coreid") \
-      or (field_str == "stats_en" )
+      or (field_str == "stats_en" ) or (field_str in tinyrv2_perf_csrs)
 
-  if   field_str == "mngr2proc":
+  if field_str in tinyrv2_perf_csrs:
+    imm = tinyrv2_perf_csrs[ field_str ]
+  elif field_str == "mngr2proc":
     imm = 0xFC0
   elif field_str == "proc2mngr":
     imm = 0x7C0
@@ -482,15 +491,105 @@ class IsaImpl (object):
 
       self.disasm_field_funcs_dict[ inst_name ] = disasm_field_funcs
 
+    # Build the decode tables and make sure they agree with the encoding
+    # table
+
+    self.build_decode_table()
+    self.check_decode_table()
+
+  #-----------------------------------------------------------------------
+  # build_decode_table
+  #-----------------------------------------------------------------------
+  # We turn the encoding table into a two-level lookup table. The first
+  # level is indexed by the bits which are in the opcode mask of _every_
+  # row (i.e., the major opcode). The second level is indexed by the bits
+  # which are in the opcode mask of every row with the same major opcode
+  # (e.g., funct3 and funct7). Each entry in the second level is the list
+  # of rows which can still match, in the same order as in the encoding
+  # table. Almost all of these lists have a single row, and a few have
+  # two (e.g., nop/addi, srli/srai), so decoding is effectively O(1).
+
+  def build_decode_table( self ):
+
+    self.decode_major_mask = (1 << self.nbits) - 1
+    for row in self.inst_encoding_table:
+      self.decode_major_mask &= row[1]
+
+    # Group the rows by major opcode
+
+    groups = {}
+    for row in self.inst_encoding_table:
+      major = row[2] & self.decode_major_mask
+      groups.setdefault( major, [] ).append( row )
+
+    # Create the second level table for each major opcode
+
+    self.decode_table = {}
+    for major, rows in groups.iteritems():
+
+      minor_mask = (1 << self.nbits) - 1
+      for row in rows:
+        minor_mask &= row[1]
+      minor_mask &= ~self.decode_major_mask
+
+      minor_table = {}
+      for row in rows:
+        minor = row[2] & minor_mask
+        minor_table.setdefault( minor, [] ).append( row )
+
+      self.decode_table[ major ] = ( minor_mask, minor_table )
+
+  #-----------------------------------------------------------------------
+  # check_decode_table
+  #-----------------------------------------------------------------------
+  # Make sure the decode tables give the same result as a linear search
+  # through the encoding table. For every row we check the opcode match
+  # with all of the don't care bits cleared and with all of them set.
+
+  def check_decode_table( self ):
+
+    all_bits = (1 << self.nbits) - 1
+
+    for row in self.inst_encoding_table:
+      for inst_bits in [ row[2], row[2] | ( all_bits & ~row[1] ) ]:
+        ref_tmpl = self.decode_tmpl_linear( inst_bits )
+        assert self.decode_tmpl( inst_bits ) == ref_tmpl, \
+          "Decode table does not agree with encoding table for {} ({:x})" \
+            .format( ref_tmpl, inst_bits )
+
   #-----------------------------------------------------------------------
   # decode_tmpl
   #-----------------------------------------------------------------------
-  # For now this is O(n) where n is the number of instructions in the
-  # encoding table. Obviously, this is pretty slow. I am sure we can do
-  # better by creating some kind of tree-based data structure.
 
   def decode_tmpl( self, inst_bits ):
 
+    inst_bits = int( inst_bits )
+
+    if inst_bits == 0: # hacky
+      return ""
+
+    entry = self.decode_table.get( inst_bits & self.decode_major_mask )
+    if entry is not None:
+
+      (minor_mask,minor_table) = entry
+
+      for row in minor_table.get( inst_bits & minor_mask, () ):
+        if (inst_bits & row[1]) == row[2]:
+          return row[0]
+
+    # Illegal instruction
+
+    raise AssertionError( "Illegal instruction {:0>8x}!".format( inst_bits ) )
+
+  #-----------------------------------------------------------------------
+  # decode_tmpl_linear
+  #-----------------------------------------------------------------------
+  # This is the reference decoder which is O(n) where n is the number of
+  # instructions in the encoding table. We only use it to check the
+  # decode tables.
+
+  def decode_tmpl_linear( self, inst_bits ):
+
     if inst_bits == 0: # hacky
       return ""
 
@@ -856,111 +955,197 @@ def assemble( asm_code ):
 def disassemble_inst( inst_bits ):
   return tinyrv2_isa_impl.disassemble_inst( inst_bits )
 
-def decode_inst_name( inst ):
+#-------------------------------------------------------------------------
+# decode
+#-------------------------------------------------------------------------
+# Originally decode_inst_name was a big hand-written case statement over
+# the opcode, funct3, and funct7 fields, which had to be kept in sync
+# with the encoding table by hand. Now we use the two-level decode table
+# which IsaImpl automatically builds from the encoding table. We also
+# memoize the result for each instruction word since programs tend to
+# decode the same small set of instruction words over and over again.
 
-  # Originally I was just using this:
-  #
-  #  return parc_isa_impl.decode_inst_name( inst_bits )
-  #
-  # which basically just does a linear search in the encoding table to
-  # find a match. Eventually, I think we should figure out a way to
-  # automatically turn the encoding table into some kind of fast
-  # tree-bsaed search, but for now we just explicitly create a big case
-  # statement to do the instruction name decode.
-
-  # Short names
-
-  opcode = tinyrv2_field_slice_opcode
-  funct3 = tinyrv2_field_slice_funct3
-  funct7 = tinyrv2_field_slice_funct7
-
-  inst_name = ""
-
-  if inst == 0b00000000000000000000000000010011: inst_name = "nop"
-
-  elif inst[opcode] == 0b0110011:
-    if   inst[funct7] == 0b0000000:
-      if   inst[funct3] == 0b000:     inst_name = "add"
-      elif inst[funct3] == 0b001:     inst_name = "sll"
-      elif inst[funct3] == 0b010:     inst_name = "slt"
-      elif inst[funct3] == 0b011:     inst_name = "sltu"
-      elif inst[funct3] == 0b100:     inst_name = "xor"
-      elif inst[funct3] == 0b101:     inst_name = "srl"
-      elif inst[funct3] == 0b110:     inst_name = "or"
-      elif inst[funct3] == 0b111:     inst_name = "and"
-    elif inst[funct7] == 0b0100000:
-      if   inst[funct3] == 0b000:     inst_name = "sub"
-      elif inst[funct3] == 0b101:     inst_name = "sra"
-    elif inst[funct7] == 0b0000001:
-      if   inst[funct3] == 0b000:     inst_name = "mul"
-
-  elif inst[opcode] == 0b0010011:
-    if   inst[funct3] == 0b000:       inst_name = "addi"
-    elif inst[funct3] == 0b010:       inst_name = "slti"
-    elif inst[funct3] == 0b011:       inst_name = "sltiu"
-    elif inst[funct3] == 0b100:       inst_name = "xori"
-    elif inst[funct3] == 0b110:       inst_name = "ori"
-    elif inst[funct3] == 0b111:       inst_name = "andi"
-    elif inst[funct3] == 0b001:       inst_name = "slli"
-    elif inst[funct3] == 0b101:
-      if   inst[funct7] == 0b0000000: inst_name = "srli"
-      elif inst[funct7] == 0b0100000: inst_name = "srai"
-
-  elif inst[opcode] == 0b0100011:
-    if   inst[funct3] == 0b010:       inst_name = "sw"
-    elif inst[funct3] == 0b000:       inst_name = "sb"
-
-  elif inst[opcode] == 0b0000011:
-    if   inst[funct3] == 0b010:       inst_name = "lw"
-    elif inst[funct3] == 0b000:       inst_name = "lb"
-
-  elif inst[opcode] == 0b1100011:
-    if   inst[funct3] == 0b000:       inst_name = "beq"
-    elif inst[funct3] == 0b001:       inst_name = "bne"
-    elif inst[funct3] == 0b100:       inst_name = "blt"
-    elif inst[funct3] == 0b101:       inst_name = "bge"
-    elif inst[funct3] == 0b110:       inst_name = "bltu"
-    elif inst[funct3] == 0b111:       inst_name = "bgeu"
-
-  elif inst[opcode] == 0b0110111:     inst_name = "lui"
-
-  elif inst[opcode] == 0b0010111:     inst_name = "auipc"
-
-  elif inst[opcode] == 0b1101111:     inst_name = "jal"
-
-  elif inst[opcode] == 0b1100111:     inst_name = "jalr"
-
-  elif inst[opcode] == 0b1110011:
-    if   inst[funct3] == 0b001:       inst_name = "csrw"
-    elif inst[funct3] == 0b010:       inst_name = "csrr"
-
-  elif inst == 0: inst_name = " "
-
-  if inst_name == "":
-    raise AssertionError( "Illegal instruction {}!".format(inst) )
+decode_cache = {}
+
+def decode( inst_bits ):
+
+  try:
+    return decode_cache[ inst_bits ]
+  except KeyError:
+    pass
 
+  inst_bits = int( inst_bits )
+
+  if inst_bits == 0:
+    inst_name = " "
+  else:
+    try:
+      inst_tmpl = tinyrv2_isa_impl.decode_tmpl( inst_bits )
+    except AssertionError:
+      raise AssertionError( "Illegal instruction {:0>8x}!".format( inst_bits ) )
+    inst_name = inst_tmpl.partition(' ')[0]
+
+  decode_cache[ inst_bits ] = inst_name
   return inst_name
 
+def decode_inst_name( inst ):
+  return decode( int( inst ) )
+
+#-------------------------------------------------------------------------
+# decode_batch
+#-------------------------------------------------------------------------
+# Decode an entire array of instruction words at once with NumPy. We
+# apply every mask/match pair in the encoding table to the whole array,
+# and then extract each instruction field as an array. The result is a
+# dictionary of arrays with the same field names as TinyRV2DecodedInst,
+# plus "idx" which is the index of the matching row in the encoding
+# table (or -1 if no row matches). We only import NumPy when we need it
+# so the rest of this module does not depend on it.
+
+tinyrv2_decode_batch_names = \
+  [ row[0].partition(' ')[0] for row in tinyrv2_encoding_table ] + [ "" ]
+
+def decode_batch( inst_words ):
+
+  import numpy as np
+
+  words = np.asarray( inst_words, dtype=np.uint32 )
+
+  # Apply the rows in reverse order so the first matching row wins
+
+  idx = np.full( words.shape, -1, dtype=np.int32 )
+
+  for row_idx in reversed( xrange( len(tinyrv2_encoding_table) ) ):
+    opcode_mask  = np.uint32( tinyrv2_encoding_table[row_idx][1] )
+    opcode_match = np.uint32( tinyrv2_encoding_table[row_idx][2] )
+    idx[ ( words & opcode_mask ) == opcode_match ] = row_idx
+
+  # Extract the fields, using a signed copy for the immediates so that
+  # arithmetic shifts do the sign extension
+
+  w  = words.astype( np.int64 )
+  sw = words.view( np.int32 ).astype( np.int64 )
+
+  return \
+  {
+    "bits"   : words,
+    "idx"    : idx,
+    "name"   : np.array( tinyrv2_decode_batch_names, dtype=object )[ idx ],
+    "rd"     : ( w >>  7 ) & 0x1f,
+    "rs1"    : ( w >> 15 ) & 0x1f,
+    "rs2"    : ( w >> 20 ) & 0x1f,
+    "shamt"  : ( w >> 20 ) & 0x1f,
+    "csrnum" : ( w >> 20 ) & 0xfff,
+    "i_imm"  : ( sw >> 20 ),
+    "s_imm"  : ( ( sw >> 25 ) <<  5 ) | ( ( w >>  7 ) & 0x1f ),
+    "b_imm"  : ( ( sw >> 31 ) << 12 ) | ( ( ( w >>  7 ) & 0x1   ) << 11 )
+             | ( ( ( w >> 25 ) & 0x3f  ) <<  5 ) | ( ( ( w >>  8 ) & 0xf ) << 1 ),
+    "u_imm"  : ( w & 0xfffff000 ),
+    "j_imm"  : ( ( sw >> 31 ) << 20 ) | ( w & 0xff000 )
+             | ( ( ( w >> 20 ) & 0x1   ) << 11 ) | ( ( ( w >> 21 ) & 0x3ff ) << 1 ),
+  }
+
+#-------------------------------------------------------------------------
+# tinyrv2_disasm_fmts
+#-------------------------------------------------------------------------
+# The batch disassembler turns each instruction template into a format
+# string with one positional argument per field. These formats must
+# produce exactly the same strings as the disassemble_field functions.
+
+tinyrv2_disasm_field_fmts = \
+{
+  "rs1"    : "x{{{}:0>2}}",
+  "rs2"    : "x{{{}:0>2}}",
+  "shamt"  : "{{{}:0>2x}}",
+  "rd"     : "x{{{}:0>2}}",
+  "i_imm"  : "0x{{{}:0>3x}}",
+  "csrnum" : "0x{{{}:0>3x}}",
+  "s_imm"  : "0x{{{}:0>3x}}",
+  "b_imm"  : "0x{{{}:0>4x}}",
+  "u_imm"  : "0x{{{}:0>5x}}",
+  "j_imm"  : "0x{{{}:0>6x}}",
+}
+
+def mk_disasm_fmt( inst_tmpl ):
+
+  (inst_name,sep,fields_tmpl) = inst_tmpl.partition(' ')
+
+  translation_table = maketrans(",()","   ")
+  field_tags = translate(fields_tmpl,translation_table).split()
+
+  disasm_fmt = inst_tmpl
+  for i, field_tag in enumerate( field_tags ):
+    disasm_fmt = disasm_fmt.replace( field_tag,
+                   tinyrv2_disasm_field_fmts[ field_tag ].format( i ) )
+
+  return ( disasm_fmt, field_tags )
+
+tinyrv2_disasm_fmts = \
+  [ mk_disasm_fmt( row[0] ) for row in tinyrv2_encoding_table ]
+
 def disassemble( mem_image ):
 
+  import numpy as np
+
   # Get the text section to disassemble
 
   text_section = mem_image.get_section( ".text" )
 
-  # Iterate through the text section four bytes at a time
+  # Decode the entire text section at once
+
+  addr   = text_section.addr
+  nwords = len(text_section.data) / 4
+  words  = np.frombuffer( str(text_section.data[:4*nwords]), dtype="<u4" )
+  fields = decode_batch( words )
+  idx    = fields["idx"]
 
-  addr = text_section.addr
-  asm_code = ""
-  for i in xrange(0,len(text_section.data),4):
+  # All-zero words disassemble to an empty string, but any other word
+  # which does not match the encoding table is an illegal instruction
 
-    print hex(addr+i)
+  illegal = np.flatnonzero( ( idx < 0 ) & ( words != 0 ) )
+  if len( illegal ) > 0:
+    raise AssertionError( "Illegal instruction {:0>8x}!"
+                          .format( int( words[ illegal[0] ] ) ) )
 
-    bits = struct.unpack_from("<I",buffer(text_section.data,i,4))[0]
-    inst_str= disassemble_inst( Bits(32,bits) )
-    disasm_line = " {:0>8x}  {:0>8x}  {}\n".format( addr+i, bits, inst_str )
-    asm_code += disasm_line
+  # Field values as they should be displayed
 
-  return asm_code
+  disasm_fields = \
+  {
+    "rs1"    : fields["rs1"],
+    "rs2"    : fields["rs2"],
+    "shamt"  : fields["shamt"],
+    "rd"     : fields["rd"],
+    "i_imm"  : fields["i_imm"] & 0xfff,
+    "csrnum" : fields["csrnum"],
+    "s_imm"  : fields["s_imm"] & 0xfff,
+    "b_imm"  : fields["b_imm"] & 0x1fff,
+    "u_imm"  : fields["u_imm"] >> 12,
+    "j_imm"  : fields["j_imm"] & 0x1fffff,
+  }
+
+  # Format all of the instructions which use the same template together
+
+  inst_strs = [ "" ] * nwords
+
+  for row_idx in np.unique( idx[ idx >= 0 ] ).tolist():
+
+    (disasm_fmt,field_tags) = tinyrv2_disasm_fmts[ row_idx ]
+
+    sel    = np.flatnonzero( idx == row_idx )
+    values = [ disasm_fields[ tag ][ sel ].tolist() for tag in field_tags ]
+
+    if values:
+      for i, args in zip( sel.tolist(), zip( *values ) ):
+        inst_strs[i] = disasm_fmt.format( *args )
+    else:
+      for i in sel.tolist():
+        inst_strs[i] = disasm_fmt
+
+  # Create one line per instruction
+
+  return "".join([ " {:0>8x}  {:0>8x}  {}\n".format( addr+4*i, bits, inst_str )
+                   for i, (bits,inst_str)
+                   in enumerate( zip( words.tolist(), inst_strs ) ) ])
 
 #=========================================================================
 # TinyRV2Inst
@@ -983,7 +1168,7 @@ class TinyRV2Inst (object):
 
   @property
   def name( self ):
-    return decode_inst_name( self.bits )
+    return decode( self.bits.uint() )
 
   #-----------------------------------------------------------------------
   # Get fields
@@ -1053,3 +1238,76 @@ class TinyRV2Inst (object):
   def __str__( self ):
     return disassemble_inst( self.bits )
 
+#=========================================================================
+# TinyRV2DecodedInst
+#=========================================================================
+# This is a pre-decoded instruction. Unlike TinyRV2Inst, which slices the
+# instruction bits every time a field is accessed, we decode the name and
+# every field exactly once in the constructor and store them as plain
+# Python ints. Register specifiers are unsigned, and the i/s/b/j
+# immediates are already sign-extended (so they can be negative). The
+# u_imm is stored already shifted into the upper 20 bits. The FL model
+# caches these objects per PC so that a loop body is only decoded once.
+
+# Sign-extend the low nbits of an int into a (possibly negative) int
+
+def _sext_int( value, nbits ):
+  sign = 1 << ( nbits - 1 )
+  return ( value & ( sign - 1 ) ) - ( value & sign )
+
+class TinyRV2DecodedInst (object):
+
+  __slots__ = [ 'bits', 'name', 'rd', 'rs1', 'rs2', 'shamt', 'csrnum',
+                'i_imm', 's_imm', 'b_imm', 'u_imm', 'j_imm', '_str' ]
+
+  #-----------------------------------------------------------------------
+  # Constructor
+  #-----------------------------------------------------------------------
+
+  def __init__( self, inst_bits ):
+
+    bits = int( inst_bits ) & 0xffffffff
+
+    self.bits   = bits
+    self.name   = decode( bits )
+
+    # Register specifiers
+
+    self.rd     = ( bits >>  7 ) & 0x1f
+    self.rs1    = ( bits >> 15 ) & 0x1f
+    self.rs2    = ( bits >> 20 ) & 0x1f
+    self.shamt  = ( bits >> 20 ) & 0x1f
+    self.csrnum = ( bits >> 20 ) & 0xfff
+
+    # Immediates
+
+    self.i_imm  = _sext_int( bits >> 20, 12 )
+
+    self.s_imm  = _sext_int( ( ( bits >> 25 ) << 5 )
+                           | ( ( bits >>  7 ) & 0x1f ), 12 )
+
+    self.b_imm  = _sext_int( ( ( ( bits >> 31 ) & 0x1  ) << 12 )
+                           | ( ( ( bits >>  7 ) & 0x1  ) << 11 )
+                           | ( ( ( bits >> 25 ) & 0x3f ) <<  5 )
+                           | ( ( ( bits >>  8 ) & 0xf  ) <<  1 ), 13 )
+
+    self.u_imm  = bits & 0xfffff000
+
+    self.j_imm  = _sext_int( ( ( ( bits >> 31 ) & 0x1   ) << 20 )
+                           | ( ( ( bits >> 12 ) & 0xff  ) << 12 )
+                           | ( ( ( bits >> 20 ) & 0x1   ) << 11 )
+                           | ( ( ( bits >> 21 ) & 0x3ff ) <<  1 ), 21 )
+
+    # The disassembly is only needed for line tracing so we create it
+    # lazily and then keep it around
+
+    self._str   = None
+
+  #-----------------------------------------------------------------------
+  # to string
+  #-----------------------------------------------------------------------
+
+  def __str__( self ):
+    if self._str is None:
+      self._str = disassemble_inst( Bits( 32, self.bits ) )
+    return self._str
@@ -7,19 +7,19 @@
 # Author : Christopher Batten, Moyang Wang, Shunning Jiang
 # Date   : Aug 29, 2016
 
-from pymtl            import Bits,concat
-from pymtl.datatypes  import helpers
-from tinyrv2_encoding import TinyRV2Inst
+from tinyrv2_encoding import TinyRV2DecodedInst
 
 #-------------------------------------------------------------------------
 # Syntax Helpers
 #-------------------------------------------------------------------------
+# Register values are stored as unsigned 32-bit ints. These helpers
+# reinterpret them as signed values.
 
-def sext( bits ):
-  return helpers.sext( bits, 32 )
+def signed( value ):
+  return ( value ^ 0x80000000 ) - 0x80000000
 
-def zext( bits ):
-  return helpers.zext( bits, 32 )
+def signed8( value ):
+  return ( value ^ 0x80 ) - 0x80
 
 class TinyRV2Semantics (object):
 
@@ -33,34 +33,54 @@ class TinyRV2Semantics (object):
   #-----------------------------------------------------------------------
   # RegisterFile
   #-----------------------------------------------------------------------
+  # The registers are stored as a plain list of unsigned ints, so reading
+  # and writing a register does not allocate anything. Writes are
+  # truncated to 32 bits and writes to x0 are ignored.
 
   class RegisterFile (object):
 
     def __init__( self ):
+      self.regs = [ 0 ] * 32
 
-      self.regs = [ Bits(32,0) for i in xrange(32) ]
+    def __getitem__( self, idx ):
+      return self.regs[idx]
+
+    def __setitem__( self, idx, value ):
+      if idx != 0:
+        self.regs[idx] = value & 0xffffffff
+
+  #-----------------------------------------------------------------------
+  # TracingRegisterFile
+  #-----------------------------------------------------------------------
+  # Same as the register file above, except that we also keep track of
+  # the last two source registers and the destination register for line
+  # tracing. We only use this register file if trace_regs is enabled.
+
+  class TracingRegisterFile (RegisterFile):
+
+    def __init__( self ):
+
+      TinyRV2Semantics.RegisterFile.__init__( self )
 
       self.trace_str  = ""
-      self.trace_regs = False
+      self.trace_regs = True
       self.src0 = ""
       self.src1 = ""
       self.dest = ""
 
     def __getitem__( self, idx ):
-      if self.trace_regs:
-        if self.src0 == "":
-          self.src0 = "X[{:2d}]={:0>8}".format( int(idx), self.regs[idx] )
-        else:
-          self.src1 = "X[{:2d}]={:0>8}".format( int(idx), self.regs[idx] )
+      if self.src0 == "":
+        self.src0 = "X[{:2d}]={:0>8x}".format( idx, self.regs[idx] )
+      else:
+        self.src1 = "X[{:2d}]={:0>8x}".format( idx, self.regs[idx] )
 
       return self.regs[idx]
 
     def __setitem__( self, idx, value ):
 
-      trunc_value = Bits( 32, value, trunc=True )
+      trunc_value = value & 0xffffffff
 
-      if self.trace_regs:
-        self.dest = "X[{:2d}]={:0>8}".format( int(idx), trunc_value )
+      self.dest = "X[{:2d}]={:0>8x}".format( idx, trunc_value )
 
       if idx != 0:
         self.regs[idx] = trunc_value
@@ -76,9 +96,14 @@ class TinyRV2Semantics (object):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( self, memory, mngr2proc_queue, proc2mngr_queue, num_cores=1 ):
+  def __init__( self, memory, mngr2proc_queue, proc2mngr_queue, num_cores=1,
+                trace_regs=False ):
+
+    if trace_regs:
+      self.R = TinyRV2Semantics.TracingRegisterFile()
+    else:
+      self.R = TinyRV2Semantics.RegisterFile()
 
-    self.R = TinyRV2Semantics.RegisterFile()
     self.M = memory
 
     self.mngr2proc_queue = mngr2proc_queue
@@ -87,6 +112,10 @@ class TinyRV2Semantics (object):
     self.numcores = num_cores
     self.coreid   = -1
 
+    # Pre-decoded instructions keyed by PC
+
+    self.decode_cache = {}
+
     # Only support RISC-V 32-bit ISA
     self.xlen = 32
 
@@ -98,13 +127,37 @@ class TinyRV2Semantics (object):
 
   def reset( s ):
 
-    s.PC = Bits( 32, 0x00000200 )
+    s.PC = 0x00000200
     s.stats_en = False
     s.coreid   = -1
 
+    s.decode_cache.clear()
+
+  #-----------------------------------------------------------------------
+  # Decoded instruction cache
+  #-----------------------------------------------------------------------
+  # The execute functions below operate on a TinyRV2DecodedInst whose
+  # fields are plain ints. Since the decode only depends on the
+  # instruction bits, we can reuse the decoded instruction every time we
+  # come back to the same PC. The cache is kept coherent by invalidating
+  # the words written by stores, so self-modifying code still works.
+
+  def decode( s, pc, inst_bits ):
+    inst = TinyRV2DecodedInst( inst_bits )
+    s.decode_cache[ pc ] = inst
+    return inst
+
+  def invalidate_decoded( s, addr, nbytes ):
+    if s.decode_cache:
+      for word_addr in xrange( addr & ~0x3, addr + nbytes, 4 ):
+        s.decode_cache.pop( word_addr, None )
+
   #-----------------------------------------------------------------------
   # Basic Instructions
   #-----------------------------------------------------------------------
+  # Note that the PC and all register values are unsigned ints, the
+  # immediates are already sign-extended ints, and the register file
+  # truncates whatever we write back to 32 bits.
 
   def execute_nop( s, inst ):
     s.PC += 4
@@ -122,11 +175,11 @@ class TinyRV2Semantics (object):
     s.PC += 4
 
   def execute_sll( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1] << (s.R[inst.rs2].uint() & 0x1F)
+    s.R[inst.rd] = s.R[inst.rs1] << (s.R[inst.rs2] & 0x1F)
     s.PC += 4
 
   def execute_slt( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1].int() < s.R[inst.rs2].int()
+    s.R[inst.rd] = signed( s.R[inst.rs1] ) < signed( s.R[inst.rs2] )
     s.PC += 4
 
   def execute_sltu( s, inst ):
@@ -138,11 +191,11 @@ class TinyRV2Semantics (object):
     s.PC += 4
 
   def execute_srl( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1] >> (s.R[inst.rs2].uint() & 0x1F) 
+    s.R[inst.rd] = s.R[inst.rs1] >> (s.R[inst.rs2] & 0x1F) 
     s.PC += 4
 
   def execute_sra( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1].int() >> (s.R[inst.rs2].uint() & 0x1F) 
+    s.R[inst.rd] = signed( s.R[inst.rs1] ) >> (s.R[inst.rs2] & 0x1F) 
     s.PC += 4
 
   def execute_or( s, inst ):
@@ -158,27 +211,27 @@ class TinyRV2Semantics (object):
   #-----------------------------------------------------------------------
 
   def execute_addi( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1] + sext(inst.i_imm)
+    s.R[inst.rd] = s.R[inst.rs1] + inst.i_imm
     s.PC += 4
 
   def execute_slti( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1].int() < inst.i_imm.int()
+    s.R[inst.rd] = signed( s.R[inst.rs1] ) < inst.i_imm
     s.PC += 4
 
   def execute_sltiu( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1] < sext(inst.i_imm)
+    s.R[inst.rd] = s.R[inst.rs1] < ( inst.i_imm & 0xffffffff )
     s.PC += 4
 
   def execute_xori( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1] ^ sext(inst.i_imm)
+    s.R[inst.rd] = s.R[inst.rs1] ^ inst.i_imm
     s.PC += 4
 
   def execute_ori( s, inst ): 
-    s.R[inst.rd] = s.R[inst.rs1] | sext(inst.i_imm)
+    s.R[inst.rd] = s.R[inst.rs1] | inst.i_imm
     s.PC += 4
 
   def execute_andi( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1] & sext(inst.i_imm)
+    s.R[inst.rd] = s.R[inst.rs1] & inst.i_imm
     s.PC += 4
 
   def execute_slli( s, inst ):
@@ -191,7 +244,7 @@ class TinyRV2Semantics (object):
     s.PC += 4
 
   def execute_srai( s, inst ):
-    s.R[inst.rd] = s.R[inst.rs1].int() >> inst.shamt.uint()
+    s.R[inst.rd] = signed( s.R[inst.rs1] ) >> inst.shamt
     s.PC += 4
 
   #-----------------------------------------------------------------------
@@ -211,23 +264,25 @@ class TinyRV2Semantics (object):
   #-----------------------------------------------------------------------
 
   def execute_lw( s, inst ):
-    addr = s.R[inst.rs1] + sext(inst.i_imm)
-    s.R[inst.rd] = s.M[addr:addr+4]
+    addr = ( s.R[inst.rs1] + inst.i_imm ) & 0xffffffff
+    s.R[inst.rd] = s.M[addr:addr+4].uint()
     s.PC += 4
 
   def execute_sw( s, inst ):
-    addr = s.R[inst.rs1] + sext(inst.s_imm)
+    addr = ( s.R[inst.rs1] + inst.s_imm ) & 0xffffffff
     s.M[addr:addr+4] = s.R[inst.rs2]
+    s.invalidate_decoded( addr, 4 )
     s.PC += 4
 
   def execute_lb( s, inst ):
-    addr = s.R[inst.rs1] + sext(inst.i_imm)
-    s.R[inst.rd] = sext( s.M[addr] )
+    addr = ( s.R[inst.rs1] + inst.i_imm ) & 0xffffffff
+    s.R[inst.rd] = signed8( s.M[addr].uint() )
     s.PC += 4
 
   def execute_sb( s, inst ):
-    addr = s.R[inst.rs1] + sext(inst.s_imm)
-    s.M[addr] = s.R[inst.rs2][0:8]
+    addr = ( s.R[inst.rs1] + inst.s_imm ) & 0xffffffff
+    s.M[addr] = s.R[inst.rs2] & 0xff
+    s.invalidate_decoded( addr, 1 )
     s.PC += 4
 
   #-----------------------------------------------------------------------
@@ -236,10 +291,10 @@ class TinyRV2Semantics (object):
 
   def execute_jal( s, inst ):
     s.R[inst.rd] = s.PC + 4
-    s.PC = s.PC + sext(inst.j_imm)
+    s.PC = ( s.PC + inst.j_imm ) & 0xffffffff
 
   def execute_jalr( s, inst ):
-    temp = s.R[inst.rs1] + sext(inst.i_imm)
+    temp = s.R[inst.rs1] + inst.i_imm
     s.R[inst.rd] = s.PC + 4
     s.PC = temp & 0xFFFFFFFE
 
@@ -249,37 +304,37 @@ class TinyRV2Semantics (object):
 
   def execute_beq( s, inst ):
     if s.R[inst.rs1] == s.R[inst.rs2]:
-      s.PC = s.PC + sext(inst.b_imm)
+      s.PC = ( s.PC + inst.b_imm ) & 0xffffffff
     else:
       s.PC += 4
 
   def execute_bne( s, inst ):
     if s.R[inst.rs1] != s.R[inst.rs2]:
-      s.PC = s.PC + sext(inst.b_imm)
+      s.PC = ( s.PC + inst.b_imm ) & 0xffffffff
     else:
       s.PC += 4
 
   def execute_blt( s, inst ):
-    if s.R[inst.rs1].int() < s.R[inst.rs2].int():
-      s.PC = s.PC + sext(inst.b_imm)
+    if signed( s.R[inst.rs1] ) < signed( s.R[inst.rs2] ):
+      s.PC = ( s.PC + inst.b_imm ) & 0xffffffff
     else:
       s.PC += 4
 
   def execute_bge( s, inst ):
-    if s.R[inst.rs1].int() >= s.R[inst.rs2].int():
-      s.PC = s.PC + sext(inst.b_imm)
+    if signed( s.R[inst.rs1] ) >= signed( s.R[inst.rs2] ):
+      s.PC = ( s.PC + inst.b_imm ) & 0xffffffff
     else:
       s.PC += 4
 
   def execute_bltu( s, inst ):
     if s.R[inst.rs1] < s.R[inst.rs2]:
-      s.PC = s.PC + sext(inst.b_imm)
+      s.PC = ( s.PC + inst.b_imm ) & 0xffffffff
     else:
       s.PC += 4
 
   def execute_bgeu( s, inst ):
     if s.R[inst.rs1] >= s.R[inst.rs2]:
-      s.PC = s.PC + sext(inst.b_imm)
+      s.PC = ( s.PC + inst.b_imm ) & 0xffffffff
     else:
       s.PC += 4
 
@@ -302,8 +357,8 @@ class TinyRV2Semantics (object):
     # this is the same as setting rs1 = x0.
 
     if   inst.csrnum == 0xFC0:
-      bits = s.mngr2proc_queue.popleft()
-      s.mngr2proc_str = str(bits)
+      bits = int( s.mngr2proc_queue.popleft() )
+      s.mngr2proc_str = "{:0>8x}".format( bits )
       s.R[inst.rd] = bits
 
     # CSR: numcores
@@ -316,8 +371,8 @@ class TinyRV2Semantics (object):
 
     else:
       raise TinyRV2Semantics.IllegalInstruction(
-        "Unrecognized CSR register ({}) for csrr at PC={}" \
-          .format(inst.csrnum.uint(),s.PC) )
+        "Unrecognized CSR register ({}) for csrr at PC={:0>8x}" \
+          .format(inst.csrnum,s.PC) )
 
     s.PC += 4
 
@@ -329,7 +384,7 @@ class TinyRV2Semantics (object):
     
     if   inst.csrnum == 0x7C0:
       bits = s.R[inst.rs1]
-      s.proc2mngr_str = str(bits)
+      s.proc2mngr_str = "{:0>8x}".format( bits )
       s.proc2mngr_queue.append( bits )
     
     # CSR: stats_en
@@ -339,8 +394,8 @@ class TinyRV2Semantics (object):
 
     else:
       raise TinyRV2Semantics.IllegalInstruction(
-        "Unrecognized CSR register ({}) for csrw at PC={}" \
-          .format(inst.csrnum.uint(),s.PC) )
+        "Unrecognized CSR register ({}) for csrw at PC={:0>8x}" \
+          .format(inst.csrnum,s.PC) )
 
     s.PC += 4
 
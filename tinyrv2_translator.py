@@ -0,0 +1,360 @@
+#=========================================================================
+# tinyrv2_translator
+#=========================================================================
+# This is a translation-based functional model for the TinyRV2
+# instruction set which we mostly use to quickly fast-forward through
+# long programs. Instead of dispatching one instruction at a time like
+# TinyRV2Semantics, we group straight-line runs of instructions into
+# basic blocks and translate each basic block into a Python function.
+# Blocks end at branches, jumps, and CSR instructions. Translated blocks
+# are cached by their start PC, so a loop body is only translated once.
+#
+# The generated code operates on plain ints: the register file is a list
+# of 32 ints, the PC is an int, and memory is a flat bytearray (e.g., the
+# mem attribute of the TestMemory in the test harness). The results are
+# bit-identical to the execute functions in TinyRV2Semantics.
+#
+# Every block returns a (next_pc, ninsts) tuple where ninsts is the
+# number of instructions the block actually executed. A block can
+# execute fewer instructions than it contains if it has to wait for a
+# mngr2proc message or if it writes into code we have already
+# translated. In the latter case we throw away all translated blocks and
+# simply retranslate from the next PC.
+
+import struct
+
+from tinyrv2_encoding  import TinyRV2DecodedInst
+from tinyrv2_semantics import TinyRV2Semantics
+
+#-------------------------------------------------------------------------
+# Code generation templates
+#-------------------------------------------------------------------------
+# Templates for the instructions which simply write a register. The
+# templates are formatted with the decoded instruction and the pc, and
+# the result is always truncated to 32 bits. Note that signed values are
+# created with the ( x ^ 0x80000000 ) - 0x80000000 idiom.
+
+_rd_templates = {
+
+  'add'   : "( R[{rs1}] + R[{rs2}] ) & 0xffffffff",
+  'sub'   : "( R[{rs1}] - R[{rs2}] ) & 0xffffffff",
+  'mul'   : "( R[{rs1}] * R[{rs2}] ) & 0xffffffff",
+  'and'   : "R[{rs1}] & R[{rs2}]",
+  'or'    : "R[{rs1}] | R[{rs2}]",
+  'xor'   : "R[{rs1}] ^ R[{rs2}]",
+  'slt'   : "1 if ( R[{rs1}] ^ 0x80000000 ) < ( R[{rs2}] ^ 0x80000000 ) else 0",
+  'sltu'  : "1 if R[{rs1}] < R[{rs2}] else 0",
+  'sll'   : "( R[{rs1}] << ( R[{rs2}] & 0x1f ) ) & 0xffffffff",
+  'srl'   : "R[{rs1}] >> ( R[{rs2}] & 0x1f )",
+  'sra'   : "( ( ( R[{rs1}] ^ 0x80000000 ) - 0x80000000 ) >> ( R[{rs2}] & 0x1f ) ) & 0xffffffff",
+
+  'addi'  : "( R[{rs1}] + {i_imm} ) & 0xffffffff",
+  'andi'  : "R[{rs1}] & {i_imm_u}",
+  'ori'   : "R[{rs1}] | {i_imm_u}",
+  'xori'  : "R[{rs1}] ^ {i_imm_u}",
+  'slti'  : "1 if ( ( R[{rs1}] ^ 0x80000000 ) - 0x80000000 ) < {i_imm} else 0",
+  'sltiu' : "1 if R[{rs1}] < {i_imm_u} else 0",
+  'slli'  : "( R[{rs1}] << {shamt} ) & 0xffffffff",
+  'srli'  : "R[{rs1}] >> {shamt}",
+  'srai'  : "( ( ( R[{rs1}] ^ 0x80000000 ) - 0x80000000 ) >> {shamt} ) & 0xffffffff",
+
+  'lui'   : "{u_imm}",
+  'auipc' : "{auipc}",
+
+  'lw'    : "_unpack_from( '<I', M, ( R[{rs1}] + {i_imm} ) & 0xffffffff )[0]",
+  'lb'    : "( ( M[ ( R[{rs1}] + {i_imm} ) & 0xffffffff ] ^ 0x80 ) - 0x80 ) & 0xffffffff",
+
+}
+
+# Loads can still raise an exception even if they write x0, so we have to
+# keep them even though the result is thrown away.
+
+_load_insts = set([ 'lw', 'lb' ])
+
+# Branch conditions
+
+_br_templates = {
+  'beq'  : "R[{rs1}] == R[{rs2}]",
+  'bne'  : "R[{rs1}] != R[{rs2}]",
+  'blt'  : "( R[{rs1}] ^ 0x80000000 ) <  ( R[{rs2}] ^ 0x80000000 )",
+  'bge'  : "( R[{rs1}] ^ 0x80000000 ) >= ( R[{rs2}] ^ 0x80000000 )",
+  'bltu' : "R[{rs1}] <  R[{rs2}]",
+  'bgeu' : "R[{rs1}] >= R[{rs2}]",
+}
+
+# Store templates
+
+_st_templates = {
+  'sw' : ( "_pack_into( '<I', M, a, R[{rs2}] )", 4 ),
+  'sb' : ( "M[a] = R[{rs2}] & 0xff",             1 ),
+}
+
+#-------------------------------------------------------------------------
+# TinyRV2Translator
+#-------------------------------------------------------------------------
+
+class TinyRV2Translator (object):
+
+  # Maximum number of instructions in a single translated block
+
+  max_block_insts = 64
+
+  #-----------------------------------------------------------------------
+  # Constructor
+  #-----------------------------------------------------------------------
+
+  def __init__( s, memory, mngr2proc_queue, proc2mngr_queue, num_cores=1 ):
+
+    s.R = [ 0 ] * 32
+    s.M = memory
+
+    s.mngr2proc_queue = mngr2proc_queue
+    s.proc2mngr_queue = proc2mngr_queue
+
+    s.numcores = num_cores
+    s.coreid   = 0
+
+    # Translated blocks keyed by start PC, and the set of word addresses
+    # which are covered by any of the translated blocks
+
+    s.block_cache = {}
+    s.code_words  = set()
+
+    s.reset()
+
+  #-----------------------------------------------------------------------
+  # reset
+  #-----------------------------------------------------------------------
+
+  def reset( s ):
+
+    s.PC        = 0x00000200
+    s.stats_en  = False
+    s.num_insts = 0
+
+    s.R[:] = [ 0 ] * 32
+
+    s.invalidate_blocks()
+
+  def invalidate_blocks( s ):
+    s.block_cache.clear()
+    s.code_words.clear()
+
+  #-----------------------------------------------------------------------
+  # translate
+  #-----------------------------------------------------------------------
+  # Translate the basic block starting at pc into a Python function. We
+  # return a (function, ninsts) tuple. A block with zero instructions
+  # means we cannot make progress at this pc (i.e., we reached an
+  # all-zero instruction, which the FL model treats as a halt).
+
+  def translate( s, pc, max_insts=None ):
+
+    if max_insts is None:
+      max_insts = s.max_block_insts
+
+    lines   = [ "def block( R, M, C, s ):" ]
+    ninsts  = 0
+    next_pc = pc
+    done    = False
+
+    while not done and ninsts < max_insts and next_pc + 4 <= len( s.M ):
+
+      word = struct.unpack_from( "<I", s.M, next_pc )[0]
+
+      # Illegal instructions are only an error if we actually execute
+      # them, so we just end the block unless it is the first one
+
+      try:
+        inst = TinyRV2DecodedInst( word )
+      except AssertionError:
+        if ninsts == 0:
+          raise TinyRV2Semantics.IllegalInstruction(
+            "Illegal instruction ({:0>8x}) at PC={:0>8x}".format( word, pc ) )
+        break
+
+      if inst.name == ' ':
+        break
+
+      done = s._gen_inst( lines, inst, next_pc, ninsts )
+
+      s.code_words.add( next_pc )
+      next_pc += 4
+      ninsts  += 1
+
+    if not done:
+      lines.append( "  return 0x{:08x}, {}".format( next_pc, ninsts ) )
+
+    # Compile the block. We keep the source around for debugging.
+
+    src       = "\n".join( lines ) + "\n"
+    namespace = dict( _globals )
+    exec( compile( src, "<block 0x{:08x}>".format( pc ), "exec" ), namespace )
+
+    block = namespace['block']
+    block.src = src
+
+    return ( block, ninsts )
+
+  #-----------------------------------------------------------------------
+  # _gen_inst
+  #-----------------------------------------------------------------------
+  # Append the code for a single instruction at pc, which is the k-th
+  # instruction of the block. Returns True if the instruction ends the
+  # block.
+
+  def _gen_inst( s, lines, inst, pc, k ):
+
+    name = inst.name
+    f    = dict(
+      rs1     = inst.rs1,
+      rs2     = inst.rs2,
+      shamt   = inst.shamt,
+      i_imm   = inst.i_imm,
+      i_imm_u = inst.i_imm & 0xffffffff,
+      u_imm   = inst.u_imm,
+      auipc   = ( inst.u_imm + pc ) & 0xffffffff,
+    )
+
+    # Register writes
+
+    if name in _rd_templates:
+      expr = _rd_templates[name].format( **f )
+      if inst.rd != 0:
+        lines.append( "  R[{}] = {}".format( inst.rd, expr ) )
+      elif name in _load_insts:
+        lines.append( "  {}".format( expr ) )
+      return False
+
+    if name == 'nop':
+      return False
+
+    # Stores. If we write into any word we have translated, then we stop
+    # right after the store and throw away the translations.
+
+    if name in _st_templates:
+      (tmpl,nbytes) = _st_templates[name]
+      lines.append( "  a = ( R[{}] + {} ) & 0xffffffff".format( inst.rs1, inst.s_imm ) )
+      lines.append( "  " + tmpl.format( **f ) )
+      lines.append( "  if ( a & 0xfffffffc ) in C or ( ( a + {} ) & 0xfffffffc ) in C:"
+                    .format( nbytes-1 ) )
+      lines.append( "    s.invalidate_blocks()" )
+      lines.append( "    return 0x{:08x}, {}".format( pc+4, k+1 ) )
+      return False
+
+    # Jumps
+
+    if name == 'jal':
+      if inst.rd != 0:
+        lines.append( "  R[{}] = 0x{:08x}".format( inst.rd, pc+4 ) )
+      lines.append( "  return 0x{:08x}, {}".format( ( pc + inst.j_imm ) & 0xffffffff, k+1 ) )
+      return True
+
+    if name == 'jalr':
+      lines.append( "  t = ( R[{}] + {} ) & 0xfffffffe".format( inst.rs1, inst.i_imm ) )
+      if inst.rd != 0:
+        lines.append( "  R[{}] = 0x{:08x}".format( inst.rd, pc+4 ) )
+      lines.append( "  return t, {}".format( k+1 ) )
+      return True
+
+    # Branches
+
+    if name in _br_templates:
+      lines.append( "  if " + _br_templates[name].format( **f ) + ":" )
+      lines.append( "    return 0x{:08x}, {}".format( ( pc + inst.b_imm ) & 0xffffffff, k+1 ) )
+      lines.append( "  return 0x{:08x}, {}".format( pc+4, k+1 ) )
+      return True
+
+    # CSRs
+
+    if name == 'csrr':
+
+      if inst.csrnum == 0xFC0:
+        lines.append( "  if not s.mngr2proc_queue:" )
+        lines.append( "    return 0x{:08x}, {}".format( pc, k ) )
+        expr = "int( s.mngr2proc_queue.popleft() )"
+      elif inst.csrnum == 0xFC1:
+        expr = "int( s.numcores ) & 0xffffffff"
+      elif inst.csrnum == 0xF14:
+        expr = "int( s.coreid ) & 0xffffffff"
+      else:
+        expr = None
+        lines.append( "  s.illegal_csr( 'csrr', {}, 0x{:08x} )".format( inst.csrnum, pc ) )
+
+      if expr is not None:
+        if inst.rd != 0:
+          lines.append( "  R[{}] = {}".format( inst.rd, expr ) )
+        else:
+          lines.append( "  {}".format( expr ) )
+
+      lines.append( "  return 0x{:08x}, {}".format( pc+4, k+1 ) )
+      return True
+
+    if name == 'csrw':
+
+      if inst.csrnum == 0x7C0:
+        lines.append( "  s.proc2mngr_queue.append( R[{}] )".format( inst.rs1 ) )
+      elif inst.csrnum == 0x7C1:
+        lines.append( "  s.stats_en = R[{}] != 0".format( inst.rs1 ) )
+      else:
+        lines.append( "  s.illegal_csr( 'csrw', {}, 0x{:08x} )".format( inst.csrnum, pc ) )
+
+      lines.append( "  return 0x{:08x}, {}".format( pc+4, k+1 ) )
+      return True
+
+    raise AssertionError( "Cannot translate {} at PC={:0>8x}".format( name, pc ) )
+
+  def illegal_csr( s, name, csrnum, pc ):
+    raise TinyRV2Semantics.IllegalInstruction(
+      "Unrecognized CSR register ({}) for {} at PC={:0>8x}" \
+        .format( csrnum, name, pc ) )
+
+  #-----------------------------------------------------------------------
+  # run
+  #-----------------------------------------------------------------------
+  # Execute up to max_insts instructions. We stop early if we have to
+  # wait for a mngr2proc message or if we reach an all-zero instruction.
+  # Returns the number of instructions executed.
+
+  def run( s, max_insts ):
+
+    R = s.R
+    M = s.M
+    C = s.code_words
+
+    block_cache = s.block_cache
+    ninsts      = 0
+
+    while ninsts < max_insts:
+
+      pc    = s.PC
+      entry = block_cache.get( pc )
+      if entry is None:
+        entry = s.translate( pc )
+        block_cache[ pc ] = entry
+
+      (block,block_ninsts) = entry
+
+      # Do not overshoot max_insts. Partial blocks are not cached since
+      # we only need them at the very end of a run.
+
+      if block_ninsts > max_insts - ninsts:
+        (block,block_ninsts) = s.translate( pc, max_insts - ninsts )
+
+      (s.PC,n) = block( R, M, C, s )
+      ninsts += n
+
+      if n == 0:
+        break
+
+    s.num_insts += ninsts
+    return ninsts
+
+#-------------------------------------------------------------------------
+# Globals for the generated code
+#-------------------------------------------------------------------------
+
+_globals = {
+  '_unpack_from' : struct.unpack_from,
+  '_pack_into'   : struct.pack_into,
+}